@@ -0,0 +1,85 @@
+"""
+图片编码配置对比：每个配置下的请求载荷大小与耗时
+
+逐页渲染 PDF，对 IMAGE_ENCODING_PROFILES 中的每个配置统计：
+平均尺寸、按灰度编码的页面占比、base64 载荷字节数、编码耗时；
+指定 --embed 时再把编码结果逐页发送给 Jina Embedding 服务，统计请求耗时（不使用嵌入缓存）。
+
+用法:
+    python -m benchmarks.bench_encoding demo_data/test.pdf --pages 1-20
+    python -m benchmarks.bench_encoding demo_data/test.pdf --dpi 200 --profiles original,embed,vlm --embed
+"""
+import argparse
+import asyncio
+import base64
+import time
+from io import BytesIO
+from typing import List
+
+import numpy as np
+from PIL import Image
+
+from src.code.rendering.image_encoding import encode_image, load_profiles
+from src.code.rendering.page_renderer import page_renderer
+
+
+def parse_pages(spec: str, total_pages: int) -> List[int]:
+    if not spec:
+        return list(range(1, total_pages + 1))
+    first, _, last = spec.partition("-")
+    return list(range(int(first), min(int(last or first), total_pages) + 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", help="PDF 文件")
+    parser.add_argument("--pages", default="", help="页码范围，如 1-20，默认全部")
+    parser.add_argument("--dpi", type=int, default=None, help="渲染 DPI，默认 PAGE_RENDER_DPI")
+    parser.add_argument("--profiles", default="", help="逗号分隔的配置名，默认全部")
+    parser.add_argument("--embed", action="store_true", help="同时测量 embedding 请求耗时")
+    args = parser.parse_args()
+
+    profiles = load_profiles()
+    if args.profiles:
+        profiles = {name: profiles[name] for name in args.profiles.split(",")}
+    pages = parse_pages(args.pages, page_renderer.page_count(args.pdf))
+    images = [page_renderer.render_image(args.pdf, page, dpi=args.dpi) for page in pages]
+    print(f"{args.pdf}: {len(images)} 页，渲染尺寸 {images[0].width}x{images[0].height}")
+
+    header = f"{'配置':<12}{'平均尺寸':>12}{'灰度页':>8}{'载荷(KB/页)':>14}{'编码(ms/页)':>14}"
+    print(header + (f"{'请求(ms/页)':>14}" if args.embed else ""))
+    for name, profile in profiles.items():
+        start = time.perf_counter()
+        encoded = [encode_image(image, profile) for image in images]
+        encode_ms = (time.perf_counter() - start) / len(images) * 1000
+
+        decoded = [Image.open(BytesIO(data)) for data in encoded]
+        width = np.mean([image.width for image in decoded])
+        height = np.mean([image.height for image in decoded])
+        gray = sum(image.mode == "L" for image in decoded) / len(decoded)
+        payload_kb = np.mean([len(base64.b64encode(data)) for data in encoded]) / 1024
+
+        line = f"{name:<12}{f'{width:.0f}x{height:.0f}':>12}{gray:>8.0%}{payload_kb:>14.1f}{encode_ms:>14.2f}"
+        if args.embed:
+            line += f"{asyncio.run(embed_latency_ms(profile, encoded)):>14.1f}"
+        print(line)
+
+
+async def embed_latency_ms(profile, encoded: List[bytes]) -> float:
+    from src.code.embedding.embedding_model import JinaEmbeddingClient
+    from src.code.transport.http_transport import http_transport
+
+    client = JinaEmbeddingClient(encoding_profile=profile)
+    client.cache = None
+    await http_transport.startup([client.base_url])
+    try:
+        start = time.perf_counter()
+        for data in encoded:
+            await client.get_embedding(image=data)
+        return (time.perf_counter() - start) / len(encoded) * 1000
+    finally:
+        await http_transport.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+对比「每次调用新建 AsyncClient」与共享连接池 HTTPTransport 的请求延迟 (p50 / p99)
+
+默认在本地启动一个最小的 keep-alive HTTP 服务作为对端，只衡量连接建立与传输开销；
+也可以通过 --url 指向真实的 embedding / rerank 服务。
+
+用法:
+    python -m benchmarks.bench_http_transport --requests 500 --concurrency 8
+    python -m benchmarks.bench_http_transport --url http://localhost:9908/v1/embeddings
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, List
+
+import numpy as np
+from httpx import AsyncClient, Timeout
+
+from src.code.transport.http_transport import HTTPTransport
+
+RESPONSE_BODY = json.dumps({"data": [{"index": 0, "embedding": [0.0] * 16}]}).encode()
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """极简 HTTP/1.1 处理：读取请求头与请求体，返回固定 JSON，连接保持打开"""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            content_length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    content_length = int(line.split(b":", 1)[1])
+            if content_length:
+                await reader.readexactly(content_length)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: application/json\r\n"
+                b"Content-Length: " + str(len(RESPONSE_BODY)).encode() + b"\r\n"
+                b"Connection: keep-alive\r\n\r\n" + RESPONSE_BODY
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _measure(send: Callable[[], Awaitable[None]], total: int, concurrency: int) -> List[float]:
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await send()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies
+
+
+def _report(name: str, latencies: List[float], elapsed: float):
+    arr = np.array(latencies)
+    print(
+        f"{name:<22} p50={np.percentile(arr, 50):7.2f}ms  p99={np.percentile(arr, 99):7.2f}ms  "
+        f"qps={len(arr) / elapsed:8.1f}"
+    )
+
+
+async def run(url: str, total: int, concurrency: int):
+    payload = {"model": "bench", "input": ["hello"]}
+    timeout = Timeout(60.0, connect=10.0)
+
+    async def per_call():
+        # 与改造前 get_embedding / rerank 的写法一致
+        async with AsyncClient(timeout=timeout) as client:
+            await client.post(url, json=payload)
+
+    transport = HTTPTransport(timeout=timeout)
+    await transport.startup([url])
+
+    async def pooled():
+        await transport.post(url, json=payload)
+
+    for name, send in (("per-call AsyncClient", per_call), ("shared HTTPTransport", pooled)):
+        await send()  # 预热
+        start = time.perf_counter()
+        latencies = await _measure(send, total, concurrency)
+        _report(name, latencies, time.perf_counter() - start)
+
+    await transport.shutdown()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="目标地址，缺省时使用本地模拟服务")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = await asyncio.start_server(_handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}/v1/embeddings"
+
+    print(f"目标: {url}  请求数: {args.requests}  并发: {args.concurrency}")
+    await run(url, args.requests, args.concurrency)
+
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""
+Matryoshka 两阶段检索：不同截断维度下的延迟与召回
+
+第一轮在前 N 维截断并重新归一化的短向量上取 top_k * 倍数 个候选，第二轮用全量向量重排，
+以全量向量精确检索的 top-k 为基准统计 recall@k、第一轮常驻内存与每次查询耗时。
+
+合成数据按维度递减缩放方差，模拟 Matryoshka 训练后信息集中在前几维的分布；
+截断效果强依赖真实模型，正式评估请用 --vectors 指定真实 Jina v4 向量（如本地后端的 vectors.npy）。
+
+用法:
+    python -m benchmarks.bench_matryoshka --n 20000 --dim 2048 --dims 64,128,256,512 --factors 5,10,20
+    python -m benchmarks.bench_matryoshka --vectors .cache/vector_index/WENKAI_reading_agent_demo/vectors.npy
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_quantization import recall_at_k, synthetic_corpus
+from src.code.embedding import quantization, similarity
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", default=None, help="真实向量 .npy 文件，未指定时使用合成数据")
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=2048)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dims", default="64,128,256,512,1024", help="截断维度列表")
+    parser.add_argument("--factors", default="5,10,20", help="候选倍数列表")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.vectors:
+        corpus = np.load(args.vectors, mmap_mode="r")
+        corpus = similarity.normalize(corpus[np.any(corpus != 0, axis=1)])
+    else:
+        corpus = synthetic_corpus(args.n, args.dim, args.clusters, args.seed)
+        decay = (1.0 / np.sqrt(1.0 + np.arange(args.dim) / 32.0)).astype(np.float32)
+        corpus = similarity.normalize(corpus * decay)
+    n, dim = corpus.shape
+
+    rng = np.random.default_rng(args.seed + 1)
+    picks = rng.integers(0, n, size=args.queries)
+    noise = similarity.normalize(rng.standard_normal((args.queries, dim)).astype(np.float32))
+    queries = similarity.normalize(corpus[picks] + 0.3 * noise)
+
+    start = time.perf_counter()
+    expected, _ = similarity.top_k_chunked(queries, corpus, args.k)
+    exact_ms = (time.perf_counter() - start) / args.queries * 1000
+
+    full_mb = quantization.bytes_per_vector("none", dim) * n / 2**20
+    print(f"语料: {n} x {dim}  查询: {args.queries}  k={args.k}")
+    print(f"{'截断维度':<8}{'倍数':>6}{'recall@k':>10}{'常驻内存(MB)':>14}{'ms/查询':>10}")
+    print(f"{dim:<12}{'-':>6}{1.0:>10.4f}{full_mb:>14.1f}{exact_ms:>10.2f}")
+
+    for dims in (int(d) for d in args.dims.split(",")):
+        if dims >= dim:
+            continue
+        prefix = quantization.truncate(corpus, dims)
+        memory_mb = quantization.bytes_per_vector("none", dims) * n / 2**20
+        for factor in (int(f) for f in args.factors.split(",")):
+            start = time.perf_counter()
+            found, _ = quantization.search(
+                "none",
+                queries,
+                corpus,
+                args.k,
+                prefix=prefix,
+                prefix_dims=dims,
+                rescore_factor=factor,
+            )
+            elapsed_ms = (time.perf_counter() - start) / args.queries * 1000
+            print(f"{dims:<12}{factor:>6}{recall_at_k(found, expected):>10.4f}{memory_mb:>14.1f}{elapsed_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
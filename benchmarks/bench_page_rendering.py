@@ -0,0 +1,62 @@
+"""
+对比 pdf2image（pdftoppm 子进程）与进程内 PyMuPDF 渲染的耗时
+
+两条路径都输出与改造前相同的结果：RGB 页面经过一次 JPEG 编码。
+未安装 poppler (pdftoppm) 时只测 PyMuPDF。
+
+用法:
+    python -m benchmarks.bench_page_rendering --pdf demo_data/test.pdf --pages 20 --dpi 200
+"""
+import argparse
+import shutil
+import time
+from io import BytesIO
+
+from src.code.rendering.page_renderer import PageRenderer
+
+
+def bench_pdf2image(pdf_path: str, pages: int, dpi: int) -> float:
+    from pdf2image import convert_from_path
+
+    start = time.perf_counter()
+    for page in range(1, pages + 1):
+        img = convert_from_path(pdf_path, dpi=dpi, first_page=page, last_page=page)[0]
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        buffer = BytesIO()
+        img.save(buffer, format="JPEG")
+    return time.perf_counter() - start
+
+
+def bench_pymupdf(pdf_path: str, pages: int, dpi: int) -> float:
+    renderer = PageRenderer(dpi=dpi)
+    start = time.perf_counter()
+    for page in range(1, pages + 1):
+        renderer.render_jpeg(pdf_path, page)
+    elapsed = time.perf_counter() - start
+    renderer.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", default="demo_data/test.pdf")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--dpi", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"文件: {args.pdf}  页数: {args.pages}  DPI: {args.dpi}")
+
+    engines = [("PyMuPDF (in-process)", bench_pymupdf)]
+    if shutil.which("pdftoppm"):
+        engines.insert(0, ("pdf2image (pdftoppm)", bench_pdf2image))
+    else:
+        print("未找到 pdftoppm，跳过 pdf2image")
+
+    for name, bench in engines:
+        elapsed = bench(args.pdf, args.pages, args.dpi)
+        print(f"{name:<22} 总耗时 {elapsed:7.2f}s  每页 {elapsed / args.pages * 1000:7.1f}ms  {args.pages / elapsed:6.2f} 页/秒")
+
+
+if __name__ == "__main__":
+    main()
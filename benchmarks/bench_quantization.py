@@ -0,0 +1,89 @@
+"""
+量化第一轮检索 + 全精度重打分：recall@k 与内存占用对比
+
+以全精度精确检索的 top-k 为基准，统计不同量化方式与重打分倍数下的 recall@k、
+第一轮常驻内存与每次查询耗时。默认使用带聚类结构的合成向量；
+也可以用 --vectors 指定真实向量（如本地后端集合目录下的 vectors.npy）。
+
+用法:
+    python -m benchmarks.bench_quantization --n 20000 --dim 2048 --queries 100 --k 10
+    python -m benchmarks.bench_quantization --vectors .cache/vector_index/WENKAI_reading_agent_demo/vectors.npy
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.code.embedding import quantization, similarity
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """聚类结构的合成向量，比纯随机向量更接近真实 embedding 的分布"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    return similarity.normalize(centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32))
+
+
+def recall_at_k(found: np.ndarray, expected: np.ndarray) -> float:
+    hits = sum(len(set(f.tolist()) & set(e.tolist())) for f, e in zip(found, expected))
+    return hits / expected.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", default=None, help="真实向量 .npy 文件，未指定时使用合成数据")
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=2048)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--factors", default="1,2,4,8,16", help="重打分倍数列表")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.vectors:
+        corpus = np.load(args.vectors, mmap_mode="r")
+        # 本地后端的 vectors.npy 预留了容量，尾部全零行不参与评测
+        corpus = similarity.normalize(corpus[np.any(corpus != 0, axis=1)])
+    else:
+        corpus = synthetic_corpus(args.n, args.dim, args.clusters, args.seed)
+    n, dim = corpus.shape
+
+    rng = np.random.default_rng(args.seed + 1)
+    picks = rng.integers(0, n, size=args.queries)
+    noise = similarity.normalize(rng.standard_normal((args.queries, dim)).astype(np.float32))
+    queries = similarity.normalize(corpus[picks] + 0.3 * noise)
+
+    start = time.perf_counter()
+    expected, _ = similarity.top_k_chunked(queries, corpus, args.k)
+    exact_ms = (time.perf_counter() - start) / args.queries * 1000
+
+    full_mb = quantization.bytes_per_vector("none", dim) * n / 2**20
+    print(f"语料: {n} x {dim}  查询: {args.queries}  k={args.k}")
+    print(f"{'方式':<8}{'倍数':>6}{'recall@k':>10}{'常驻内存(MB)':>14}{'压缩比':>8}{'ms/查询':>10}")
+    print(f"{'none':<8}{'-':>6}{1.0:>10.4f}{full_mb:>14.1f}{1.0:>8.1f}{exact_ms:>10.2f}")
+
+    for kind in ("int8", "binary"):
+        codes = quantization.quantize(kind, corpus)
+        memory_mb = quantization.bytes_per_vector(kind, dim) * n / 2**20
+        for factor in (int(f) for f in args.factors.split(",")):
+            start = time.perf_counter()
+            found, _ = quantization.search(
+                kind,
+                queries,
+                corpus,
+                args.k,
+                codes=codes["codes"],
+                scales=codes.get("scales"),
+                rescore_factor=factor,
+            )
+            elapsed_ms = (time.perf_counter() - start) / args.queries * 1000
+            print(
+                f"{kind:<8}{factor:>6}{recall_at_k(found, expected):>10.4f}"
+                f"{memory_mb:>14.1f}{full_mb / memory_mb:>8.1f}{elapsed_ms:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
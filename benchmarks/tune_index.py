@@ -0,0 +1,213 @@
+"""
+Milvus 索引选型调参工具
+
+给定语料向量与一组样例查询，对每种索引类型 / 构建参数建一个临时集合，
+再扫一遍检索参数，报告相对精确检索的 recall@k、QPS、构建耗时与估算内存，
+选定后把对应配置写入 .env 的 VECTOR_INDEX_TYPE / VECTOR_INDEX_PARAMS / VECTOR_SEARCH_PARAMS。
+"估算内存" 是按索引结构（原始向量、HNSW 邻接表、PQ 码本等）用公式算出的理论值，不是从 Milvus 实测的占用，
+只适合在候选索引之间横向比较；上线前请以 Milvus 监控中的实际内存为准。
+
+语料来源（二选一）:
+    --vectors corpus.npy               本地向量文件
+    --source-collection NAME           从已有 Milvus 集合拉取全部向量
+查询来源（二选一）:
+    --queries queries.npy              查询向量
+    --queries queries.txt              每行一个查询文本，与检索时相同逐条调用 JinaEmbeddingClient.get_embedding_with_retry 编码
+
+用法:
+    python -m benchmarks.tune_index --source-collection WENKAI_reading_agent_demo --queries demo_queries.txt
+    python -m benchmarks.tune_index --vectors corpus.npy --queries queries.npy --grid grid.json --k 10
+
+grid.json 格式（缺省时使用 DEFAULT_GRID）:
+    [{"index_type": "HNSW", "index_params": {"M": 16, "efConstruction": 200}, "search_params": [{"ef": 64}, {"ef": 128}]}]
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.bench_quantization import recall_at_k
+from src.settings import settings
+from src.code.data_base.backends import MilvusBackend
+from src.code.embedding import similarity
+
+DEFAULT_GRID: List[Dict[str, Any]] = [
+    {"index_type": "FLAT", "index_params": {}, "search_params": [{}]},
+    {"index_type": "HNSW", "index_params": {"M": 16, "efConstruction": 200}, "search_params": [{"ef": ef} for ef in (32, 64, 128, 256)]},
+    {"index_type": "HNSW", "index_params": {"M": 32, "efConstruction": 400}, "search_params": [{"ef": ef} for ef in (64, 128, 256)]},
+    {"index_type": "IVF_FLAT", "index_params": {"nlist": 1024}, "search_params": [{"nprobe": p} for p in (8, 16, 32, 64)]},
+    {"index_type": "IVF_PQ", "index_params": {"nlist": 1024, "m": 64, "nbits": 8}, "search_params": [{"nprobe": p} for p in (8, 16, 32, 64)]},
+    {"index_type": "DISKANN", "index_params": {}, "search_params": [{"search_list": s} for s in (20, 50, 100)]},
+]
+
+
+def estimate_memory_mb(index_type: str, index_params: Dict[str, Any], n: int, dim: int) -> Optional[float]:
+    """按索引结构用公式估算常驻内存（理论值，非实测）；DISKANN 主体在磁盘上，AUTOINDEX 由 Milvus 决定，均无法估算"""
+    raw = n * dim * 4
+    if index_type in ("FLAT", "IVF_FLAT"):
+        size = raw + (index_params.get("nlist", 0) * dim * 4)
+    elif index_type == "HNSW":
+        # 第 0 层每个节点 2M 条 int32 邻接边
+        size = raw + n * index_params.get("M", 16) * 2 * 4
+    elif index_type == "IVF_SQ8":
+        size = n * dim + index_params.get("nlist", 0) * dim * 4
+    elif index_type == "IVF_PQ":
+        m, nbits = index_params.get("m", dim // 32), index_params.get("nbits", 8)
+        size = n * m * nbits / 8 + index_params.get("nlist", 0) * dim * 4 + m * (2 ** nbits) * (dim // m) * 4
+    else:
+        return None
+    return size / 2**20
+
+
+def load_corpus(args, backend: MilvusBackend) -> np.ndarray:
+    if args.vectors:
+        return similarity.normalize(np.load(args.vectors))
+    rows = backend.query(args.source_collection, output_fields=["vector"])
+    return similarity.normalize([row["vector"] for row in rows])
+
+
+def load_queries(path: str) -> np.ndarray:
+    if path.endswith(".npy"):
+        return similarity.normalize(np.load(path))
+
+    from src.code.embedding.embedding_model import JinaEmbeddingClient
+
+    from src.code.transport.http_transport import http_transport
+
+    texts = [line.strip() for line in Path(path).read_text(encoding="utf-8").splitlines() if line.strip()]
+    client = JinaEmbeddingClient()
+
+    async def encode_all() -> List[List[float]]:
+        # 与 VectorDatabase.query 相同，逐条调用 get_embedding_with_retry，保证调参用的查询向量与线上一致
+        semaphore = asyncio.Semaphore(client.concurrency)
+
+        async def encode(text: str) -> List[float]:
+            async with semaphore:
+                return await client.get_embedding_with_retry(text)
+
+        await http_transport.startup([client.base_url])
+        try:
+            return await asyncio.gather(*(encode(text) for text in texts))
+        finally:
+            await http_transport.shutdown()
+
+    embeddings = asyncio.run(encode_all())
+    failed = [idx for idx, embedding in enumerate(embeddings) if embedding is None]
+    if failed:
+        raise RuntimeError(f"查询编码失败: {failed}")
+    return similarity.normalize(embeddings)
+
+
+def wait_for_index(backend: MilvusBackend, collection_name: str, n: int, timeout: float = 3600):
+    index_name = f"{backend.first_pass_field}_index"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = backend.client.describe_index(collection_name, index_name=index_name) or {}
+        if info.get("indexed_rows", 0) >= n and info.get("pending_index_rows", 0) == 0:
+            return
+        time.sleep(1)
+    raise TimeoutError(f"索引 {index_name} 构建超时")
+
+
+def run_config(args, config: Dict[str, Any], corpus: np.ndarray, queries: np.ndarray, expected: np.ndarray) -> List[Dict[str, Any]]:
+    index_type, index_params = config["index_type"], config.get("index_params", {})
+    backend = MilvusBackend(
+        uri=args.uri,
+        db_name=args.db_name,
+        quantization="none",
+        prefix_dims=0,
+        index_type=index_type,
+        index_params=index_params,
+    )
+    collection_name = f"tune_{index_type.lower()}_{time.time_ns()}"
+    n, dim = corpus.shape
+    results = []
+    try:
+        start = time.perf_counter()
+        backend.create_collection(collection_name, dim)
+        for offset in range(0, n, args.insert_batch):
+            batch = corpus[offset: offset + args.insert_batch]
+            backend.insert(collection_name, [
+                {"vector": vector.tolist(), "page_index": offset + i, "image_url": ""}
+                for i, vector in enumerate(batch)
+            ])
+        backend.client.flush(collection_name)
+        wait_for_index(backend, collection_name, n)
+        backend.load_collection(collection_name)
+        build_seconds = time.perf_counter() - start
+
+        for search_params in config.get("search_params", [{}]):
+            backend.search_params = dict(search_params)
+            found = np.empty((len(queries), args.k), dtype=np.int64)
+            start = time.perf_counter()
+            for i in range(0, len(queries), args.batch):
+                hits = backend.search(
+                    collection_name,
+                    queries[i: i + args.batch].tolist(),
+                    limit=args.k,
+                    output_fields=["page_index"],
+                )
+                for row, query_hits in enumerate(hits):
+                    ids = [hit["entity"]["page_index"] for hit in query_hits]
+                    found[i + row] = (ids + [-1] * args.k)[: args.k]
+            elapsed = time.perf_counter() - start
+            results.append({
+                "index_type": index_type,
+                "index_params": index_params,
+                "search_params": search_params,
+                "recall": recall_at_k(found, expected),
+                "qps": len(queries) / elapsed,
+                "build_seconds": build_seconds,
+                "memory_mb": estimate_memory_mb(index_type, index_params, n, dim),
+            })
+    finally:
+        backend.drop_collection(collection_name)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--vectors", help="语料向量 .npy 文件")
+    source.add_argument("--source-collection", help="从已有 Milvus 集合拉取语料向量")
+    parser.add_argument("--queries", required=True, help="查询向量 .npy 或每行一个查询的 .txt")
+    parser.add_argument("--grid", default=None, help="参数网格 JSON 文件，缺省使用 DEFAULT_GRID")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=1, help="每次检索请求的查询数，1 为逐条请求测延迟")
+    parser.add_argument("--insert-batch", type=int, default=1000)
+    parser.add_argument("--uri", default=settings.VECTOR_DATABASE_URI)
+    parser.add_argument("--db-name", default=settings.VECTOR_DATABASE_NAME)
+    parser.add_argument("--output", default=None, help="结果另存为 JSON")
+    args = parser.parse_args()
+
+    grid = json.loads(Path(args.grid).read_text(encoding="utf-8")) if args.grid else DEFAULT_GRID
+    reader = MilvusBackend(uri=args.uri, db_name=args.db_name, quantization="none", prefix_dims=0)
+    corpus = load_corpus(args, reader)
+    queries = load_queries(args.queries)
+    expected, _ = similarity.top_k_chunked(queries, corpus, args.k)
+    print(f"语料: {corpus.shape[0]} x {corpus.shape[1]}  查询: {len(queries)}  k={args.k}")
+
+    results = []
+    for config in grid:
+        if config["index_type"] == "IVF_PQ" and corpus.shape[1] % config.get("index_params", {}).get("m", 1):
+            print(f"跳过 IVF_PQ {config['index_params']}：m 必须整除向量维度 {corpus.shape[1]}")
+            continue
+        results.extend(run_config(args, config, corpus, queries, expected))
+
+    print(f"{'索引':<10}{'构建参数':<34}{'检索参数':<22}{'recall@k':>10}{'QPS':>10}{'构建(s)':>10}{'估算内存(MB)':>14}")
+    for r in sorted(results, key=lambda r: (-r["recall"], -r["qps"])):
+        memory = "-" if r["memory_mb"] is None else f"{r['memory_mb']:.1f}"
+        print(
+            f"{r['index_type']:<10}{json.dumps(r['index_params']):<34}{json.dumps(r['search_params']):<22}"
+            f"{r['recall']:>10.4f}{r['qps']:>10.1f}{r['build_seconds']:>10.1f}{memory:>14}"
+        )
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
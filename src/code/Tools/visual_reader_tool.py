@@ -6,8 +6,8 @@ from typing import Callable, List
 from src.settings import settings
 from loguru import logger
 from PIL import Image
-from pdf2image import convert_from_path
-from io import BytesIO
+from src.code.rendering.page_renderer import PageRenderer
+from src.code.rendering.page_cache import RenderedPageCache
 
 from camel.toolkits import FunctionTool
 from camel.agents import ChatAgent
@@ -17,6 +17,14 @@ from camel.types import ModelPlatformType, ModelType
 
 logger = logger.bind(module="visual_reader_tool")
 
+# Agent 会反复读取相同章节，带缓存的渲染器让重复读取同一页时跳过渲染
+page_renderer = PageRenderer(
+    cache=RenderedPageCache(
+        max_bytes=settings.RENDERED_PAGE_CACHE_MAX_MB * 1024 * 1024,
+        disk_dir=settings.RENDERED_PAGE_CACHE_DIR or None,
+    )
+)
+
 class VisualReaderTool:
 
     def __init__(self):
@@ -33,27 +41,14 @@ class VisualReaderTool:
 
     def _get_page_image(self, image_path: str, first_page: int, last_page: int) -> List[Image.Image]:
         try:
-            images = convert_from_path(image_path, first_page=first_page, last_page=last_page)
+            # PyMuPDF 直接按 RGB 渲染并输出 JPEG，无需再转换颜色模式或二次编码
+            images = page_renderer.render_images(image_path, first_page=first_page, last_page=last_page)
             
             if not images:
                 logger.error(f"转换PDF页面为图像时未获取到任何图像: {image_path} 第 {first_page}-{last_page} 页")
                 return [] 
 
-            processed_images = []
-
-            for img in images:
-                # 步骤 A: 确保颜色模式是 RGB (防止 CMYK 导致保存 JPEG 失败)
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                buffer = BytesIO()
-                img.save(buffer, format='JPEG')
-                buffer.seek(0)
-                
-                new_img = Image.open(buffer)
-                processed_images.append(new_img)
-            
-            return processed_images
+            return images
 
         except Exception as e:
             logger.error(f"PDF转图片异常: {e}")
@@ -0,0 +1,694 @@
+"""
+向量数据库后端
+VectorDatabase 通过 VectorBackend 接口访问存储，内置两种实现：
+- MilvusBackend: 基于 MilvusClient 的远程向量库
+- LocalFlatBackend: 本地内存映射的扁平索引，无需启动 Milvus，适用于单元测试、笔记本与小规模单文档部署
+
+检索结果统一使用 Milvus 的命中格式: {"id": ..., "distance": ..., "entity": {...}}，distance 为余弦相似度（越大越相似）
+"""
+import json
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from loguru import logger
+from pymilvus import DataType, MilvusClient
+
+from src.settings import settings
+from src.code.embedding import quantization as vector_quantization
+from src.code.embedding import similarity
+
+logger = logger.bind(module="rag_database")
+
+# Milvus 单次检索 topK 的上限
+MILVUS_MAX_TOP_K = 16384
+
+# Milvus 支持配置的索引类型；其余类型也会原样透传给 Milvus
+MILVUS_INDEX_TYPES = ("AUTOINDEX", "FLAT", "HNSW", "IVF_FLAT", "IVF_SQ8", "IVF_PQ", "IVF_RABITQ", "DISKANN")
+
+# 量化模式下未显式配置索引类型（即 AUTOINDEX）时，Milvus 第一轮检索使用的索引类型与构建/检索参数
+MILVUS_QUANTIZED_INDEXES = {
+    "int8": ("IVF_SQ8", {"nlist": 1024}),
+    "binary": ("IVF_RABITQ", {"nlist": 1024}),
+}
+MILVUS_QUANTIZED_SEARCH_PARAMS = {
+    "int8": {"nprobe": 32},
+    "binary": {"nprobe": 32, "rbq_query_bits": 0},
+}
+
+
+class VectorBackend(ABC):
+    """向量存储后端接口"""
+
+    @abstractmethod
+    def has_collection(self, collection_name: str) -> bool: ...
+
+    @abstractmethod
+    def list_collections(self) -> List[str]: ...
+
+    @abstractmethod
+    def create_collection(self, collection_name: str, vector_dim: int): ...
+
+    @abstractmethod
+    def drop_collection(self, collection_name: str): ...
+
+    @abstractmethod
+    def load_collection(self, collection_name: str): ...
+
+    @abstractmethod
+    def insert(self, collection_name: str, rows: List[Dict[str, Any]]) -> int:
+        """插入行数据，返回插入条数"""
+
+    @abstractmethod
+    def delete(self, collection_name: str, *, field: str, values: List[Any]) -> int:
+        """删除 `field in values` 的行，返回删除条数"""
+
+    @abstractmethod
+    def search(
+            self,
+            collection_name: str,
+            vectors: List[List[float]],
+            limit: int,
+            output_fields: List[str],
+            ) -> List[List[Dict[str, Any]]]:
+        """对每个查询向量返回按相似度降序排列的命中列表"""
+
+    @abstractmethod
+    def query(
+            self,
+            collection_name: str,
+            *,
+            field: str = None,
+            values: List[Any] = None,
+            output_fields: List[str],
+            limit: int = None,
+            ) -> List[Dict[str, Any]]:
+        """按 `field in values` 精确过滤标量字段；field 为空时返回全部行"""
+
+
+class MilvusBackend(VectorBackend):
+    """
+    两阶段检索（quantization 不为 none 或 prefix_dims > 0）时开启 mmap，原始向量留在磁盘上，
+    第一轮取 limit * rescore_factor 个候选（不超过 Milvus 的 topK 上限 16384）并带回原始向量，在客户端精确重打分：
+    - quantization: 第一轮向量字段建量化索引（int8 -> IVF_SQ8，binary -> IVF_RABITQ）
+    - prefix_dims: 额外存一个 Matryoshka 截断的 vector_short 字段作为第一轮向量字段，全量向量只建 FLAT 索引
+    两项设置以集合实际的字段与索引为准：load_collection 时从 describe_collection / describe_index 读取，
+    与配置不一致时告警并按集合执行。
+    index_type / index_params 决定第一轮向量字段的索引，search_params 在每次检索时传给 Milvus。
+    """
+
+    def __init__(
+            self,
+            uri: str,
+            db_name: str,
+            quantization: str = None,
+            rescore_factor: int = None,
+            prefix_dims: int = None,
+            index_type: str = None,
+            index_params: Dict[str, Any] = None,
+            search_params: Dict[str, Any] = None,
+            ):
+        self.client = MilvusClient(
+            uri=uri,
+            db_name=db_name,
+        )
+        self.quantization = vector_quantization.check_quantization(quantization or settings.VECTOR_QUANTIZATION)
+        self.index_type = (index_type or settings.VECTOR_INDEX_TYPE).upper()
+        if self.index_type not in MILVUS_INDEX_TYPES:
+            logger.warning(f"索引类型 {self.index_type} 不在已验证列表 {MILVUS_INDEX_TYPES} 中，将原样传给 Milvus")
+        self.index_params = dict(settings.VECTOR_INDEX_PARAMS if index_params is None else index_params)
+        self.search_params = dict(settings.VECTOR_SEARCH_PARAMS if search_params is None else search_params)
+        if self.quantization != "none" and self.index_type == "AUTOINDEX":
+            self.index_type, default_params = MILVUS_QUANTIZED_INDEXES[self.quantization]
+            self.index_params = {**default_params, **self.index_params}
+            self.search_params = {**MILVUS_QUANTIZED_SEARCH_PARAMS[self.quantization], **self.search_params}
+        self.prefix_dims = settings.VECTOR_MATRYOSHKA_DIMS if prefix_dims is None else prefix_dims
+        self._configured_rescore_factor = rescore_factor
+        self.rescore_factor = self._default_rescore_factor() if rescore_factor is None else rescore_factor
+
+    def _default_rescore_factor(self) -> int:
+        return settings.VECTOR_MATRYOSHKA_RESCORE_FACTOR if self.prefix_dims else settings.VECTOR_QUANTIZATION_RESCORE_FACTOR
+
+    @property
+    def two_stage(self) -> bool:
+        return self.quantization != "none" or bool(self.prefix_dims)
+
+    @property
+    def first_pass_field(self) -> str:
+        return "vector_short" if self.prefix_dims else "vector"
+
+    def has_collection(self, collection_name: str) -> bool:
+        return self.client.has_collection(collection_name)
+
+    def list_collections(self) -> List[str]:
+        return self.client.list_collections()
+
+    def create_collection(self, collection_name: str, vector_dim: int):
+        schema = self.client.create_schema(
+            auto_id = True,
+            enable_dynamic_field = True,# 允许以后存点别的杂七杂八的 metadata
+            description = "KIAEr文档定位Agent索引",
+        )
+
+        #核心字段
+        schema.add_field(
+            field_name="id",
+            datatype = DataType.INT64,
+            is_primary = True,
+            description = "文档唯一标识符,由Milvus自动生成",
+        )
+
+        schema.add_field(
+            field_name="vector",
+            datatype=DataType.FLOAT_VECTOR,
+            dim = vector_dim,
+            description="文档向量",
+        )
+
+        if self.prefix_dims:
+            if not 0 < self.prefix_dims < vector_dim:
+                raise ValueError(f"Matryoshka 截断维度 {self.prefix_dims} 必须小于向量维度 {vector_dim}")
+            schema.add_field(
+                field_name="vector_short",
+                datatype=DataType.FLOAT_VECTOR,
+                dim=self.prefix_dims,
+                description="Matryoshka 截断的短向量，用于第一轮检索",
+            )
+
+
+        #业务元数据（Scalar Fields）
+        schema.add_field(
+            field_name="page_index",
+            datatype= DataType.INT64,
+        )
+
+        schema.add_field(
+            field_name="image_url",
+            datatype= DataType.VARCHAR,
+            max_length=256,
+        )
+
+        # 增量入库使用：文档 id 与页面内容哈希，其他写入方可以不填
+        schema.add_field(
+            field_name="doc_id",
+            datatype=DataType.VARCHAR,
+            max_length=256,
+            nullable=True,
+        )
+
+        schema.add_field(
+            field_name="content_hash",
+            datatype=DataType.VARCHAR,
+            max_length=64,
+            nullable=True,
+        )
+
+        properties = {"allow_insert_auto_id": "true"}
+        if self.two_stage:
+            # 原始向量只在重打分时按需读取，走 mmap 不常驻内存
+            properties["mmap.enabled"] = "true"
+        self.client.create_collection(
+            collection_name=collection_name,
+            schema=schema,
+            properties=properties,
+        )
+
+        index_params = self.client.prepare_index_params()
+        index_params.add_index(
+            field_name=self.first_pass_field,
+            metric_type="COSINE",
+            index_type=self.index_type,
+            index_name=f"{self.first_pass_field}_index",
+            params=self.index_params,
+        )
+        if self.prefix_dims:
+            # 全量向量只用于按主键取回后重打分，FLAT 索引不需要构建，配合 mmap 不占常驻内存
+            index_params.add_index(
+                field_name="vector",
+                metric_type="COSINE",
+                index_type="FLAT",
+                index_name="vector_index",
+            )
+
+        self.client.create_index(
+            collection_name=collection_name,
+            index_params=index_params
+        )
+
+    def drop_collection(self, collection_name: str):
+        self.client.drop_collection(collection_name)
+
+    def load_collection(self, collection_name: str):
+        self._sync_layout(collection_name)
+        self.client.load_collection(collection_name)
+
+    def _sync_layout(self, collection_name: str):
+        """
+        按集合实际结构更新 prefix_dims 与 quantization：
+        - 有 vector_short 字段时 prefix_dims 为其维度，否则为 0
+        - 第一轮向量字段的索引为 IVF_SQ8 / IVF_RABITQ 时对应 int8 / binary，其他索引类型视为未量化
+        """
+        description = self.client.describe_collection(collection_name)
+        fields = {field["name"]: field for field in description.get("fields", [])}
+        short = fields.get("vector_short")
+        prefix_dims = int(short["params"]["dim"]) if short else 0
+        if prefix_dims != self.prefix_dims:
+            logger.warning(f"集合 {collection_name} 的 Matryoshka 截断维度为 {prefix_dims}，与配置 {self.prefix_dims} 不一致，按集合执行")
+            self.prefix_dims = prefix_dims
+            if self._configured_rescore_factor is None:
+                self.rescore_factor = self._default_rescore_factor()
+
+        try:
+            index = self.client.describe_index(collection_name, index_name=f"{self.first_pass_field}_index") or {}
+        except Exception as e:
+            logger.warning(f"读取集合 {collection_name} 的索引信息失败，量化模式沿用配置 {self.quantization}：{e}")
+            return
+        index_type = str(index.get("index_type", "")).upper()
+        if not index_type:
+            return
+        quantization = next((name for name, (quantized_type, _) in MILVUS_QUANTIZED_INDEXES.items() if quantized_type == index_type), "none")
+        if quantization != self.quantization:
+            logger.warning(f"集合 {collection_name} 的第一轮索引为 {index_type}（量化模式 {quantization}），与配置 {self.quantization} 不一致，按集合执行")
+            self.quantization = quantization
+            if quantization != "none":
+                self.search_params = {**MILVUS_QUANTIZED_SEARCH_PARAMS[quantization], **self.search_params}
+
+    def insert(self, collection_name: str, rows: List[Dict[str, Any]]) -> int:
+        if self.prefix_dims and rows:
+            short = vector_quantization.truncate([row["vector"] for row in rows], self.prefix_dims)
+            rows = [{**row, "vector_short": vector.tolist()} for row, vector in zip(rows, short)]
+        result = self.client.insert(
+            collection_name=collection_name,
+            data=rows,
+        )
+        return result.get("insert_count", len(rows)) if isinstance(result, dict) else result
+
+    def delete(self, collection_name: str, *, field: str, values: List[Any]) -> int:
+        if not values:
+            return 0
+        result = self.client.delete(
+            collection_name=collection_name,
+            filter=f"{field} in {json.dumps(list(values), ensure_ascii=False)}",
+        )
+        return result.get("delete_count", 0) if isinstance(result, dict) else result
+
+    def search(self, collection_name, vectors, limit, output_fields):
+        if not self.two_stage:
+            return self.client.search(
+                collection_name=collection_name,
+                data=vectors,
+                limit=limit,
+                output_fields=output_fields,
+                search_params={"params": self.search_params},
+            )
+
+        first_queries = vector_quantization.truncate(vectors, self.prefix_dims).tolist() if self.prefix_dims else vectors
+        candidates = self.client.search(
+            collection_name=collection_name,
+            data=first_queries,
+            anns_field=self.first_pass_field,
+            limit=min(limit * self.rescore_factor, MILVUS_MAX_TOP_K),
+            output_fields=list(dict.fromkeys([*output_fields, "vector"])),
+            search_params={"params": self.search_params},
+        )
+        results = []
+        for query, hits in zip(similarity.normalize(vectors), candidates):
+            if not hits:
+                results.append([])
+                continue
+            entities = [dict(hit["entity"]) for hit in hits]
+            exact = similarity.normalize([entity["vector"] for entity in entities]) @ query
+            order, values = similarity.top_k(exact, limit)
+            rescored = []
+            for idx, value in zip(order.tolist(), values.tolist()):
+                entity = entities[idx]
+                if "vector" not in output_fields:
+                    entity.pop("vector")
+                rescored.append({"id": hits[idx]["id"], "distance": value, "entity": entity})
+            results.append(rescored)
+        return results
+
+    def query(self, collection_name, *, field=None, values=None, output_fields, limit=None):
+        if field is not None:
+            filter_expr = f"{field} in {json.dumps(list(values), ensure_ascii=False)}"
+        else:
+            filter_expr = "id >= 0"
+
+        if limit is not None:
+            return self.client.query(
+                collection_name=collection_name,
+                filter=filter_expr,
+                output_fields=output_fields,
+                limit=limit,
+            )
+
+        # 不限条数时用迭代器分批拉取，绕开单次 query 的条数上限
+        rows = []
+        iterator = self.client.query_iterator(
+            collection_name=collection_name,
+            batch_size=1000,
+            filter=filter_expr,
+            output_fields=output_fields,
+        )
+        while True:
+            batch = iterator.next()
+            if not batch:
+                iterator.close()
+                break
+            rows.extend(batch)
+        return rows
+
+
+class _LocalCollection:
+    """
+    单个本地集合：
+    - vectors.npy: 内存映射的 float32 矩阵 (capacity, dim)，行向量已做 L2 归一化，前 count 行有效
+    - prefix.npy: Matryoshka 截断后重新归一化的 float32 短向量 (capacity, prefix_dims)，仅 prefix_dims > 0 且未量化时存在
+    - codes.npy / scales.npy: 第一轮向量（短向量或全量向量）的量化码与 int8 的每行缩放系数，仅 quantization 不为 none 时存在
+    - meta.json: 紧凑的列式元数据 {"dim", "count", "next_id", "quantization", "prefix_dims", "columns": {字段名: [值, ...]}}
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dim: int = meta["dim"]
+        self.count: int = meta["count"]
+        self.next_id: int = meta["next_id"]
+        self.quantization: str = meta.get("quantization", "none")
+        self.prefix_dims: int = meta.get("prefix_dims", 0)
+        self.columns: Dict[str, List[Any]] = meta["columns"]
+        self.arrays: Dict[str, np.memmap] = {
+            name: np.load(path / f"{name}.npy", mmap_mode="r+")
+            for name in self._array_specs(self.dim, self.quantization, self.prefix_dims)
+        }
+
+    @staticmethod
+    def _array_specs(dim: int, quantization: str, prefix_dims: int) -> Dict[str, Tuple[int, np.dtype]]:
+        """每个数组文件的 (列数, dtype)"""
+        specs = {"vectors": (dim, np.dtype(np.float32))}
+        if prefix_dims and quantization == "none":
+            specs["prefix"] = (prefix_dims, np.dtype(np.float32))
+        code = vector_quantization.code_shape(quantization, prefix_dims or dim)
+        if code is not None:
+            specs["codes"] = code
+        if quantization == "int8":
+            specs["scales"] = (1, np.dtype(np.float32))
+        return specs
+
+    @classmethod
+    def create(
+            cls,
+            path: Path,
+            dim: int,
+            quantization: str = "none",
+            prefix_dims: int = 0,
+            capacity: int = 1024,
+            ) -> "_LocalCollection":
+        if prefix_dims and not 0 < prefix_dims < dim:
+            raise ValueError(f"Matryoshka 截断维度 {prefix_dims} 必须小于向量维度 {dim}")
+        path.mkdir(parents=True, exist_ok=False)
+        for name, (columns, dtype) in cls._array_specs(dim, quantization, prefix_dims).items():
+            np.lib.format.open_memmap(path / f"{name}.npy", mode="w+", dtype=dtype, shape=(capacity, columns)).flush()
+        _write_json(
+            path / "meta.json",
+            {
+                "dim": dim,
+                "count": 0,
+                "next_id": 0,
+                "quantization": quantization,
+                "prefix_dims": prefix_dims,
+                "columns": {"id": []},
+            },
+        )
+        return cls(path)
+
+    @property
+    def vectors(self) -> np.memmap:
+        return self.arrays["vectors"]
+
+    def _ensure_capacity(self, needed: int):
+        capacity = self.vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        for name, array in list(self.arrays.items()):
+            tmp_path = self.path / f"{name}.npy.tmp"
+            grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=array.dtype, shape=(new_capacity, array.shape[1]))
+            grown[: self.count] = array[: self.count]
+            grown.flush()
+            del grown
+            array._mmap.close()
+            os.replace(tmp_path, self.path / f"{name}.npy")
+            self.arrays[name] = np.load(self.path / f"{name}.npy", mmap_mode="r+")
+
+    def insert(self, rows: List[Dict[str, Any]]) -> int:
+        if not rows:
+            return 0
+        matrix = np.asarray([row["vector"] for row in rows], dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[1] != self.dim:
+            raise ValueError(f"向量维度 {matrix.shape[1:]} 与集合维度 {self.dim} 不一致")
+        matrix = similarity.normalize(matrix)
+
+        start = self.count
+        end = start + len(rows)
+        self._ensure_capacity(end)
+        self.vectors[start: end] = matrix
+        first_pass = vector_quantization.truncate(matrix, self.prefix_dims) if self.prefix_dims else matrix
+        if self.quantization != "none":
+            for name, values in vector_quantization.quantize(self.quantization, first_pass).items():
+                self.arrays[name][start: end] = values
+        elif self.prefix_dims:
+            self.arrays["prefix"][start: end] = first_pass
+        for array in self.arrays.values():
+            array.flush()
+
+        for offset, row in enumerate(rows):
+            row_id = row.get("id")
+            if row_id is None:
+                row_id = self.next_id
+            self.next_id = max(self.next_id, row_id + 1)
+            for name in row:
+                if name not in ("id", "vector") and name not in self.columns:
+                    self.columns[name] = [None] * (start + offset)
+            self.columns["id"].append(row_id)
+            for name, column in self.columns.items():
+                if name != "id":
+                    column.append(row.get(name))
+
+        # 先写向量再写元数据，崩溃时 count 不会指向未写入的行
+        self.count = end
+        self.save_meta()
+        return len(rows)
+
+    def delete(self, field: str, values: List[Any]) -> int:
+        """删除 `field in values` 的行：删除只在重新入库时发生，直接把保留的行前移压实"""
+        column = self.columns.get(field)
+        if column is None or not values:
+            return 0
+        wanted = set(values)
+        keep = np.fromiter((value not in wanted for value in column), dtype=bool, count=self.count)
+        deleted = int(self.count - keep.sum())
+        if deleted == 0:
+            return 0
+
+        kept_rows = np.flatnonzero(keep)
+        for array in self.arrays.values():
+            array[: len(kept_rows)] = array[kept_rows]
+            array.flush()
+        for name, column_values in self.columns.items():
+            self.columns[name] = [column_values[idx] for idx in kept_rows.tolist()]
+        self.count = len(kept_rows)
+        self.save_meta()
+        return deleted
+
+    def search(self, queries: np.ndarray, limit: int, rescore_factor: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        first_pass = {
+            name: self.arrays[name][: self.count]
+            for name in ("codes", "scales", "prefix")
+            if name in self.arrays
+        }
+        return vector_quantization.search(
+            self.quantization,
+            queries,
+            self.vectors[: self.count],
+            limit,
+            prefix_dims=self.prefix_dims,
+            rescore_factor=rescore_factor,
+            **first_pass,
+        )
+
+    def save_meta(self):
+        _write_json(
+            self.path / "meta.json",
+            {
+                "dim": self.dim,
+                "count": self.count,
+                "next_id": self.next_id,
+                "quantization": self.quantization,
+                "prefix_dims": self.prefix_dims,
+                "columns": self.columns,
+            },
+        )
+
+    def row(self, idx: int, output_fields: List[str]) -> Dict[str, Any]:
+        entity = {}
+        for name in output_fields:
+            if name == "vector":
+                entity["vector"] = self.vectors[idx].tolist()
+            elif name in self.columns:
+                entity[name] = self.columns[name][idx]
+        return entity
+
+    def close(self):
+        for array in self.arrays.values():
+            array._mmap.close()
+
+
+class LocalFlatBackend(VectorBackend):
+    """
+    本地扁平索引后端，检索为分块矩阵乘 + argpartition 的精确 top-k（见 similarity.top_k_chunked）。
+    每个集合一个子目录，写入即落盘，重新打开时直接内存映射向量文件。
+    quantization 与 prefix_dims 只影响新建的集合；已有集合沿用创建时记录在 meta.json 中的设置。
+    """
+
+    def __init__(
+            self,
+            root_dir: Union[str, Path],
+            quantization: str = None,
+            rescore_factor: int = None,
+            prefix_dims: int = None,
+            ):
+        self.root_dir = Path(root_dir)
+        self.quantization = vector_quantization.check_quantization(quantization or settings.VECTOR_QUANTIZATION)
+        self.prefix_dims = settings.VECTOR_MATRYOSHKA_DIMS if prefix_dims is None else prefix_dims
+        # 未显式指定时由 quantization.search 按第一轮类型选择对应的默认倍数
+        self.rescore_factor = rescore_factor
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self._collections: Dict[str, _LocalCollection] = {}
+        self._lock = threading.RLock()
+
+    def _collection(self, collection_name: str) -> _LocalCollection:
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is None:
+                path = self.root_dir / collection_name
+                if not (path / "meta.json").exists():
+                    raise ValueError(f"collection {collection_name} 不存在")
+                collection = _LocalCollection(path)
+                self._collections[collection_name] = collection
+            return collection
+
+    def has_collection(self, collection_name: str) -> bool:
+        return (self.root_dir / collection_name / "meta.json").exists()
+
+    def list_collections(self) -> List[str]:
+        return sorted(p.name for p in self.root_dir.iterdir() if (p / "meta.json").exists())
+
+    def create_collection(self, collection_name: str, vector_dim: int):
+        with self._lock:
+            self._collections[collection_name] = _LocalCollection.create(
+                self.root_dir / collection_name,
+                vector_dim,
+                quantization=self.quantization,
+                prefix_dims=self.prefix_dims,
+            )
+
+    def drop_collection(self, collection_name: str):
+        with self._lock:
+            collection = self._collections.pop(collection_name, None)
+            if collection is not None:
+                collection.close()
+            shutil.rmtree(self.root_dir / collection_name, ignore_errors=True)
+
+    def load_collection(self, collection_name: str):
+        self._collection(collection_name)
+
+    def insert(self, collection_name: str, rows: List[Dict[str, Any]]) -> int:
+        with self._lock:
+            return self._collection(collection_name).insert(rows)
+
+    def delete(self, collection_name: str, *, field: str, values: List[Any]) -> int:
+        with self._lock:
+            return self._collection(collection_name).delete(field, values)
+
+    def search(self, collection_name, vectors, limit, output_fields):
+        with self._lock:
+            collection = self._collection(collection_name)
+            indices, scores = collection.search(similarity.normalize(vectors), limit, self.rescore_factor)
+            return [
+                [
+                    {
+                        "id": collection.columns["id"][idx],
+                        "distance": float(value),
+                        "entity": collection.row(idx, output_fields),
+                    }
+                    for idx, value in zip(row_indices.tolist(), row_scores.tolist())
+                ]
+                for row_indices, row_scores in zip(indices, scores)
+            ]
+
+    def query(self, collection_name, *, field=None, values=None, output_fields, limit=None):
+        with self._lock:
+            collection = self._collection(collection_name)
+            if field is None:
+                indexes = range(collection.count)
+            else:
+                column = collection.columns.get(field, [None] * collection.count)
+                wanted = set(values)
+                indexes = [idx for idx, value in enumerate(column) if value in wanted]
+
+            rows = []
+            for idx in indexes:
+                if limit is not None and len(rows) >= limit:
+                    break
+                row = collection.row(idx, output_fields)
+                row["id"] = collection.columns["id"][idx]
+                rows.append(row)
+            return rows
+
+
+def create_backend(
+        kind: str = None,
+        *,
+        uri: str = None,
+        db_name: str = None,
+        local_path: str = None,
+        quantization: str = None,
+        prefix_dims: int = None,
+        index_type: str = None,
+        index_params: Dict[str, Any] = None,
+        search_params: Dict[str, Any] = None,
+        ) -> VectorBackend:
+    """根据配置创建后端：milvus（默认）或 local；索引相关参数只对 Milvus 生效"""
+    kind = (kind or settings.VECTOR_DATABASE_BACKEND).lower()
+    if kind == "milvus":
+        return MilvusBackend(
+            uri=uri or settings.VECTOR_DATABASE_URI,
+            db_name=db_name or settings.VECTOR_DATABASE_NAME,
+            quantization=quantization,
+            prefix_dims=prefix_dims,
+            index_type=index_type,
+            index_params=index_params,
+            search_params=search_params,
+        )
+    if kind == "local":
+        if index_type and index_type.upper() not in ("AUTOINDEX", "FLAT"):
+            logger.info(f"本地后端为精确扁平检索，忽略索引类型 {index_type}")
+        return LocalFlatBackend(
+            local_path or settings.VECTOR_DATABASE_LOCAL_PATH,
+            quantization=quantization,
+            prefix_dims=prefix_dims,
+        )
+    raise ValueError(f"不支持的向量数据库后端: {kind}，可选 milvus / local")
+
+
+def _write_json(path: Path, data: Dict[str, Any]):
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
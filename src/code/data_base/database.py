@@ -1,15 +1,22 @@
 import os
 import sys
-from typing import List, Optional, Any, Dict, Callable, Union
+from typing import List, Optional, Any, Awaitable, Dict, Callable, Iterable, Union
 from pydantic import BaseModel, Field
 from loguru import logger
 from pathlib import Path
-from pymilvus import MilvusClient, DataType
 import numpy as np
 import uuid
+from dataclasses import dataclass
 import asyncio
+import functools
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
 from src.settings import settings
-from src.code.embedding.embedding_model import JinaEmbeddingClient, convert_from_path, convert_to_jpeg
+from PIL import Image
+from src.code.embedding.embedding_model import JinaEmbeddingClient
+from src.code.data_base.backends import VectorBackend, create_backend
+from src.code.rendering.image_store import PageImageStore, page_image_store, store_page_worker
+from src.code.rendering.page_renderer import page_hashes_worker, page_renderer
 
 logger = logger.bind(module="rag_database")
 
@@ -22,8 +29,44 @@ class VectorSchema(BaseModel):
     vector: List[float]
     page_index: Optional[int]
     image_url: Optional[str]= Field(default=None, description="图片的URL")
+    doc_id: Optional[str] = Field(default=None, description="所属文档 id，增量入库时按文档比对")
+    content_hash: Optional[str] = Field(default=None, description="页面内容哈希，未变化的页面不重新嵌入")
     metadata: Optional[Dict[str, Any]] = Field(default=None, description="附加的元数据字段")
 
+# 检索默认只投影业务字段，向量（2048 维约 8KB/条）只在调用方显式要求时返回
+DEFAULT_OUTPUT_FIELDS = ["page_index", "image_url"]
+
+@dataclass(slots=True)
+class SearchHit:
+    """检索命中的轻量结果对象"""
+    id: int
+    score: float
+    page_index: Optional[int] = None
+    image_url: Optional[str] = None
+    vector: Optional[List[float]] = None
+    extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_milvus(cls, hit: Dict[str, Any]) -> "SearchHit":
+        entity = dict(hit.get("entity") or {})
+        return cls(
+            id=hit.get("id"),
+            score=hit.get("distance"),
+            page_index=entity.pop("page_index", None),
+            image_url=entity.pop("image_url", None),
+            vector=entity.pop("vector", None),
+            extra=entity or None,
+        )
+
+@dataclass(slots=True)
+class IngestResult:
+    """一次（增量）入库的统计"""
+    doc_id: str
+    total_pages: int
+    inserted: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+
 class VectorDatabase:
     def __init__(
             self,
@@ -34,183 +77,455 @@ class VectorDatabase:
             vlm= None,
             collection_name: str = COLLECTION_NAME,
             vector_dim: int = settings.JINA_EMBEDDING_MODEL_DIMS,
+            embedding_concurrency: int = settings.JINA_EMBEDDING_CONCURRENCY,
+            insert_chunk_size: int = settings.INGEST_INSERT_CHUNK_SIZE,
+            use_page_map: bool = settings.VECTOR_DATABASE_PAGE_MAP_ENABLED,
+            executor_workers: int = settings.VECTOR_DATABASE_EXECUTOR_WORKERS,
+            output_fields: List[str] = None,
+            matryoshka_dims: int = settings.VECTOR_MATRYOSHKA_DIMS,
+            index_type: str = settings.VECTOR_INDEX_TYPE,
+            index_params: Dict[str, Any] = None,
+            search_params: Dict[str, Any] = None,
+            backend: VectorBackend = None,
+            image_store: PageImageStore = None,
             ):
 
         self.embedding_func = embedding_func
-        self.client = MilvusClient(
+        self.embedding_concurrency = max(1, embedding_concurrency)
+        # 入库时每攒够 insert_chunk_size 页就写一次库，与后续页面的嵌入重叠进行
+        self.insert_chunk_size = max(1, insert_chunk_size)
+        # 未显式传入后端时按 VECTOR_DATABASE_BACKEND 创建（默认 Milvus）
+        # matryoshka_dims > 0 时新建的集合额外存储截断短向量，query 先在短向量上宽召回再用全量向量重排
+        # index_type / index_params / search_params 为空时读取 VECTOR_INDEX_* 与 VECTOR_SEARCH_PARAMS 配置
+        # 入库时页面图片写入按内容寻址的图片库，image_url 记录其中的真实路径
+        self.image_store = image_store or page_image_store
+        self.backend = backend or create_backend(
             uri=uri,
             db_name=db_name,
+            prefix_dims=matryoshka_dims,
+            index_type=index_type,
+            index_params=index_params,
+            search_params=search_params,
         )
         self.vector_dim = vector_dim
+        self.output_fields = list(output_fields or DEFAULT_OUTPUT_FIELDS)
+
+        # 后端均为同步接口，异步路径上的调用统一放到专用线程池执行，避免阻塞事件循环
+        self._executor = ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix="milvus")
+
+        # 每个集合的 image_url -> {doc_id: page_index} 映射，首次使用时整体加载，插入或删除集合后失效
+        self.use_page_map = use_page_map
+        self._page_maps: Dict[str, Dict[str, Dict[Optional[str], int]]] = {}
 
         if self.has_collection(collection_name):
-            self.client.load_collection(collection_name)
+            self.backend.load_collection(collection_name)
 
     def create_collection(self, collection_name: str):
-        logger.info(f"KAIEr:创建Milvus集合: {collection_name}")
+        logger.info(f"KAIEr:创建集合: {collection_name}")
         
         if self.has_collection(collection_name):
             raise ValueError(f"collection{collection_name}已存在，无法创建。")
         
-        schema = self.client.create_schema(
-            auto_id = True,
-            enable_dynamic_field = True,# 允许以后存点别的杂七杂八的 metadata
-            description = "KIAEr文档定位Agent索引",
-        )
-
-        #核心字段
-        schema.add_field(
-            field_name="id",
-            datatype = DataType.INT64,
-            is_primary = True,
-            description = "文档唯一标识符,由Milvus自动生成",
-        )
-
-        schema.add_field(
-            field_name="vector",
-            datatype=DataType.FLOAT_VECTOR,
-            dim = self.vector_dim,
-            description="文档向量",
-        )
-
-
-        #业务元数据（Scalar Fields）
-        schema.add_field(
-            field_name="page_index",
-            datatype= DataType.INT64,
-        )
-
-        schema.add_field(
-            field_name="image_url",
-            datatype= DataType.VARCHAR,
-            max_length=256,
-        )
-
-        self.client.create_collection(
-            collection_name=collection_name,
-            schema=schema,
-            properties={"allow_insert_auto_id": "true"},
-        )
-
-        index_params = self.client.prepare_index_params()
-        index_params.add_index(
-            field_name="vector",
-            metric_type="COSINE",
-            index_type="AUTOINDEX",
-            index_name="vector_index"
-        )
-
-        self.client.create_index(
-            collection_name=collection_name,
-            index_params=index_params
-        )
+        self.backend.create_collection(collection_name, self.vector_dim)
         
         logger.info(f"KIAEr:collection {collection_name} created")
 
     def delete_collection(self, collection_name: str):
-        logger.info(f"KIAEr:删除Milvus集合: {collection_name}")
+        logger.info(f"KIAEr:删除集合: {collection_name}")
 
         if not self.has_collection(collection_name):
             raise ValueError(f"collection {collection_name} 不存在，无法删除。")
-        self.client.drop_collection(collection_name)
+        self.backend.drop_collection(collection_name)
+        self._page_maps.pop(collection_name, None)
 
     def insert_vectors(self,collection_name: str, vectors: Union[VectorSchema, List[VectorSchema]], metadatas: List[Dict[str, Any]] = None):
         
-        insert_count = self.client.insert(
-            collection_name=collection_name,
-            data=vectors,
-        )
+        if not isinstance(vectors, list):
+            vectors = [vectors]
+        # id 为空时交给后端自动生成，不能显式写入 None
+        rows = [vec.model_dump(exclude_none=True) if isinstance(vec, VectorSchema) else vec for vec in vectors]
+        insert_count = self.backend.insert(collection_name, rows)
+        self._page_maps.pop(collection_name, None)
         logger.info(f"KIAEr:插入 {insert_count} 条向量数据到集合 {collection_name}")
         
         return insert_count
 
-    async def query(self, query : str, top_k: int = 10):
+    async def ainsert_vectors(self, collection_name: str, vectors: Union[VectorSchema, List[VectorSchema]]):
+        """insert_vectors 的非阻塞版本"""
+        return await self._run_blocking(self.insert_vectors, collection_name, vectors)
+
+    async def query(
+            self,
+            query : str,
+            top_k: int = 10,
+            *,
+            output_fields: List[str] = None,
+            with_vector: bool = False,
+            ) -> List[SearchHit]:
+        """
+        检索与 query 最相近的页面
+        
+        Args:
+            query: 查询文本
+            top_k: 返回条数
+            output_fields: 需要返回的标量字段，默认使用实例的 output_fields
+            with_vector: 是否同时返回向量（例如客户端重打分时）
+        Returns:
+            List[SearchHit]: 按相似度从高到低排列的命中结果
+        """
+        fields = list(output_fields or self.output_fields)
+        if with_vector and "vector" not in fields:
+            fields.append("vector")
 
         vector = await self.embedding_func(query)
-        search_result = self.client.search(
-            collection_name=COLLECTION_NAME,
-            data=[vector],
+        search_result = await self._run_blocking(
+            self.backend.search,
+            COLLECTION_NAME,
+            [vector],
             limit=top_k,
-            output_fields=["id", "vector", "page_index", "image_url"],
+            output_fields=fields,
         )
 
-        return search_result
+        return [SearchHit.from_milvus(hit) for hit in search_result[0]]
 
-    async def add_documents(self, file_path: str):
+    async def add_documents(
+            self,
+            file_path: str,
+            doc_id: str = None,
+            collection_name: str = COLLECTION_NAME,
+            *,
+            executor: Executor = None,
+            on_commit: Callable[[List[int]], None] = None,
+            ) -> IngestResult:
         """
-        将pdf或者其他格式的文件先转换为jpeg并添加元数据得到List[VectorSchema]，后调用embedding_func转换为向量并存入数据库
+        将pdf逐页渲染为jpeg并添加元数据得到List[VectorSchema]，后调用embedding_func转换为向量并存入数据库
+        每页的各个分辨率写入图片库（见 PageImageStore），嵌入使用其中的 embed 分辨率，image_url 为 rerank 分辨率的路径
+
+        增量入库：每行记录 doc_id 与页面内容哈希，再次入库同一文档时
+        - 哈希未变的页面保持原样，不渲染、不嵌入
+        - 新增或内容变化的页面重新嵌入并写入，成功后再删除旧行（过程中检索不会缺页）
+        - 修订版中已不存在的页面直接删除
+        工作量只与变化的页数有关，重复执行不会产生重复行。
+
+        渲染 -> 编码 -> 嵌入 以流水线方式进行，同一时刻内存中最多只有 embedding_concurrency 页图片，
+        峰值内存与文档页数无关
+
+        Args:
+            doc_id: 文档 id，默认取文件名；同一文档的修订版需使用相同的 doc_id
+            executor: 可选的进程池，传入时页面哈希与渲染、JPEG 编码、写图片库都在子进程中进行；
+                      默认在线程中渲染（PyMuPDF 持锁，实际只用到一个核）
+            on_commit: 可选的进度回调，参数为已确认在库中的页码：先回调一次哈希未变的页面，之后每写完一个分块回调一次，
+                       用于入库任务记录检查点
         """
-        
-        pdf_doc = convert_from_path(file_path, first_page=1)
-        images = convert_to_jpeg(pdf_doc)
-        logger.info(f"成功获取{len(images)}张pdf，并将其转换为JEPG图片")
+        doc_id = doc_id or Path(file_path).name
+        loop = asyncio.get_running_loop()
+        if executor is not None:
+            hashes = await loop.run_in_executor(executor, page_hashes_worker, file_path)
+            load_page = lambda page: loop.run_in_executor(
+                executor, store_page_worker, self.image_store, file_path, page, hashes[page - 1]
+            )
+        else:
+            hashes = await asyncio.to_thread(page_renderer.page_hashes, file_path)
+            load_page = lambda page: asyncio.to_thread(self.image_store.put_page, file_path, page, hashes[page - 1])
+        existing = await self._run_blocking(
+            self.backend.query,
+            collection_name,
+            field="doc_id",
+            values=[doc_id],
+            output_fields=["page_index", "content_hash"],
+        )
 
-        vectors: List[VectorSchema]=[]
-    
-        for idx, img in enumerate(images):
-            vectors.append(
-                VectorSchema(
-                    id=idx,
-                    vector=await self.embedding_func(image=img),
-                    page_index=idx + 1,
-                    image_url=f"/mnt/ssd2/steins/wenkai/project/doc-reading-agent-demo/demo_data_images/test_{idx+1}.jpeg"
-                )
+        # 每页保留一行哈希一致的旧数据，其余（内容变化、页面已删除、历史重复行）都要删除
+        kept_pages = set()
+        stale_ids = []
+        for row in existing:
+            page_index = row.get("page_index")
+            if (
+                page_index is not None
+                and 1 <= page_index <= len(hashes)
+                and row.get("content_hash") == hashes[page_index - 1]
+                and page_index not in kept_pages
+            ):
+                kept_pages.add(page_index)
+            else:
+                stale_ids.append(row["id"])
+        changed_pages = [page for page in range(1, len(hashes) + 1) if page not in kept_pages]
+        result = IngestResult(doc_id=doc_id, total_pages=len(hashes), unchanged=len(kept_pages))
+        if on_commit is not None and kept_pages:
+            on_commit(sorted(kept_pages))
+
+        if changed_pages:
+            start = time.perf_counter()
+            result.inserted = await self._embed_pages_streaming(
+                changed_pages,
+                load_page,
+                collection_name=collection_name,
+                doc_id=doc_id,
+                hashes=hashes,
+                on_commit=on_commit,
             )
+            elapsed = time.perf_counter() - start
+            logger.info(f"嵌入并写入完成：{result.inserted} 页，耗时 {elapsed:.2f}s，吞吐 {result.inserted / max(elapsed, 1e-9):.2f} 页/秒（并发 {self.embedding_concurrency}）")
 
-        processed_vectors: List[Dict[str,Any]] = []
-        for vec in vectors:
-            processed_vectors.append(vec.model_dump())
-        
-        insert_count = self.insert_vectors(collection_name=COLLECTION_NAME, vectors=processed_vectors)
-        
-        logger.info(f"KIAEr:已添加文件 {file_path} 到向量数据库，共 {insert_count} 页。")
+        if stale_ids:
+            result.deleted = await self._run_blocking(self.backend.delete, collection_name, field="id", values=stale_ids)
+            self._page_maps.pop(collection_name, None)
 
-        return insert_count
-    
-    def get_page_index_by_image_url(self, collection_name: str=COLLECTION_NAME, image_url: str=None) -> Optional[int]:
+        logger.info(
+            f"KIAEr:已添加文件 {file_path} 到向量数据库（doc_id={doc_id}），共 {result.total_pages} 页："
+            f"写入 {result.inserted}，删除 {result.deleted}，未变化 {result.unchanged}"
+        )
+
+        return result
+
+    async def _embed_pages_streaming(
+            self,
+            pages: Iterable[int],
+            load_page: Callable[[int], Awaitable[Union[Image.Image, bytes]]],
+            *,
+            collection_name: str,
+            doc_id: str,
+            hashes: List[str],
+            on_commit: Callable[[List[int]], None] = None,
+            ) -> int:
+        """
+        逐页发起 渲染 -> 嵌入，在途页数达到 embedding_concurrency 时暂停发起新页面；
+        每页嵌入完成后即释放图片，只保留向量。
+        完成的页面攒够 insert_chunk_size 条就在后台写库，同一时刻最多一个写入在途，写库与后续页面的嵌入重叠；
+        缓冲区只存 float32 向量与页码（比 Python float 列表小约 8 倍），写库时才组装成行；
+        内存中最多保留两个分块的向量，中途崩溃时最多丢失未写入的一个分块（已写入的分块在重新入库时按哈希跳过）。
+
+        Returns:
+            写入的行数
+        """
+        semaphore = asyncio.Semaphore(self.embedding_concurrency)
+        tasks: List[asyncio.Task] = []
+        buffer: List[tuple[int, np.ndarray]] = []
+        insert_task: Optional[asyncio.Task] = None
+        inserted = 0
+
+        async def render_embed_and_release(page_index: int):
+            try:
+                img = await load_page(page_index)
+                vector = np.asarray(await self._embed_page(img, page_index), dtype=np.float32)
+                buffer.append((page_index, vector))
+            finally:
+                semaphore.release()
+
+        async def insert_chunk(chunk: List[tuple[int, np.ndarray]]) -> int:
+            rows = [
+                {
+                    "vector": vector,
+                    "page_index": page_index,
+                    "image_url": self.image_store.url(hashes[page_index - 1]),
+                    "doc_id": doc_id,
+                    "content_hash": hashes[page_index - 1],
+                }
+                for page_index, vector in chunk
+            ]
+            count = await self.ainsert_vectors(collection_name=collection_name, vectors=rows)
+            if on_commit is not None:
+                on_commit([page_index for page_index, _ in chunk])
+            return count
+
+        async def flush():
+            """等待上一个分块写完再提交当前分块，写入失败时在这里抛出"""
+            nonlocal buffer, insert_task, inserted
+            if insert_task is not None:
+                inserted += await insert_task
+                insert_task = None
+            if buffer:
+                chunk, buffer = buffer, []
+                insert_task = asyncio.create_task(insert_chunk(chunk))
+
+        try:
+            for page_index in pages:
+                await semaphore.acquire()
+                if any(t.done() and t.exception() for t in tasks):
+                    semaphore.release()
+                    break
+                if len(buffer) >= self.insert_chunk_size:
+                    await flush()
+                tasks.append(asyncio.create_task(render_embed_and_release(page_index)))
+
+            # 任一页失败时抛出，此前已写入的分块保留
+            await asyncio.gather(*tasks)
+            await flush()  # 提交剩余不足一个分块的向量
+            await flush()  # 等待最后一个分块写完
+            return inserted
+        except BaseException:
+            for t in tasks:
+                t.cancel()
+            # 已提交的分块在工作线程里执行，无法中途取消，等它写完以免与下次入库交错
+            if insert_task is not None:
+                await asyncio.gather(insert_task, return_exceptions=True)
+            raise
+
+    async def _embed_page(self, image, page_index: int) -> List[float]:
+        """嵌入单页；瞬时错误的重试由 embedding_func 负责（默认 JinaEmbeddingClient.get_embedding_with_retry）"""
+        try:
+            return await self.embedding_func(image=image)
+        except Exception as e:
+            logger.error(f"第 {page_index} 页嵌入失败：{e}")
+            raise
+
+    def get_page_index_by_image_url(self, collection_name: str=COLLECTION_NAME, image_url: str=None, doc_id: str=None) -> Optional[int]:
         """
         根据 image_url 精确查询对应的 page_index
+        image_url 按页面内容寻址，不同文档中内容相同的页面共用同一个 image_url，此时需要提供 doc_id 才能确定页码
         
         Args:
             collection_name: 集合名称
             image_url: 要查询的图片路径字符串
+            doc_id: 所属文档 id，image_url 只对应一个文档时可省略
             
         Returns:
-            int: 对应的页码，如果没找到返回 None
+            int: 对应的页码，如果没找到（或对应多个文档且未提供 doc_id）返回 None
         """
-        filter_expr = f'image_url == "{image_url}"'
+        return self.get_page_indexes_by_image_urls(collection_name, [image_url], [doc_id])[0]
         
-        try: 
-            res = self.client.query(
-                collection_name=collection_name,
-                filter=filter_expr,
-                output_fields=["page_index"], # 只返回需要的字段
-                limit=1 # 既然是精确查找，只要一条
-            )
+    def get_page_indexes_by_image_urls(
+            self,
+            collection_name: str=COLLECTION_NAME,
+            image_urls: List[str]=[],
+            doc_ids: List[Optional[str]]=None,
+            ) -> List[Optional[int]]:
+        """
+        批量根据 image_url 查询 page_index，只发起一次 `image_url in [...]` 查询；
+        开启映射缓存时命中不访问数据库，未命中的 image_url 回查一次数据库并更新缓存（其他进程可能写入了新页面）
+        
+        Args:
+            collection_name: 集合名称
+            image_urls: 要查询的图片路径列表
+            doc_ids: 与 image_urls 一一对应的文档 id（可为 None），用于区分不同文档中内容相同的页面
             
-            if res and len(res) > 0:
-                return res[0].get("page_index")
+        Returns:
+            List[Optional[int]]: 与 image_urls 顺序一致的页码，没找到的位置为 None
+        """
+        if not image_urls:
+            return []
+        doc_ids = list(doc_ids) if doc_ids is not None else [None] * len(image_urls)
+
+        if self.use_page_map:
+            page_map = self._get_page_map(collection_name)
+            unknown = [
+                url for url, doc_id in zip(image_urls, doc_ids)
+                if url not in page_map or (doc_id is not None and doc_id not in page_map[url])
+            ]
+            if unknown:
+                # 映射只随本进程的写入失效，未命中时回查数据库，拿到其他进程（如 ingest 命令行）写入的页面
+                self._refresh_page_map(collection_name, page_map, unknown)
+        else:
+            page_map = self._query_page_map(collection_name, image_urls)
+            if page_map is None:
+                return [None] * len(image_urls)
+
+        page_indexes = self._resolve_page_indexes(page_map, image_urls, doc_ids)
+        missing = [url for url, idx in zip(image_urls, page_indexes) if idx is None]
+        if missing:
+            logger.warning(f"未找到以下 image_url 的记录: {missing}")
+        return page_indexes
+
+    async def aget_page_indexes_by_image_urls(
+            self,
+            collection_name: str=COLLECTION_NAME,
+            image_urls: List[str]=[],
+            doc_ids: List[Optional[str]]=None,
+            ) -> List[Optional[int]]:
+        """get_page_indexes_by_image_urls 的非阻塞版本"""
+        return await self._run_blocking(self.get_page_indexes_by_image_urls, collection_name, image_urls, doc_ids)
+
+    async def _run_blocking(self, func: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    @staticmethod
+    def _build_page_map(rows: List[Dict[str, Any]]) -> Dict[str, Dict[Optional[str], int]]:
+        """
+        组装 image_url -> {doc_id: page_index} 映射
+        同一文档中内容相同的多页取最小页码，保证结果与行的返回顺序无关
+        """
+        page_map: Dict[str, Dict[Optional[str], int]] = {}
+        for row in rows:
+            pages = page_map.setdefault(row["image_url"], {})
+            doc_id = row.get("doc_id")
+            if doc_id not in pages or row["page_index"] < pages[doc_id]:
+                pages[doc_id] = row["page_index"]
+        return page_map
+
+    @staticmethod
+    def _resolve_page_indexes(
+            page_map: Dict[str, Dict[Optional[str], int]],
+            image_urls: List[str],
+            doc_ids: List[Optional[str]],
+            ) -> List[Optional[int]]:
+        page_indexes = []
+        for url, doc_id in zip(image_urls, doc_ids):
+            pages = page_map.get(url, {})
+            if doc_id is not None:
+                page_indexes.append(pages.get(doc_id))
+            elif len(pages) == 1:
+                page_indexes.append(next(iter(pages.values())))
             else:
-                logger.warning(f"未找到 image_url 为 {image_url} 的记录")
-                return None
-                
+                if pages:
+                    logger.warning(f"image_url {url} 对应多个文档 {list(pages)}，需提供 doc_id 才能确定页码")
+                page_indexes.append(None)
+        return page_indexes
+
+    def _query_page_map(self, collection_name: str, image_urls: List[str]) -> Optional[Dict[str, Dict[Optional[str], int]]]:
+        """用一次 `image_url in [...]` 查询组装给定 image_url 的映射，查询失败返回 None"""
+        try:
+            res = self.backend.query(
+                collection_name,
+                field="image_url",
+                values=list(dict.fromkeys(image_urls)),
+                output_fields=["image_url", "doc_id", "page_index"],
+            )
         except Exception as e:
-            logger.error(f"查询 page_index 失败: {e}")
+            logger.error(f"批量查询 page_index 失败: {e}")
             return None
-        
-    def get_page_indexes_by_image_urls(self, collection_name: str=COLLECTION_NAME, image_urls: List[str]=[]) -> List[Optional[int]]:
+        return self._build_page_map(res)
+
+    def _refresh_page_map(self, collection_name: str, page_map: Dict[str, Dict[Optional[str], int]], image_urls: List[str]):
+        """回查未命中的 image_url，用数据库中的最新记录覆盖缓存中的对应条目"""
+        fresh = self._query_page_map(collection_name, image_urls)
+        if fresh is None:
+            return
+        for url in dict.fromkeys(image_urls):
+            if url in fresh:
+                page_map[url] = fresh[url]
+            else:
+                page_map.pop(url, None)
+        if fresh:
+            logger.info(f"集合 {collection_name} 的映射缓存未命中，回查数据库补充了 {len(fresh)} 个 image_url")
+
+    def _get_page_map(self, collection_name: str) -> Dict[str, Dict[Optional[str], int]]:
+        """加载（或复用已加载的）整个集合的 image_url -> {doc_id: page_index} 映射"""
+        page_map = self._page_maps.get(collection_name)
+        if page_map is not None:
+            return page_map
+
+        try:
+            rows = self.backend.query(collection_name, output_fields=["image_url", "doc_id", "page_index"])
+        except Exception as e:
+            # 加载失败时不缓存，下次调用重试
+            logger.error(f"加载 image_url -> page_index 映射失败: {e}")
+            return {}
+        page_map = self._build_page_map(rows)
 
-       pass
+        self._page_maps[collection_name] = page_map
+        logger.info(f"已加载集合 {collection_name} 的 image_url -> page_index 映射，共 {len(page_map)} 条")
+        return page_map
 
     def has_collection(self, collection_name: str) -> bool:
-        return self.client.has_collection(collection_name)
+        return self.backend.has_collection(collection_name)
 
 
 emb_model = JinaEmbeddingClient()
 vector_db = VectorDatabase(
     uri=VECTOR_DATABASE_URI,
     db_name=VECTOR_DATABASE_NAME,
-    embedding_func=emb_model.get_embedding,
+    embedding_func=emb_model.get_embedding_with_retry,
     )
 
 root_path = Path.cwd()
@@ -218,16 +533,15 @@ file_path = os.path.join(root_path, "demo_data", "test.pdf")
 
 # vector_db.delete_collection(COLLECTION_NAME)
 # vector_db.create_collection(COLLECTION_NAME)
-# pdf_doc = convert_from_path(file_path, first_page=1, last_page=1)
-# img = convert_to_jpeg(pdf_doc)[0]
+# img = page_renderer.render_image(file_path, 1)
 if __name__ == "__main__":
     
     logger.disable("src.code.embedding")
-    print("Milvus集合列表:", vector_db.client.list_collections())
+    print("集合列表:", vector_db.backend.list_collections())
     asyncio.run(vector_db.add_documents(file_path=file_path))
 
     # asyncio.run(vector_db.add_documents(file_path=file_path))
 
     # result = asyncio.run(vector_db.query(query="我想知道第二章  采购需求的内容。", top_k=10))
-    # best_one_page =result[0][0]['page_index']
+    # best_one_page =result[0].page_index
 
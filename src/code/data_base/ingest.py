@@ -0,0 +1,278 @@
+"""
+批量入库入口
+从目录或清单读取多个 PDF，页面渲染与 JPEG 编码在进程池中并行（吃满多核），
+嵌入请求与写库在事件循环上异步进行，逐文档增量入库（见 VectorDatabase.add_documents），
+最后输出每个文档的耗时与整体页/秒。
+
+断点续跑：指定 --job 时入库作为一个任务执行，每个文档的状态与已写入的页面实时保存到 JSON 检查点文件，
+中途失败（如嵌入服务超时）后用 --resume 继续：已完成且文件未改动的文档直接跳过，
+未完成的文档按页面哈希跳过已写入的页面，只渲染、嵌入剩余页面。
+
+清单格式：
+- 目录：递归收集其中的 *.pdf，doc_id 为相对目录的路径
+- .jsonl：每行 {"path": ..., "doc_id": ...}，doc_id 可省略
+- 其他文本：每行一个路径，可用制表符分隔追加 doc_id；# 开头为注释
+清单中的相对路径相对于清单文件所在目录。
+
+用法:
+    python -m src.code.data_base.ingest demo_data/
+    python -m src.code.data_base.ingest manifest.jsonl --workers 16 --concurrent-documents 4
+    python -m src.code.data_base.ingest manifest.jsonl --job jobs/manifest.json
+    python -m src.code.data_base.ingest --resume jobs/manifest.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from src.settings import settings
+
+if TYPE_CHECKING:
+    from src.code.data_base.database import VectorDatabase
+
+logger = logger.bind(module="rag_ingest")
+
+
+@dataclass(slots=True)
+class DocumentReport:
+    """单个文档的入库结果"""
+    path: str
+    doc_id: str
+    total_pages: int = 0
+    inserted: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+    # 以下用于断点续跑：status 为 pending / running / done / failed
+    status: str = "pending"
+    committed_pages: int = 0
+    last_committed_page: int = 0  # 从第 1 页起连续确认在库的最后一页
+    fingerprint: Optional[str] = None  # 完成时文件的 大小:修改时间，文件改动后重新入库
+    _committed: Set[int] = field(default_factory=set, repr=False)
+
+    def commit(self, pages: Iterable[int]):
+        """记录已确认在库的页面"""
+        self._committed.update(pages)
+        self.committed_pages = len(self._committed)
+        while self.last_committed_page + 1 in self._committed:
+            self.last_committed_page += 1
+
+    def to_dict(self) -> dict:
+        return {k: v for k, v in asdict(self).items() if not k.startswith("_")}
+
+
+def file_fingerprint(path: str) -> Optional[str]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class IngestJob:
+    """
+    可断点续跑的入库任务，进度保存在 JSON 检查点文件中。
+    检查点只用于跳过已完成的文档和展示进度，页面是否已入库以库中的内容哈希为准，
+    因此检查点落后于实际写入（最后一个分块写完后、保存前崩溃）也不会产生重复行。
+    """
+
+    def __init__(self, path: str, collection_name: str, reports: List[DocumentReport]):
+        self.path = Path(path)
+        self.collection_name = collection_name
+        self.reports = reports
+
+    @classmethod
+    def create(cls, path: str, documents: List[Tuple[str, str]], collection_name: str) -> "IngestJob":
+        job = cls(path, collection_name, [DocumentReport(path=p, doc_id=doc_id) for p, doc_id in documents])
+        job.save()
+        return job
+
+    @classmethod
+    def load(cls, path: str) -> "IngestJob":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        names = {f.name for f in fields(DocumentReport) if not f.name.startswith("_")}
+        reports = [DocumentReport(**{k: v for k, v in entry.items() if k in names}) for entry in data["documents"]]
+        return cls(path, data["collection_name"], reports)
+
+    def save(self):
+        """先写临时文件再替换，崩溃时检查点不会损坏"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        data = {"collection_name": self.collection_name, "documents": [r.to_dict() for r in self.reports]}
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def pending(self) -> List[DocumentReport]:
+        """需要（继续）入库的文档：未完成、失败，或完成后文件又被改动"""
+        return [r for r in self.reports if r.status != "done" or r.fingerprint != file_fingerprint(r.path)]
+
+
+def load_manifest(source: str) -> List[Tuple[str, str]]:
+    """解析目录或清单，返回 [(PDF 路径, doc_id)]"""
+    source_path = Path(source)
+    if source_path.is_dir():
+        return [
+            (str(path), path.relative_to(source_path).as_posix())
+            for path in sorted(source_path.rglob("*.pdf"))
+        ]
+
+    documents = []
+    base_dir = source_path.parent
+    for line in source_path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if source_path.suffix == ".jsonl":
+            entry = json.loads(line)
+            path, doc_id = entry["path"], entry.get("doc_id")
+        else:
+            path, _, doc_id = line.partition("\t")
+        path = Path(path) if Path(path).is_absolute() else base_dir / path
+        documents.append((str(path), doc_id or path.name))
+    return documents
+
+
+async def ingest_documents(
+        documents: List[Tuple[str, str]],
+        *,
+        vector_db: "VectorDatabase" = None,
+        collection_name: str = None,
+        workers: int = None,
+        max_concurrent_documents: int = None,
+        job: IngestJob = None,
+        ) -> List[DocumentReport]:
+    """
+    并发入库多个文档，单个文档失败不影响其他文档
+
+    Args:
+        documents: [(PDF 路径, doc_id)]，传入 job 时忽略
+        vector_db: 目标数据库，默认使用 database 模块的全局实例
+        workers: 渲染进程数，默认 INGEST_RENDER_WORKERS
+        max_concurrent_documents: 同时处理的文档数，默认 INGEST_MAX_CONCURRENT_DOCUMENTS
+        job: 可选的入库任务，只处理其中未完成的文档，每写完一个分块更新一次检查点；集合以任务中记录的为准
+    """
+    # database 模块导入时会创建全局实例并连接数据库，延迟到这里导入，避免 spawn 出的渲染子进程重复初始化
+    from src.code.data_base.database import COLLECTION_NAME, vector_db as default_vector_db
+
+    vector_db = vector_db or default_vector_db
+    if job is not None:
+        collection_name = job.collection_name
+        reports = job.pending()
+        logger.info(f"入库任务 {job.path}：共 {len(job.reports)} 个文档，待处理 {len(reports)} 个")
+    else:
+        reports = [DocumentReport(path=path, doc_id=doc_id) for path, doc_id in documents]
+    collection_name = collection_name or COLLECTION_NAME
+    save_checkpoint = job.save if job is not None else lambda: None
+    workers = workers or settings.INGEST_RENDER_WORKERS
+    semaphore = asyncio.Semaphore(max_concurrent_documents or settings.INGEST_MAX_CONCURRENT_DOCUMENTS)
+
+    # 主进程里有线程池与事件循环线程，fork 不安全，使用 spawn；子进程只会导入轻量的渲染模块
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+
+        def on_commit(report: DocumentReport, pages: List[int]):
+            report.commit(pages)
+            save_checkpoint()
+
+        async def ingest_one(report: DocumentReport) -> DocumentReport:
+            async with semaphore:
+                # 重新开始时清空上次的进度，已在库的页面会由 on_commit 重新确认
+                report.status, report.error, report._committed = "running", None, set()
+                report.committed_pages = report.last_committed_page = 0
+                fingerprint = file_fingerprint(report.path)
+                save_checkpoint()
+                start = time.perf_counter()
+                try:
+                    result = await vector_db.add_documents(
+                        report.path,
+                        doc_id=report.doc_id,
+                        collection_name=collection_name,
+                        executor=executor,
+                        on_commit=lambda pages: on_commit(report, pages),
+                    )
+                    report.total_pages = result.total_pages
+                    report.inserted = result.inserted
+                    report.deleted = result.deleted
+                    report.unchanged = result.unchanged
+                    report.status, report.fingerprint = "done", fingerprint
+                except Exception as e:
+                    logger.error(f"文档 {report.path} 入库失败（已确认写入 {report.committed_pages} 页）：{e}")
+                    report.status, report.error = "failed", str(e)
+                report.seconds = time.perf_counter() - start
+                save_checkpoint()
+            return report
+
+        await asyncio.gather(*(ingest_one(report) for report in reports))
+    return job.reports if job is not None else reports
+
+
+def print_report(reports: List[DocumentReport], elapsed: float):
+    print(f"{'文档':<40}{'页数':>6}{'写入':>6}{'删除':>6}{'未变':>6}{'耗时(s)':>10}{'页/秒':>8}  状态")
+    for r in reports:
+        rate = r.inserted / r.seconds if r.seconds else 0.0
+        if r.error:
+            status = f"失败（已写入至第 {r.last_committed_page} 页）: {r.error}"
+        else:
+            status = "成功" if r.status == "done" else "未完成"
+        print(f"{r.doc_id[:40]:<40}{r.total_pages:>6}{r.inserted:>6}{r.deleted:>6}{r.unchanged:>6}{r.seconds:>10.2f}{rate:>8.2f}  {status}")
+
+    embedded = sum(r.inserted for r in reports)
+    failed = sum(1 for r in reports if r.error)
+    print(
+        f"共 {len(reports)} 个文档（失败 {failed}），{sum(r.total_pages for r in reports)} 页，"
+        f"嵌入 {embedded} 页，总耗时 {elapsed:.2f}s，整体吞吐 {embedded / max(elapsed, 1e-9):.2f} 页/秒"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", nargs="?", help="PDF 目录或清单文件")
+    parser.add_argument("--collection", default=None, help="目标集合，默认 COLLECTION_NAME")
+    parser.add_argument("--job", default=None, help="检查点文件，指定后以可断点续跑的任务方式入库")
+    parser.add_argument("--resume", default=None, metavar="JOB", help="从检查点文件继续未完成的入库任务")
+    parser.add_argument("--workers", type=int, default=None, help="渲染进程数，默认 INGEST_RENDER_WORKERS")
+    parser.add_argument("--concurrent-documents", type=int, default=None, help="同时处理的文档数")
+    args = parser.parse_args()
+    if bool(args.source) == bool(args.resume):
+        parser.error("需要且只能指定 source 或 --resume 其中之一")
+
+    if args.resume:
+        job, documents = IngestJob.load(args.resume), []
+    else:
+        documents = load_manifest(args.source)
+        logger.info(f"待入库文档 {len(documents)} 个")
+        job = None
+        if args.job:
+            from src.code.data_base.database import COLLECTION_NAME
+            job = IngestJob.create(args.job, documents, args.collection or COLLECTION_NAME)
+
+    from src.code.transport.http_transport import http_transport
+
+    async def run() -> List[DocumentReport]:
+        try:
+            return await ingest_documents(
+                documents,
+                collection_name=args.collection,
+                workers=args.workers,
+                max_concurrent_documents=args.concurrent_documents,
+                job=job,
+            )
+        finally:
+            # 与对话入口一致，退出前在同一个事件循环上关闭 embedding 服务的连接池
+            await http_transport.shutdown()
+
+    start = time.perf_counter()
+    reports = asyncio.run(run())
+    print_report(reports, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
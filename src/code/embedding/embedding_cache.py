@@ -0,0 +1,215 @@
+"""
+基于内容寻址的持久化嵌入缓存
+key 为 (模型名, 维度, 文本或图片原始字节) 的哈希；向量存放在内存映射的 float32 文件中，
+索引（key -> 槽位、LRU 顺序）存放在 sqlite 中，查询时无需任何 JSON 反序列化
+
+同一个缓存目录可能被多个实例 / 进程同时使用（对话进程、ingest 命令行、tune_index），因此：
+- 槽位分配以 sqlite 中的记录为准，在 `BEGIN IMMEDIATE` 事务中读取空闲槽位或淘汰最久未使用的条目，不依赖进程内状态
+- 向量文件的读写由文件锁保护（读共享、写独占），读到的槽位在读完向量之前不会被其他进程改写
+- 进程内通过 shared_cache 按目录共用一个实例
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+from loguru import logger
+from PIL import Image
+
+try:
+    import fcntl
+except ImportError:  # Windows 上没有 fcntl，只保留 sqlite 事务保护槽位分配
+    fcntl = None
+
+logger = logger.bind(module="embedding_cache")
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir: Union[str, Path], dim: int, max_entries: int = 50000):
+        """
+        Args:
+            cache_dir: 缓存目录
+            dim: 向量维度，不同维度使用不同的向量文件
+            max_entries: 最多缓存条目数，超出后按 LRU 淘汰
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._lock_file = open(self.cache_dir / f"vectors_{dim}.lock", "a+b")
+        # 事务由代码显式控制；其他进程持有写锁时最多等待 30s
+        self._conn = sqlite3.connect(
+            self.cache_dir / f"index_{dim}.sqlite3",
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        with self._file_lock(exclusive=True), self._transaction():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+            )
+            # 旧版本各实例各自分配槽位，可能有多个 key 指向同一槽位，无法判断向量属于谁，一并作废
+            self._conn.execute(
+                "DELETE FROM entries WHERE slot IN (SELECT slot FROM entries GROUP BY slot HAVING COUNT(*) > 1)"
+            )
+            self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS entries_slot ON entries (slot)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            # 容量调小后超出范围的槽位作废
+            self._conn.execute("DELETE FROM entries WHERE slot >= ?", (max_entries,))
+            self._vectors = self._open_vectors(self.cache_dir / f"vectors_{dim}.f32")
+
+        # 最近访问时间先在内存中累积，写入时批量落盘
+        self._touched: Dict[str, int] = {}
+        self._last_tick = 0
+
+        self.hits = 0
+        self.misses = 0
+        logger.info(f"嵌入缓存已加载: {self.cache_dir}，已有 {len(self)}/{max_entries} 条")
+
+    def _open_vectors(self, path: Path) -> np.memmap:
+        expected = self.max_entries * self.dim * np.dtype(np.float32).itemsize
+        if not path.exists() or path.stat().st_size < expected:
+            # 新建或按容量扩大文件（稀疏文件，不会立即占满磁盘）；不截短，其他进程可能按更大的容量打开
+            with open(path, "ab") as f:
+                f.truncate(expected)
+        return np.memmap(path, dtype=np.float32, mode="r+", shape=(self.max_entries, self.dim))
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _tick(self) -> int:
+        """最近使用时间戳，多个进程之间可比较；同一实例内严格递增"""
+        self._last_tick = max(time.time_ns(), self._last_tick + 1)
+        return self._last_tick
+
+    @staticmethod
+    def make_key(model_name: str, dim: int, *, text: str = "", image: Union[Image.Image, bytes] = None, variant: str = "") -> str:
+        """
+        根据模型、维度与原始内容计算缓存 key；PIL 图片使用像素原始字节，避免为求 key 再做一次编码，JPEG 字节直接参与计算。
+        variant 用于区分同一内容的不同请求形式（如 chat `messages` 与批量 `input`），两者向量可能不同
+        """
+        hasher = hashlib.sha256()
+        hasher.update(f"{model_name}\0{dim}\0{variant}\0".encode("utf-8"))
+        if text:
+            hasher.update(b"text\0")
+            hasher.update(text.encode("utf-8"))
+        if isinstance(image, bytes):
+            # 已编码的 JPEG 字节原样发送，按字节本身计算
+            hasher.update(b"jpeg\0")
+            hasher.update(image)
+        elif image is not None:
+            hasher.update(f"image\0{image.mode}\0{image.size}\0".encode("utf-8"))
+            hasher.update(image.tobytes())
+        return hasher.hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock, self._file_lock(exclusive=False):
+            row = self._conn.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            vector = np.array(self._vectors[row[0]])
+            self._touched[key] = self._tick()
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector) -> bool:
+        vector = np.asarray(vector, dtype=np.float32)
+        if vector.shape != (self.dim,):
+            logger.warning(f"向量维度 {vector.shape} 与缓存维度 {self.dim} 不一致，跳过缓存")
+            return False
+
+        with self._lock, self._file_lock(exclusive=True), self._transaction():
+            slot = self._allocate_slot(key)
+            self._vectors[slot] = vector
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                (key, slot, self._tick()),
+            )
+            self._touched.pop(key, None)
+            self._flush_touched()
+        return True
+
+    def _allocate_slot(self, key: str) -> int:
+        """在写事务内分配槽位：已有的 key 复用原槽位，否则取最小空闲槽位，满了淘汰最久未使用的条目"""
+        row = self._conn.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            return row[0]
+        # 刚被读到的条目先把访问时间落盘，避免按过期的 LRU 顺序淘汰
+        self._flush_touched()
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        if count < self.max_entries:
+            row = self._conn.execute(
+                "SELECT CASE WHEN NOT EXISTS (SELECT 1 FROM entries WHERE slot = 0) THEN 0 ELSE ("
+                "SELECT MIN(slot) + 1 FROM entries e WHERE NOT EXISTS (SELECT 1 FROM entries f WHERE f.slot = e.slot + 1)"
+                ") END"
+            ).fetchone()
+            return row[0]
+        evicted, slot = self._conn.execute("SELECT key, slot FROM entries ORDER BY last_used LIMIT 1").fetchone()
+        self._conn.execute("DELETE FROM entries WHERE key = ?", (evicted,))
+        return slot
+
+    def flush(self):
+        with self._lock, self._file_lock(exclusive=True):
+            self._vectors.flush()
+            if self._touched:
+                with self._transaction():
+                    self._flush_touched()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+        self._lock_file.close()
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?",
+                [(tick, key) for key, tick in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+_shared_caches: Dict[Tuple[Path, int], EmbeddingCache] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_cache(cache_dir: Union[str, Path], dim: int, max_entries: int = 50000) -> EmbeddingCache:
+    """同一进程内按 (目录, 维度) 共用一个缓存实例"""
+    key = (Path(cache_dir).resolve(), dim)
+    with _shared_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = _shared_caches[key] = EmbeddingCache(cache_dir, dim, max_entries)
+        elif cache.max_entries != max_entries:
+            logger.warning(f"缓存目录 {cache_dir} 已按容量 {cache.max_entries} 打开，忽略新的容量 {max_entries}")
+        return cache
@@ -3,39 +3,60 @@ import sys
 from pathlib import Path
 import base64
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Awaitable, Callable, Optional, Union
+from pydantic import BaseModel, Field
 from openai import OpenAI
 import httpx
-from httpx import AsyncClient, Timeout
+from httpx import Timeout
 import numpy as np
 from loguru import logger
 from src.settings import settings
+from src.code.transport.http_transport import HTTPTransport, http_transport
+from src.code.embedding.embedding_cache import EmbeddingCache, shared_cache
+from src.code.embedding import similarity
 from PIL import Image
 import asyncio
-from pdf2image import convert_from_path
-from io import BytesIO
+from src.code.rendering.page_renderer import page_renderer
+from src.code.rendering.image_encoding import EncodingProfile, encode_image, get_profile
 
 logger = logger.bind(name="JinaEmbedding客户端")
 
-def convert_to_jpeg(images: List[Image.Image]) -> List[Image.Image]:
-    processed_images = []
+# str 为文本；图片可以是 PIL Image、已编码的图片字节或图片文件路径(Path)
+EmbeddingItem = Union[str, Image.Image, bytes, Path]
 
-    for img in images:
-        # 步骤 A: 确保颜色模式是 RGB (防止 CMYK 导致保存 JPEG 失败)
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        buffer = BytesIO()
-        img.save(buffer, format='JPEG')
-        buffer.seek(0)
-        
-        new_img = Image.open(buffer)
-        processed_images.append(new_img)
-    
-    return processed_images
+class EmbeddingHTTPError(ValueError):
+    """Embedding 服务返回非 200 状态码，保留状态码供调用方判断是否可重试"""
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        super().__init__(f"HTTP Error {status_code}: {text}")
+
+def is_transient_error(error: Exception) -> bool:
+    """网络异常、限流(429)与服务端 5xx 视为瞬时错误，可以重试"""
+    if isinstance(error, httpx.RequestError):
+        return True
+    if isinstance(error, EmbeddingHTTPError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+class EmbeddingResult(BaseModel):
+    index: int = Field(description="该条目在输入列表中的位置")
+    embedding: Optional[List[float]] = Field(default=None, description="嵌入向量，失败时为 None")
+    error: Optional[str] = Field(default=None, description="该条目失败的原因")
+
+    @property
+    def ok(self) -> bool:
+        return self.embedding is not None
 
 class JinaEmbeddingClient():
-    def __init__(self):
+    def __init__(
+            self,
+            transport: HTTPTransport = None,
+            cache: Optional[EmbeddingCache] = None,
+            encoding_profile: EncodingProfile = None,
+            concurrency: int = settings.JINA_EMBEDDING_CONCURRENCY,
+            max_retries: int = settings.JINA_EMBEDDING_MAX_RETRIES,
+            retry_backoff: float = settings.JINA_EMBEDDING_RETRY_BACKOFF,
+            ):
         self.base_url = settings.JINA_EMBEDDING_BASE_URL
         self.api_key = settings.JINA_EMBEDDING_MODEL_API_KEY
         self.embedding_dim = settings.JINA_EMBEDDING_MODEL_DIMS
@@ -46,6 +67,21 @@ class JinaEmbeddingClient():
         # self.embedding_dim = None
         # self.embedding_name = settings.QWEN3_EMBEDDING_MODEL_NAME
         self.timeout = Timeout(60.0, connect=10.0)
+        self.transport = transport or http_transport
+        # 图片按编码配置缩放 / 转灰度后再发送，默认 JINA_EMBEDDING_ENCODING_PROFILE
+        self.encoding_profile = encoding_profile or get_profile(settings.JINA_EMBEDDING_ENCODING_PROFILE)
+        # get_embeddings 中同时在途的图片请求数，以及瞬时错误的重试次数 / 退避基数(秒)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self.cache = cache
+        if self.cache is None and settings.JINA_EMBEDDING_CACHE_DIR:
+            self.cache = shared_cache(
+                settings.JINA_EMBEDDING_CACHE_DIR,
+                dim=self.embedding_dim,
+                max_entries=settings.JINA_EMBEDDING_CACHE_MAX_ENTRIES,
+            )
 
         self.headers = {
             "Content-type": "application/json",
@@ -54,121 +90,280 @@ class JinaEmbeddingClient():
         
         logger.info(f"通过HTTP请求访问JinaEmbedding服务: {self.embedding_name} at {self.base_url} 成功！")
     
-    async def get_embedding(self, text: str = "", *, image: Image.Image=None, is_base64=True) -> List[float]:
+    async def get_embedding(self, text: str = "", *, image: Union[Image.Image, bytes, Path]=None, is_base64=True) -> List[float]:
         """
         [异步] 获取多模态向量
+
+        纯文本与 get_embeddings 中的文本条目走同一种 `input` 载荷（共用缓存），查询向量与批量嵌入的段落向量可以直接比较；
+        带图片时走 chat 形式的 `messages` 载荷，get_embeddings 中的图片条目同样经由本方法发送。
         
         Args:
             text: 提示词文本
-            image: PIL Image 对象 (可选)
+            image: PIL Image 对象、已编码的图片字节或图片文件路径(Path) (可选)，按 encoding_profile 编码；
+                   字节或文件内容已满足配置时直接转 base64 发送，不解码、不重新编码。
+                   与 get_embeddings 一致，str 只表示文本，图片路径必须用 Path
         Returns:
             List[float]: 嵌入向量
         """
+        if isinstance(image, str):
+            raise TypeError("str 只表示文本，图片文件路径请传入 Path")
+        if isinstance(image, Path):
+            image = await asyncio.to_thread(image.read_bytes)
 
-        content_block: List[Dict[str, Any]] = []
+        variant = "input" if image is None else "messages"
+        cache_key = self._cache_key(text=text, image=image, variant=variant)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached.tolist()
 
-        if text:
-            content_block.append(
-                {
-                    "type": "text",
-                    "text":text 
-                },
-            )
+        if image is None:
+            if not text:
+                logger.error(f"未提供文本或图片内容，无法获取嵌入向量！")
+                raise ValueError("必须提供text或image内容至少一项！")
+            payload = {
+                "model": self.embedding_name,
+                "input": [text],
+            }
+        else:
+            content_block: List[Dict[str, Any]] = []
+            if text:
+                content_block.append(
+                    {
+                        "type": "text",
+                        "text":text 
+                    },
+                )
 
-        if image:
             image_http_url = ""#TODO：日后再添加，测试miniserve的静态文件服务器功能
             images_base64 = self._convert_to_base64(image)
             content_block.append(
                 {
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/jpeg;base64,{images_base64}"if is_base64 else f"{image_http_url}"
+                        "url": f"data:{self.encoding_profile.mime};base64,{images_base64}"if is_base64 else f"{image_http_url}"
                     }
                 }
             )
-        
-        if not content_block:
-            logger.error(f"未提供文本或图片内容，无法获取嵌入向量！")
-            raise ValueError("必须提供text或image内容至少一项！")
-        
+
+            payload = {
+                "model": self.embedding_name,
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": content_block
+                    }
+                ]
+            }
+        logger.info(f"payload构造完毕，前50字符: {str(payload)[:50]}...")
+
+        result = await self._post(payload)
+        if "data" in result and len(result["data"])>0:
+            embedding = result["data"][0]["embedding"]
+            if cache_key is not None:
+                self.cache.put(cache_key, embedding)
+            return embedding
+
+    async def get_embedding_with_retry(self, text: str = "", *, image: Union[Image.Image, bytes, Path]=None) -> List[float]:
+        """
+        [异步] 同 get_embedding，遇到瞬时错误（连接异常、429、5xx）按指数退避重试，最多重试 max_retries 次；
+        检索查询与入库时的逐页嵌入都通过本方法调用，与 get_embeddings 中的图片条目共用同一套重试策略
+        """
+        return await self._retry(self.get_embedding, text, image=image)
+
+    async def get_embeddings(
+            self,
+            items: List[EmbeddingItem],
+            *,
+            max_batch_size: int = None,
+            max_payload_bytes: int = None,
+            ) -> List[EmbeddingResult]:
+        """
+        [异步] 批量获取多模态向量
+
+        文本条目按 max_batch_size / max_payload_bytes 打包进同一个 `input` 请求，与 get_embedding 的纯文本请求格式相同；
+        图片条目需要走 chat 形式的 `messages` 载荷，服务端每个请求只接受一段对话，因此每张图片经由 get_embedding 单独请求，
+        最多 concurrency 个并发。
+        网络异常、429 与 5xx 等瞬时错误按指数退避重试整批，重试用尽后整批标记失败；
+        其余错误（4xx、返回条数不符）说明批内有坏条目，二分拆开重试，最终只有真正出错的条目被标记为失败。
+
+        Args:
+            items: 文本(str) 与图片组成的列表，图片可以是 PIL Image、已编码的字节或文件路径(Path)，
+                   与 get_embedding 一样按 encoding_profile 转 base64
+            max_batch_size: 单次请求最多条目数，默认读取 settings
+            max_payload_bytes: 单次请求体最大字节数（估算值），默认读取 settings
+        Returns:
+            List[EmbeddingResult]: 与输入顺序一一对应的结果
+        """
+        max_batch_size = max_batch_size or settings.JINA_EMBEDDING_MAX_BATCH_SIZE
+        max_payload_bytes = max_payload_bytes or settings.JINA_EMBEDDING_MAX_PAYLOAD_BYTES
+
+        results: List[Optional[EmbeddingResult]] = [None] * len(items)
+        text_indexes: List[int] = []
+        image_indexes: List[int] = []
+
+        for idx, item in enumerate(items):
+            if isinstance(item, str) and item:
+                cached = self.cache.get(self._cache_key(text=item, variant="input")) if self.cache is not None else None
+                if cached is not None:
+                    results[idx] = EmbeddingResult(index=idx, embedding=cached.tolist())
+                else:
+                    text_indexes.append(idx)
+            elif isinstance(item, (Image.Image, Path)) or (isinstance(item, bytes) and item):
+                image_indexes.append(idx)
+            else:
+                results[idx] = EmbeddingResult(index=idx, error="必须提供text或image内容至少一项！")
+
+        batches = self._pack_text_batches(items, text_indexes, max_batch_size, max_payload_bytes)
+        logger.info(f"共 {len(items)} 个条目，文本打包为 {len(batches)} 个请求，图片 {len(image_indexes)} 个请求")
+
+        for batch in batches:
+            for res in await self._embed_text_batch(items, batch):
+                results[res.index] = res
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def embed_image(idx: int):
+            async with semaphore:
+                try:
+                    embedding = await self.get_embedding_with_retry(image=items[idx])
+                    if embedding is None:
+                        results[idx] = EmbeddingResult(index=idx, error="服务端未返回嵌入向量")
+                    else:
+                        results[idx] = EmbeddingResult(index=idx, embedding=embedding)
+                except (httpx.RequestError, ValueError, OSError) as e:
+                    logger.warning(f"第 {idx} 个条目(图片)嵌入失败：{e}")
+                    results[idx] = EmbeddingResult(index=idx, error=str(e))
+
+        await asyncio.gather(*(embed_image(idx) for idx in image_indexes))
+        return results
+
+    def _pack_text_batches(
+            self,
+            items: List[EmbeddingItem],
+            indexes: List[int],
+            max_batch_size: int,
+            max_payload_bytes: int,
+            ) -> List[List[int]]:
+        """按条目数与估算字节数贪心打包文本条目，保持原有顺序"""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_bytes = 0
+
+        for idx in indexes:
+            # json 序列化后的大小，非 ASCII 字符会被转义，这里按转义后长度估算
+            item_bytes = len(json.dumps(items[idx]))
+            if current and (len(current) >= max_batch_size or current_bytes + item_bytes > max_payload_bytes):
+                batches.append(current)
+                current, current_bytes = [], 0
+            current.append(idx)
+            current_bytes += item_bytes
+
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _embed_text_batch(self, items: List[EmbeddingItem], batch: List[int]) -> List[EmbeddingResult]:
         payload = {
             "model": self.embedding_name,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": content_block
-                }
-            ]
+            "input": [items[idx] for idx in batch],
         }
-        logger.info(f"payload构造完毕，前50字符: {str(payload)}...")
+        try:
+            result = await self._retry(self._post, payload)
+            data = sorted(result.get("data", []), key=lambda d: d.get("index", 0))
+            if len(data) != len(batch):
+                raise ValueError(f"服务端返回 {len(data)} 条向量，期望 {len(batch)} 条")
+            if self.cache is not None:
+                for idx, d in zip(batch, data):
+                    self.cache.put(self._cache_key(text=items[idx], variant="input"), d["embedding"])
+            return [EmbeddingResult(index=idx, embedding=d["embedding"]) for idx, d in zip(batch, data)]
+
+        except (httpx.RequestError, ValueError) as e:
+            # 瞬时错误已按退避重试过，服务不可用时拆分只会成倍增加请求数，整批标记失败
+            if len(batch) == 1 or is_transient_error(e):
+                logger.warning(f"第 {', '.join(map(str, batch))} 个条目(文本)嵌入失败：{e}")
+                return [EmbeddingResult(index=idx, error=str(e)) for idx in batch]
+            # 拆成两半重试，定位出真正失败的条目
+            mid = len(batch) // 2
+            return await self._embed_text_batch(items, batch[:mid]) + await self._embed_text_batch(items, batch[mid:])
 
-        async with AsyncClient(timeout=self.timeout) as client:
+    async def _retry(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """遇到瞬时错误按指数退避重试，最多重试 max_retries 次；非瞬时错误直接抛出"""
+        for attempt in range(self.max_retries + 1):
             try:
-                response = await client.post(
-                    url=self.base_url,
-                    headers= self.headers,
-                    json=payload
-                )
-                
-                if response.status_code != 200:
-                    raise ValueError(f"HTTP Error {response.status_code}: {response.text}")
-
-                result = response.json()
-                if "data" in result and len(result["data"])>0:
-                    return result["data"][0]["embedding"]
-                
-            except httpx.RequestError as e:
-                logger.warning(f"请求JinaEmbedding服务器时出现异常：{e}")
-                raise 
-
-    def _convert_to_base64(self, image: Image.Image) -> str:
-        logger.info(f"正在将 1 张图片转换为 Base64 编码, 以便发送到 Jina Embedding 服务...")
-        images_base64 = []
-        buffer = BytesIO()
-        image.save(buffer, format='JPEG')
-        buffer.seek(0)
-        img_bytes = buffer.read()
-        img_base64 = base64.b64encode(img_bytes).decode('utf-8')
-        images_base64.append(img_base64)
-
-        logger.info(f"图片转换为 Base64 编码完成！")
-        return images_base64[0]
+                return await func(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient_error(e):
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                logger.warning(f"嵌入请求出现瞬时错误，{delay:.1f}s 后第 {attempt + 1} 次重试：{e}")
+                await asyncio.sleep(delay)
+
+    def _cache_key(self, *, text: str = "", image: Union[Image.Image, bytes] = None, variant: str = "messages") -> Optional[str]:
+        if self.cache is None or (not text and image is None):
+            return None
+        if image is not None:
+            # 同一张图片在不同编码配置下发送的像素不同，向量也不同
+            variant = f"{variant}|{self.encoding_profile.key}"
+        return EmbeddingCache.make_key(self.embedding_name, self.embedding_dim, text=text, image=image, variant=variant)
+
+    async def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            response = await self.transport.post(
+                self.base_url,
+                headers= self.headers,
+                json=payload,
+                timeout=self.timeout,
+            )
+            
+            if response.status_code != 200:
+                raise EmbeddingHTTPError(response.status_code, response.text)
+
+            return response.json()
+            
+        except httpx.RequestError as e:
+            logger.warning(f"请求JinaEmbedding服务器时出现异常：{e}")
+            raise 
+
+    def _convert_to_base64(self, image: Union[Image.Image, bytes]) -> str:
+        data = encode_image(image, self.encoding_profile)
+        logger.debug(f"图片按编码配置 {self.encoding_profile.name} 编码为 {len(data)} 字节")
+        return base64.b64encode(data).decode('utf-8')
 
     def _cal_cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """用numpy计算两个向量的余弦相似度"""
-        v1 = np.array(vec1)
-        v2 = np.array(vec2)
+        """计算两个向量的余弦相似度（批量场景请直接使用 similarity 模块的矩阵接口）"""
+        return similarity.cosine_similarity(vec1, vec2)
 
-        dot_product = np.dot(v1,v2)
-        norm_v1 = np.linalg.norm(v1)
-        norm_v2 = np.linalg.norm(v2)
 
-        #防止除零
-        if norm_v1 ==0 or norm_v2 ==0:
-            return 0.0
         
-        return dot_product / (norm_v1 * norm_v2)
+async def demo(jinaclient: JinaEmbeddingClient, file_path: str):
+    """在同一个事件循环内完成页面嵌入与多轮查询，使连接池在各轮之间复用"""
+    await http_transport.startup([jinaclient.base_url])
+    try:
+        images = page_renderer.render_images(file_path, first_page=1, last_page=1)
 
+        embeddings = []
+        for img in images:
+            embedding = await jinaclient.get_embedding(image=img)
+            print(f"Embedding前20个维度: {embedding[:20]}")
+            embeddings.append(embedding)
+        corpus = similarity.normalize(embeddings)
+        while True:
+            user_input = await asyncio.to_thread(input, "请输入您的问题（输入 'exit' 退出）：")
+            if user_input.lower() == 'exit':
+                break
+            user_input_embedding = await jinaclient.get_embedding(text=user_input)
+            scores = similarity.score(similarity.normalize(user_input_embedding), corpus)
+            indices, values = similarity.top_k(scores, k=1)
+            print(f"最相似页面: 第 {indices[0] + 1} 页，余弦相似度为: {values[0]}")
+            print(f"与文档相似"if values[0] >0.5 else "与文档不相似")
+    finally:
+        await http_transport.shutdown()
 
-        
 if __name__ == "__main__":
     jinaclient = JinaEmbeddingClient()
 
     root_path = Path.cwd()
     file_path = os.path.join(root_path, "demo_data", "test.pdf")
-    
-    pdf_doc = convert_from_path(file_path, first_page=1, last_page=1)
-    images = convert_to_jpeg(pdf_doc)
-
-    for img in images:
-        embedding = asyncio.run(jinaclient.get_embedding(image=img))
-        print(f"Embedding前20个维度: {embedding[:20]}")
-    while True:
-        user_input = input("请输入您的问题（输入 'exit' 退出）：")
-        if user_input.lower() == 'exit':
-            break
-        user_input_embedding = asyncio.run(jinaclient.get_embedding(text=user_input))
-        similarity = jinaclient._cal_cosine_similarity(user_input_embedding, embedding)
-        print("余弦相似度为:", similarity)
-        print(f"与文档相似"if similarity >0.5 else "与文档不相似")
-    
\ No newline at end of file
+
+    asyncio.run(demo(jinaclient, file_path))
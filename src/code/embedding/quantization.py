@@ -0,0 +1,154 @@
+"""
+向量量化与两阶段检索
+- int8: 每行按自身最大绝对值做对称标量量化，额外存一个 float32 缩放系数，约为 float32 的 1/4
+- binary: 每维只保留符号位并打包，约为 float32 的 1/32，第一轮用汉明距离排序
+第一轮在量化向量（或 Matryoshka 截断的短向量，两者可叠加）上取 top_k * rescore_factor 个候选，
+第二轮只读取这些候选的全精度向量精确重打分。
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.settings import settings
+from src.code.embedding import similarity
+
+QUANTIZATIONS = ("none", "int8", "binary")
+
+
+def check_quantization(quantization: str) -> str:
+    quantization = (quantization or "none").lower()
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"不支持的量化方式: {quantization}，可选 {list(QUANTIZATIONS)}")
+    return quantization
+
+
+def code_shape(quantization: str, dim: int) -> Optional[Tuple[int, np.dtype]]:
+    """量化码每行的 (列数, dtype)；none 返回 None"""
+    if quantization == "int8":
+        return dim, np.dtype(np.int8)
+    if quantization == "binary":
+        return (dim + 7) // 8, np.dtype(np.uint8)
+    return None
+
+
+def quantize(quantization: str, vectors: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    量化已归一化的向量 (n, d)
+
+    Returns:
+        {"codes": 量化码, "scales": (n, 1) 缩放系数（仅 int8）}
+    """
+    if quantization == "int8":
+        max_abs = np.abs(vectors).max(axis=1, keepdims=True)
+        scales = (max_abs / 127).astype(np.float32)
+        codes = np.rint(vectors / np.where(scales == 0, 1, scales)).astype(np.int8)
+        return {"codes": codes, "scales": scales}
+    if quantization == "binary":
+        return {"codes": np.packbits(vectors > 0, axis=1)}
+    raise ValueError(f"量化方式 {quantization} 不需要量化码")
+
+
+def approximate_scores(
+        quantization: str,
+        queries: np.ndarray,
+        codes: np.ndarray,
+        scales: np.ndarray = None,
+        ) -> np.ndarray:
+    """
+    查询 (q, d) 对一块量化码的近似分数 (q, m)
+    - int8: 查询保持 float32（非对称），分数为 q · codes * scale，近似余弦相似度
+    - binary: 查询同样二值化，分数为 d - 2 * 汉明距离，只用于排序
+    """
+    if quantization == "int8":
+        return (queries @ codes.T.astype(np.float32)) * scales.T
+    if quantization == "binary":
+        query_codes = np.packbits(queries > 0, axis=1)
+        hamming = np.bitwise_count(query_codes[:, None, :] ^ codes[None, :, :]).sum(axis=2, dtype=np.int32)
+        return (queries.shape[1] - 2 * hamming).astype(np.float32)
+    raise ValueError(f"量化方式 {quantization} 不支持近似打分")
+
+
+def search(
+        quantization: str,
+        queries: np.ndarray,
+        vectors: np.ndarray,
+        k: int,
+        *,
+        codes: np.ndarray = None,
+        scales: np.ndarray = None,
+        prefix: np.ndarray = None,
+        prefix_dims: int = 0,
+        rescore_factor: int = None,
+        chunk_size: int = None,
+        ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    两阶段检索。queries 与 vectors 均为已归一化的 float32；vectors 可为 np.memmap，只有候选行会被读取。
+    第一轮的表示：prefix_dims > 0 时为截断到前 prefix_dims 维并重新归一化的短向量（Matryoshka），
+    量化方式不为 none 时再在其上使用量化码 codes / scales，否则直接使用 float32 的 prefix。
+    quantization 为 none 且 prefix_dims 为 0 时退化为 similarity.top_k_chunked 的精确检索。
+
+    Returns:
+        (indices, values)，形状均为 (q, min(k, n))，values 为全精度余弦相似度
+    """
+    queries = np.atleast_2d(queries)
+    if quantization == "none" and not prefix_dims:
+        return similarity.top_k_chunked(queries, vectors, k, chunk_size=chunk_size)
+
+    if rescore_factor is None:
+        rescore_factor = (
+            settings.VECTOR_MATRYOSHKA_RESCORE_FACTOR if prefix_dims else settings.VECTOR_QUANTIZATION_RESCORE_FACTOR
+        )
+    first_queries = truncate(queries, prefix_dims) if prefix_dims else queries
+    candidate_k = k * rescore_factor
+
+    if quantization == "none":
+        candidates, _ = similarity.top_k_chunked(first_queries, prefix, candidate_k, chunk_size=chunk_size)
+        return rescore(queries, vectors, candidates, k)
+
+    chunk_size = chunk_size or settings.SIMILARITY_CHUNK_SIZE
+    if quantization == "binary":
+        # 汉明距离的中间结果为 (q, m, d/8)，按查询数缩小块，避免临时数组过大
+        chunk_size = max(1, min(chunk_size, (64 * 1024 * 1024) // max(1, queries.shape[0] * codes.shape[1])))
+
+    chunks = (
+        (
+            start,
+            approximate_scores(
+                quantization,
+                first_queries,
+                np.asarray(codes[start: start + chunk_size]),
+                None if scales is None else np.asarray(scales[start: start + chunk_size]),
+            ),
+        )
+        for start in range(0, codes.shape[0], chunk_size)
+    )
+    candidates, _ = similarity.top_k_streaming(chunks, candidate_k, num_queries=queries.shape[0])
+    return rescore(queries, vectors, candidates, k)
+
+
+def truncate(vectors: np.ndarray, dims: int) -> np.ndarray:
+    """Matryoshka 截断：保留前 dims 维并重新归一化"""
+    return similarity.normalize(np.asarray(vectors)[..., :dims])
+
+
+def rescore(queries: np.ndarray, vectors: np.ndarray, candidates: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """用全精度向量对每个查询的候选行重新打分并取 top-k"""
+    k = min(k, candidates.shape[1])
+    indices = np.empty((queries.shape[0], k), dtype=np.int64)
+    values = np.empty((queries.shape[0], k), dtype=np.float32)
+    for row, (query, rows) in enumerate(zip(queries, candidates)):
+        # 按行号升序读取，memmap 上为顺序访问
+        rows = np.sort(rows)
+        exact = np.asarray(vectors[rows], dtype=np.float32) @ query
+        order, values[row] = similarity.top_k(exact, k)
+        indices[row] = rows[order]
+    return indices, values
+
+
+def bytes_per_vector(quantization: str, dim: int) -> int:
+    """第一轮检索常驻内存的每向量字节数（dim 为第一轮向量的维度）"""
+    if quantization == "int8":
+        return dim + 4
+    if quantization == "binary":
+        return (dim + 7) // 8
+    return dim * 4
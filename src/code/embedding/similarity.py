@@ -0,0 +1,121 @@
+"""
+向量相似度工具
+所有函数都假设输入为预先 L2 归一化的 float32 矩阵（可用 normalize 得到），此时点积即余弦相似度。
+- score: 多个查询对整个语料打分
+- top_k: 基于 argpartition 的 top-k，复杂度 O(n) 而非全排序的 O(n log n)
+- top_k_chunked: 按块遍历语料（可为 np.memmap），内存占用只与块大小有关，适用于超出内存的语料
+- top_k_streaming: 合并任意打分方式产出的分块分数（量化检索的第一轮使用）
+"""
+from typing import Iterable, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.settings import settings
+
+ArrayLike = Union[np.ndarray, Sequence[Sequence[float]], Sequence[float]]
+
+
+def normalize(vectors: ArrayLike) -> np.ndarray:
+    """转换为 float32 并按行做 L2 归一化，零向量保持为零；一维输入返回一维结果"""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def cosine_similarity(vec1: ArrayLike, vec2: ArrayLike) -> float:
+    """两个未归一化向量的余弦相似度，任一向量为零时返回 0.0"""
+    return float(np.dot(normalize(vec1), normalize(vec2)))
+
+
+def score(queries: np.ndarray, corpus: np.ndarray) -> np.ndarray:
+    """查询 (q, d) 对语料 (n, d) 的相似度矩阵 (q, n)；一维查询返回 (n,)"""
+    return queries @ corpus.T
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    沿最后一维取分数最高的 k 个，按分数从高到低排序（同分时保持原下标顺序）
+
+    Returns:
+        (indices, values)，形状与 scores 相同，只是最后一维变为 min(k, n)
+    """
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        empty = scores[..., :0]
+        return empty.astype(np.int64), empty
+
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+        # 先按下标排序，再做稳定排序，保证同分时结果确定
+        candidates = np.sort(candidates, axis=-1)
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape).copy()
+    candidate_scores = np.take_along_axis(scores, candidates, axis=-1)
+    order = np.argsort(-candidate_scores, axis=-1, kind="stable")
+    indices = np.take_along_axis(candidates, order, axis=-1)
+    return indices, np.take_along_axis(candidate_scores, order, axis=-1)
+
+
+def top_k_chunked(
+        queries: np.ndarray,
+        corpus: np.ndarray,
+        k: int,
+        chunk_size: int = None,
+        ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    分块计算 queries (q, d) 对 corpus (n, d) 的 top-k，每块只把 chunk_size 行读入内存，
+    与上一轮的候选合并后再取 top-k。corpus 可以是 np.memmap。
+
+    Returns:
+        (indices, values)，形状均为 (q, min(k, n))，indices 为语料中的全局行号
+    """
+    queries = np.atleast_2d(queries)
+    chunk_size = chunk_size or settings.SIMILARITY_CHUNK_SIZE
+    chunks = (
+        (start, score(queries, np.asarray(corpus[start: start + chunk_size], dtype=np.float32)))
+        for start in range(0, corpus.shape[0], chunk_size)
+    )
+    return top_k_streaming(chunks, k, num_queries=queries.shape[0])
+
+
+def top_k_streaming(
+        chunks: Iterable[Tuple[int, np.ndarray]],
+        k: int,
+        num_queries: int,
+        ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    合并按顺序产出的分块分数 (起始行号, 分数矩阵 (q, m))，维护每个查询当前的 top-k。
+    打分方式由调用方决定（如量化后的近似分数），这里只负责合并。
+    """
+    best_indices = np.empty((num_queries, 0), dtype=np.int64)
+    best_scores = np.empty((num_queries, 0), dtype=np.float32)
+    if k <= 0:
+        return best_indices, best_scores
+
+    for start, chunk_scores in chunks:
+        chunk_indices, chunk_scores = top_k(chunk_scores, k)
+        merged_indices = np.concatenate([best_indices, chunk_indices + start], axis=1)
+        merged_scores = np.concatenate([best_scores, chunk_scores.astype(np.float32, copy=False)], axis=1)
+        # 已有候选下标都小于本块，拼接后按位置稳定排序即可保持同分时的下标顺序
+        positions, best_scores = top_k(merged_scores, k)
+        best_indices = np.take_along_axis(merged_indices, positions, axis=1)
+    return best_indices, best_scores
+
+
+def deduplicate(vectors: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    贪心去重：按顺序保留向量，与已保留向量的相似度不低于 threshold 的视为重复
+
+    Returns:
+        保留行的下标（升序）
+    """
+    if len(vectors) == 0:
+        return np.empty(0, dtype=np.int64)
+    similarity = score(vectors, vectors)
+    keep = np.ones(len(vectors), dtype=bool)
+    for i in range(len(vectors)):
+        if keep[i]:
+            duplicates = similarity[i, i + 1:] >= threshold
+            keep[i + 1:] &= ~duplicates
+    return np.flatnonzero(keep)
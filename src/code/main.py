@@ -1,14 +1,9 @@
-from src.code.rag_workflow.rag import Retriever
+from src.code.rag_workflow.rag import Retriever, chat_session
 import asyncio
 
 def main():
     retriever = Retriever()
-    while True:
-        query = input("请输入您的问题：")
-        if query == "exit":
-            break
-        response = asyncio.run(retriever.retieve(query=query))
-        print(response)
+    asyncio.run(chat_session(retriever))
 
 
 if __name__ == "__main__":
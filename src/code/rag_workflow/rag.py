@@ -10,8 +10,10 @@ from loguru import logger
 from src.code.data_base.database import VectorDatabase, vector_db
 from src.code.embedding.embedding_model import JinaEmbeddingClient
 from src.code.rerank.reranker import Reranker
+from src.code.rerank.page_selector import PageSelector
 from src.settings import settings
 from src.code.visual_reasoner.model import VisionLanguageModel
+from src.code.transport.http_transport import http_transport
 import asyncio
 
 from src.settings import settings
@@ -29,15 +31,17 @@ RERANKER_MODEL_NAME = "jina/jina-rerank-m0"
 class Retriever():
     def __init__(self):
         self.embedding_model = JinaEmbeddingClient()
+        # 重排取 max_pages 个候选，再按分数自适应决定实际送入 VLM 的页数
+        self.page_selector = PageSelector()
         self.reranker = Reranker(
             baseurl=RERANKER_BASE_URL,
             model_name=RERANKER_MODEL_NAME,
-            top_k=5,
+            top_k=self.page_selector.max_pages,
         )
         self.vector_db = VectorDatabase(
             uri=VECTOR_DATABASE_URI,
             db_name=VECTOR_DATABASE_NAME,
-            embedding_func=self.embedding_model.get_embedding,
+            embedding_func=self.embedding_model.get_embedding_with_retry,
         )
         self.vlm_model = VisionLanguageModel(
             model_name=settings.VLM_MODEL_NAME,
@@ -45,38 +49,64 @@ class Retriever():
         )
         logger.info(f"RAG Retriever已就绪")
 
+    async def startup(self):
+        """在当前事件循环上建立 embedding / rerank 服务的长连接池"""
+        await http_transport.startup([self.embedding_model.base_url, *self.reranker.endpoints])
+
+    async def shutdown(self):
+        await http_transport.shutdown()
+
     async def retieve(self, query: str) -> str:
         # 嵌入查询并对文件进行向量检索
         related_results = await self.vector_db.query(
             query=query, 
             top_k=10)
 
+        # 图片按内容寻址，不同文档中相同的页面共用一个 image_url，重排前去重，保留相似度最高的命中
+        unique_hits = {}
+        for hit in related_results:
+            unique_hits.setdefault(hit.image_url, hit)
+        unique_hits = list(unique_hits.values())
+
         # 对检索结果进行重排序
         reranked_results = await self.reranker.rerank(
             query=query, 
-            img_urls=[item['image_url'] for item in related_results[0]])
+            img_urls=[hit.image_url for hit in unique_hits])
         
-        #获取重排序后的结果URL列表
-        result_urls = [ item['document']['text'] for item in reranked_results['results'] ]
+        #按重排分数自适应选页，获取送入 VLM 的URL列表
+        selected_results = self.page_selector.select(reranked_results['results'])
+        selected_hits = [ unique_hits[item['index']] for item in selected_results ]
+        result_urls = [ hit.image_url for hit in selected_hits ]
         
-        #传入VLM模型进行推理
-        response = self.vlm_model.run(
+        # 页码直接取自检索命中的行，内容相同的页面不会被 image_url 反查错配到其他文档
+        result_pages = [ hit.page_index for hit in selected_hits ]
+
+        #传入VLM模型进行推理（CAMEL 的 ChatAgent.step 为同步调用，放到线程中执行）
+        response = await asyncio.to_thread(
+            self.vlm_model.run,
             query=query,
             image_urls=result_urls,
+            image_pages=result_pages,
         )
         return response
 
-logger.disable("src.code.embedding")
-logger.disable("src.code.visual_reasoner")
-logger.disable("src.code.rerank")
-
-retriever = Retriever()
-
+async def chat_session(retriever: Retriever):
+    """在同一个事件循环内处理多轮问答，使连接池在各轮之间复用"""
+    await retriever.startup()
+    try:
+        while True:
+            query = await asyncio.to_thread(input, "请输入您的问题：")
+            if query == "exit":
+                break
+            response = await retriever.retieve(query=query)
+            print(response)
+    finally:
+        await retriever.shutdown()
 
+if __name__ == "__main__":
+    logger.disable("src.code.embedding")
+    logger.disable("src.code.visual_reasoner")
+    logger.disable("src.code.rerank")
 
-while True:
-    query = input("请输入您的问题：")
-    if query == "exit":
-        break
-    response = asyncio.run(retriever.retieve(query=query))
-    print(response)
+    retriever = Retriever()
+    asyncio.run(chat_session(retriever))
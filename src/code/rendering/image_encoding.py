@@ -0,0 +1,125 @@
+"""
+发送给模型服务的页面图片编码配置（encoding profile）
+每个阶段（嵌入、VLM 等）使用一个命名配置，只携带该阶段需要的像素：
+- max_side: 长边上限（像素），超出时等比缩小，0 表示不缩放
+- format / quality: JPEG 或 WEBP 及其质量
+- grayscale: never / always / auto；auto 时几乎没有彩色像素的纯文字页面按灰度编码
+配置来自 IMAGE_ENCODING_PROFILES，各客户端通过 *_ENCODING_PROFILE 选择使用哪一个。
+已编码的字节或文件路径满足配置时直接转 base64，不经过解码 / 重新编码。
+"""
+import base64
+import os
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Union
+
+import numpy as np
+from PIL import Image
+
+from src.settings import settings
+
+FORMATS = ("JPEG", "WEBP")
+GRAYSCALE_MODES = ("never", "always", "auto")
+
+# 纯文字页判定：缩略图上 (max(R,G,B) - min(R,G,B)) 超过阈值的像素占比低于 COLOR_PIXEL_RATIO
+COLOR_PIXEL_CHROMA = 32
+COLOR_PIXEL_RATIO = 0.002
+
+
+@dataclass(frozen=True, slots=True)
+class EncodingProfile:
+    name: str
+    max_side: int = 0
+    format: str = "JPEG"
+    quality: int = 75
+    grayscale: str = "never"
+
+    def __post_init__(self):
+        if self.format not in FORMATS:
+            raise ValueError(f"不支持的图片格式: {self.format}，可选 {list(FORMATS)}")
+        if self.grayscale not in GRAYSCALE_MODES:
+            raise ValueError(f"不支持的 grayscale: {self.grayscale}，可选 {list(GRAYSCALE_MODES)}")
+
+    @property
+    def mime(self) -> str:
+        return f"image/{self.format.lower()}"
+
+    @property
+    def key(self) -> str:
+        """编码参数的稳定表示，参与嵌入缓存 key 的计算"""
+        return f"{self.max_side}/{self.format}/{self.quality}/{self.grayscale}"
+
+
+def load_profiles() -> Dict[str, EncodingProfile]:
+    return {
+        name: EncodingProfile(
+            name=name,
+            max_side=int(params.get("max_side", 0)),
+            format=params.get("format", "JPEG").upper(),
+            quality=int(params.get("quality", 75)),
+            grayscale=params.get("grayscale", "never").lower(),
+        )
+        for name, params in settings.IMAGE_ENCODING_PROFILES.items()
+    }
+
+
+def get_profile(name: str) -> EncodingProfile:
+    profiles = load_profiles()
+    if name not in profiles:
+        raise ValueError(f"未定义的编码配置: {name}，可选 {list(profiles)}")
+    return profiles[name]
+
+
+def is_text_only(image: Image.Image) -> bool:
+    """在 64x64 缩略图上统计彩色像素占比，判断是否为纯文字（黑白）页面"""
+    if image.mode in ("1", "L", "LA"):
+        return True
+    thumb = np.asarray(image.convert("RGB").resize((64, 64), Image.Resampling.BOX), dtype=np.int16)
+    chroma = thumb.max(axis=2) - thumb.min(axis=2)
+    return np.count_nonzero(chroma > COLOR_PIXEL_CHROMA) < COLOR_PIXEL_RATIO * chroma.size
+
+
+def is_text_only_encoded(data: bytes) -> bool:
+    """对已编码的图片做纯文字页判定；JPEG 使用 draft 模式按 1/8 缩放解码，只读取极少的像素"""
+    image = Image.open(BytesIO(data))
+    if image.format == "JPEG":
+        image.draft("RGB", (image.width // 8, image.height // 8))
+    return is_text_only(image)
+
+
+def encode_image(image: Union[Image.Image, bytes, str, os.PathLike], profile: EncodingProfile) -> bytes:
+    """
+    按配置编码图片。image 可以是 PIL 图片、已编码的字节或图片文件路径；
+    字节（或文件内容）的格式、尺寸、颜色模式都已满足配置时原样返回，不解码、不重新编码
+    """
+    if isinstance(image, (str, os.PathLike)):
+        image = Path(image).read_bytes()
+    if isinstance(image, bytes):
+        # Image.open 只解析文件头，尺寸与格式满足要求时不会解码像素
+        header = Image.open(BytesIO(image))
+        fits = header.format == profile.format and (not profile.max_side or max(header.size) <= profile.max_side)
+        if fits and (profile.grayscale == "never" or header.mode == "L"):
+            return image
+        # auto 模式下彩色页面无需转换，只需低分辨率判定一次
+        if fits and profile.grayscale == "auto" and not is_text_only_encoded(image):
+            return image
+        image = header
+
+    if profile.grayscale == "always" or (profile.grayscale == "auto" and is_text_only(image)):
+        image = image.convert("L")
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    if profile.max_side and max(image.size) > profile.max_side:
+        scale = profile.max_side / max(image.size)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+
+    buffer = BytesIO()
+    image.save(buffer, format=profile.format, quality=profile.quality)
+    return buffer.getvalue()
+
+
+def to_data_url(data: bytes, profile: EncodingProfile) -> str:
+    return f"data:{profile.mime};base64,{base64.b64encode(data).decode('ascii')}"
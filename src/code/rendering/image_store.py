@@ -0,0 +1,90 @@
+"""
+按内容寻址的页面图片库
+入库时把每页渲染成多个分辨率（rendition）写入磁盘，路径由页面内容哈希与 DPI 决定：
+    <root>/<哈希前 2 位>/<哈希>/<dpi>.jpeg
+- 内容相同的页面（同一文档重复入库、不同文档中的相同页面）只渲染、存储一次
+- 哈希由 PageRenderer.page_hash 计算，覆盖页面引用的全部对象（内容流、资源、字体、注释外观流、表单域），
+  渲染结果不同的页面哈希必然不同，因此文件已存在时可以直接跳过渲染；只改了注释的页面会存为新的图片
+- 各阶段只读取自己需要的分辨率：嵌入与重排用低 DPI，VLM 用高 DPI；DPI 相同的阶段共用同一个文件
+- 库中记录的 image_url 为 rerank 阶段的文件路径，VLM 通过 rendition_of 换成高 DPI 版本
+"""
+import os
+from pathlib import Path
+from typing import Dict, Union
+
+from loguru import logger
+
+from src.settings import settings
+from src.code.rendering.page_renderer import PageRenderer, page_renderer
+
+logger = logger.bind(module="page_image_store")
+
+STAGES = ("embed", "rerank", "vlm")
+
+
+class PageImageStore:
+    def __init__(self, root_dir: Union[str, Path] = None, renditions: Dict[str, int] = None):
+        """
+        Args:
+            root_dir: 图片库根目录，默认 PAGE_IMAGE_STORE_DIR
+            renditions: 各阶段使用的 DPI，如 {"embed": 100, "rerank": 100, "vlm": 200}，默认 PAGE_IMAGE_RENDITIONS
+        """
+        self.root_dir = Path(root_dir or settings.PAGE_IMAGE_STORE_DIR).resolve()
+        self.renditions = dict(renditions or settings.PAGE_IMAGE_RENDITIONS)
+        missing = [stage for stage in STAGES if stage not in self.renditions]
+        if missing:
+            raise ValueError(f"PAGE_IMAGE_RENDITIONS 缺少阶段: {missing}")
+
+    def path(self, content_hash: str, stage: str) -> Path:
+        """某页在指定阶段使用的图片路径（不检查是否存在）"""
+        return self.root_dir / content_hash[:2] / content_hash / f"{self.renditions[stage]}.jpeg"
+
+    def url(self, content_hash: str) -> str:
+        """写入向量库的 image_url"""
+        return str(self.path(content_hash, "rerank"))
+
+    def rendition_of(self, image_url: str, stage: str) -> str:
+        """
+        把 image_url 换成指定阶段的分辨率；不在图片库中的旧路径或对应文件不存在时原样返回
+        """
+        path = Path(image_url)
+        try:
+            relative = path.relative_to(self.root_dir)
+        except ValueError:
+            return image_url
+        if len(relative.parts) != 3:
+            return image_url
+        rendition = self.path(relative.parts[1], stage)
+        return str(rendition) if rendition.exists() else image_url
+
+    def put_page(self, pdf_path: str, page: int, content_hash: str, *, renderer: PageRenderer = None) -> bytes:
+        """
+        确保该页的各个分辨率都已在库中（已存在的直接跳过渲染），返回 embed 阶段的 JPEG 字节
+        """
+        renderer = renderer or page_renderer
+        embed_dpi = self.renditions["embed"]
+        embed_data = None
+        for dpi in sorted(set(self.renditions.values())):
+            path = self.root_dir / content_hash[:2] / content_hash / f"{dpi}.jpeg"
+            if path.exists():
+                continue
+            data = renderer.render_jpeg(pdf_path, page, dpi=dpi)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 先写临时文件再改名，多个进程同时写入同一页时不会读到半个文件
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+            if dpi == embed_dpi:
+                embed_data = data
+        if embed_data is None:
+            embed_data = self.path(content_hash, "embed").read_bytes()
+        return embed_data
+
+
+# 全局共享实例
+page_image_store = PageImageStore()
+
+
+def store_page_worker(store: PageImageStore, pdf_path: str, page: int, content_hash: str) -> bytes:
+    """供进程池调用：把页面写入图片库并返回 embed 阶段的 JPEG 字节"""
+    return store.put_page(pdf_path, page, content_hash)
@@ -0,0 +1,90 @@
+"""
+已渲染页面的 LRU 缓存
+以 (PDF 路径, 修改时间, 页码, DPI, 颜色空间, JPEG 质量) 为 key 缓存 JPEG 字节，
+内存部分按总字节数限制，可选落盘，重复读取同一页时完全跳过渲染
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+from loguru import logger
+
+logger = logger.bind(module="page_cache")
+
+PageKey = Tuple[str, float, int, int, str, int]
+
+
+class RenderedPageCache:
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, disk_dir: Union[str, Path, None] = None):
+        """
+        Args:
+            max_bytes: 内存中缓存的 JPEG 总字节数上限
+            disk_dir: 可选的磁盘缓存目录，内存淘汰后仍可从磁盘读回
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+        self._entries: "OrderedDict[PageKey, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: PageKey) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        if self.disk_dir is not None:
+            path = self._disk_path(key)
+            if path.exists():
+                data = path.read_bytes()
+                self._remember(key, data)
+                with self._lock:
+                    self.hits += 1
+                return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: PageKey, data: bytes):
+        self._remember(key, data)
+        if self.disk_dir is not None:
+            path = self._disk_path(key)
+            # 先写临时文件再改名，避免并发读取到半个文件
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(data)
+            tmp_path.replace(path)
+
+    def _remember(self, key: PageKey, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _disk_path(self, key: PageKey) -> Path:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return self.disk_dir / f"{digest}.jpeg"
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,245 @@
+"""
+基于 PyMuPDF 的进程内 PDF 页面渲染
+替代 pdf2image（每次调用都会启动 pdftoppm 子进程并写出 PPM 临时文件），直接在进程内渲染并输出 JPEG 字节
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from loguru import logger
+from PIL import Image
+
+from src.settings import settings
+from src.code.rendering.page_cache import RenderedPageCache
+
+logger = logger.bind(module="page_renderer")
+
+COLORSPACES = {
+    "rgb": fitz.csRGB,
+    "gray": fitz.csGRAY,
+}
+
+
+class PageRenderer:
+    """
+    页面渲染器，缓存最近打开的 PDF 文档句柄（以路径 + 修改时间为 key，文件被改写后自动重新打开）。
+    PyMuPDF 的 Document 不是线程安全的，所有渲染操作都在同一把锁内进行。
+    页码均从 1 开始，与 pdf2image 保持一致。
+    传入 cache 时，render_jpeg 会先查缓存，命中则完全跳过渲染。
+    """
+
+    def __init__(
+            self,
+            dpi: int = None,
+            colorspace: str = None,
+            jpeg_quality: int = None,
+            max_open_documents: int = 8,
+            cache: Optional[RenderedPageCache] = None,
+            ):
+        self.dpi = dpi or settings.PAGE_RENDER_DPI
+        self.colorspace = (colorspace or settings.PAGE_RENDER_COLORSPACE).lower()
+        if self.colorspace not in COLORSPACES:
+            raise ValueError(f"不支持的 colorspace: {self.colorspace}，可选 {list(COLORSPACES)}")
+        self.jpeg_quality = jpeg_quality or settings.PAGE_RENDER_JPEG_QUALITY
+        self.max_open_documents = max_open_documents
+        self.cache = cache
+
+        self._documents: "OrderedDict[Tuple[str, float], fitz.Document]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _open(self, pdf_path: str) -> fitz.Document:
+        path = Path(pdf_path).resolve()
+        if not path.exists():
+            raise FileNotFoundError(f"PDF 文件不存在: {pdf_path}")
+        key = (str(path), path.stat().st_mtime)
+
+        with self._lock:
+            doc = self._documents.get(key)
+            if doc is not None:
+                self._documents.move_to_end(key)
+                return doc
+
+            # 同一路径的旧版本句柄已失效，先关闭
+            for stale in [k for k in self._documents if k[0] == key[0]]:
+                self._documents.pop(stale).close()
+
+            doc = fitz.open(str(path))
+            self._documents[key] = doc
+            while len(self._documents) > self.max_open_documents:
+                _, oldest = self._documents.popitem(last=False)
+                oldest.close()
+            return doc
+
+    def page_count(self, pdf_path: str) -> int:
+        with self._lock:
+            return len(self._open(pdf_path))
+
+    def page_hash(self, pdf_path: str, page: int) -> str:
+        """
+        不渲染页面，直接对页面引用到的全部 PDF 对象做 SHA-256：从页面对象出发，沿对象引用递归覆盖
+        内容流、资源（字体及字体文件、图片与表单 XObject、ExtGState 等）、注释及其外观流、表单域，
+        以及页面尺寸与旋转；凡是会影响渲染结果的对象都参与哈希。
+        引用按被引用对象的哈希而非 xref 编号计算，内容相同的页面在不同文件、不同页码下哈希一致，
+        文件重新保存（编号、压缩方式变化）时哈希不变。用于增量入库判断页面是否变化，也是图片库的存储 key。
+        """
+        with self._lock:
+            doc = self._open(pdf_path)
+            if not 1 <= page <= len(doc):
+                raise ValueError(f"页码 {page} 超出范围，文档共 {len(doc)} 页: {pdf_path}")
+            return _ObjectHasher(doc).page_digest(doc[page - 1])
+
+    def page_hashes(self, pdf_path: str) -> List[str]:
+        """整个文档逐页的内容哈希，下标 0 对应第 1 页；各页共用的字体、图片只计算一次"""
+        with self._lock:
+            doc = self._open(pdf_path)
+            hasher = _ObjectHasher(doc)
+            return [hasher.page_digest(doc[index]) for index in range(len(doc))]
+
+    def render_pixmap(self, pdf_path: str, page: int, *, dpi: int = None, colorspace: str = None) -> fitz.Pixmap:
+        with self._lock:
+            doc = self._open(pdf_path)
+            if not 1 <= page <= len(doc):
+                raise ValueError(f"页码 {page} 超出范围，文档共 {len(doc)} 页: {pdf_path}")
+            return doc[page - 1].get_pixmap(
+                dpi=dpi or self.dpi,
+                colorspace=COLORSPACES[(colorspace or self.colorspace).lower()],
+                alpha=False,
+            )
+
+    def render_jpeg(self, pdf_path: str, page: int, *, dpi: int = None, colorspace: str = None, quality: int = None) -> bytes:
+        """渲染单页并直接输出 JPEG 字节"""
+        key = None
+        if self.cache is not None:
+            path = Path(pdf_path).resolve()
+            if path.exists():
+                key = (
+                    str(path),
+                    path.stat().st_mtime,
+                    page,
+                    dpi or self.dpi,
+                    (colorspace or self.colorspace).lower(),
+                    quality or self.jpeg_quality,
+                )
+                data = self.cache.get(key)
+                if data is not None:
+                    return data
+
+        pix = self.render_pixmap(pdf_path, page, dpi=dpi, colorspace=colorspace)
+        data = pix.tobytes("jpeg", jpg_quality=quality or self.jpeg_quality)
+        if key is not None:
+            self.cache.put(key, data)
+        return data
+
+    def render_image(self, pdf_path: str, page: int, *, dpi: int = None, colorspace: str = None) -> Image.Image:
+        """渲染单页为未经压缩的 PIL 图片（直接使用像素缓冲区，不经过任何编码）"""
+        pix = self.render_pixmap(pdf_path, page, dpi=dpi, colorspace=colorspace)
+        mode = "L" if pix.n == 1 else "RGB"
+        return Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+
+    def render_images(self, pdf_path: str, first_page: int, last_page: int, *, dpi: int = None) -> List[Image.Image]:
+        """渲染页码范围内的页面，返回 JPEG 格式的 PIL 图片（format == 'JPEG'，可直接交给 CAMEL 按 JPEG 发送）"""
+        images = []
+        for page in range(first_page, last_page + 1):
+            images.append(Image.open(BytesIO(self.render_jpeg(pdf_path, page, dpi=dpi))))
+        return images
+
+    def iter_jpeg(self, pdf_path: str, first_page: int = 1, last_page: int = None, *, dpi: int = None) -> Iterator[Tuple[int, bytes]]:
+        """逐页产出 (页码, JPEG 字节)"""
+        total_pages = self.page_count(pdf_path)
+        last_page = min(last_page or total_pages, total_pages)
+        for page in range(first_page, last_page + 1):
+            yield page, self.render_jpeg(pdf_path, page, dpi=dpi)
+
+    def close(self):
+        with self._lock:
+            for doc in self._documents.values():
+                doc.close()
+            self._documents.clear()
+
+
+# 对象间的间接引用，如 `12 0 R`
+_REFERENCE = re.compile(r"\b(\d+) 0 R\b")
+# 与解码后的内容无关的键：页面树上级、数据流长度与压缩方式（重新保存时会变化）
+_IGNORED_KEYS = re.compile(r"/Parent \d+ 0 R|/Length \d+|/Filter\s*(/\w+|\[[^\]]*\])|/DecodeParms\s*(<<[^<>]*>>|\[[^\]]*\])")
+
+
+class _ObjectHasher:
+    """
+    按对象引用图递归计算哈希：对象定义中的引用替换为被引用对象的哈希，数据流按解码后的内容计算。
+    指向页面或页面树节点的引用（链接目标、注释的 /P）不展开，避免把整个文档卷进来。
+    同一文档的多页共用一个实例，字体、图片等共享对象只计算一次；
+    处在循环引用（如互相引用的注释）上的对象结果依赖遍历入口，不写入 memo，保证哈希与计算顺序无关。
+    """
+
+    def __init__(self, doc: fitz.Document):
+        self.doc = doc
+        self.memo: Dict[int, str] = {}
+        self._stack: List[int] = []
+
+    def normalize(self, source: str) -> Tuple[str, float]:
+        """返回替换引用后的定义，以及引用到的最浅的栈上对象位置（没有循环时为无穷大）"""
+        low = [float("inf")]
+
+        def replace(match: re.Match) -> str:
+            xref = int(match.group(1))
+            if self.doc.xref_get_key(xref, "Type")[1] in ("/Page", "/Pages"):
+                return "page"
+            digest, child_low = self.digest(xref)
+            low[0] = min(low[0], child_low)
+            return digest
+
+        return _REFERENCE.sub(replace, _IGNORED_KEYS.sub("", source)), low[0]
+
+    def digest(self, xref: int) -> Tuple[str, float]:
+        if xref in self.memo:
+            return self.memo[xref], float("inf")
+        if not 0 < xref < self.doc.xref_length():
+            return "null", float("inf")
+        if xref in self._stack:
+            return "ref", self._stack.index(xref)
+
+        depth = len(self._stack)
+        self._stack.append(xref)
+        try:
+            source, low = self.normalize(self.doc.xref_object(xref, compressed=True))
+            digest = hashlib.sha256(source.encode("utf-8"))
+            if self.doc.xref_is_stream(xref):
+                digest.update(b"stream\0")
+                digest.update(self.doc.xref_stream(xref) or b"")
+        finally:
+            self._stack.pop()
+        if low > depth:
+            self.memo[xref] = digest.hexdigest()
+        return digest.hexdigest(), low
+
+    def page_digest(self, pdf_page: fitz.Page) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{tuple(pdf_page.rect)}|{pdf_page.rotation}|".encode("utf-8"))
+        digest.update(self.digest(pdf_page.xref)[0].encode("utf-8"))
+        # 页面可能从页面树的上级节点继承资源
+        parent = self.doc.xref_get_key(pdf_page.xref, "Parent")
+        while self.doc.xref_get_key(pdf_page.xref, "Resources")[0] == "null" and parent[0] == "xref":
+            parent_xref = int(parent[1].split()[0])
+            kind, value = self.doc.xref_get_key(parent_xref, "Resources")
+            if kind != "null":
+                digest.update(self.normalize(value)[0].encode("utf-8"))
+                break
+            parent = self.doc.xref_get_key(parent_xref, "Parent")
+        return digest.hexdigest()
+
+
+# 全局共享实例
+page_renderer = PageRenderer()
+
+
+def page_hashes_worker(pdf_path: str) -> List[str]:
+    """
+    供进程池调用的逐页内容哈希：模块级函数才能被 pickle；每个子进程使用自己的 page_renderer 实例与文档句柄缓存。
+    本模块只依赖 settings 与 PyMuPDF，子进程导入开销很小。进程池中的页面渲染见 image_store.store_page_worker。
+    """
+    return page_renderer.page_hashes(pdf_path)
@@ -0,0 +1,69 @@
+"""
+自适应选页：根据重排分数决定送入 VLM 的页数
+VLM 的开销随图片数线性增长，某一页明显胜出时没有必要固定送 top_k 张。
+重排结果按分数从高到低依次判断，遇到第一张不满足条件的页面即截止：
+- 前 min_pages 张总是保留
+- 最多保留 max_pages 张
+- 分数低于 min_score（绝对阈值，0 表示不启用）的页面截止
+- 分数低于 drop_ratio * 最高分（相对最高分的落差，0 表示不启用）的页面截止
+"""
+from typing import Any, Dict, List
+
+from loguru import logger
+
+from src.settings import settings
+
+logger = logger.bind(module="page_selector")
+
+
+class PageSelector:
+    def __init__(
+            self,
+            min_pages: int = None,
+            max_pages: int = None,
+            min_score: float = None,
+            drop_ratio: float = None,
+            ):
+        self.min_pages = settings.PAGE_SELECTOR_MIN_PAGES if min_pages is None else min_pages
+        self.max_pages = settings.PAGE_SELECTOR_MAX_PAGES if max_pages is None else max_pages
+        self.min_score = settings.PAGE_SELECTOR_MIN_SCORE if min_score is None else min_score
+        self.drop_ratio = settings.PAGE_SELECTOR_DROP_RATIO if drop_ratio is None else drop_ratio
+        if not 1 <= self.min_pages <= self.max_pages:
+            raise ValueError(f"需要满足 1 <= min_pages <= max_pages，当前为 {self.min_pages} / {self.max_pages}")
+
+        # 累计统计：相对于固定送 max_pages 张节省的图片数
+        self.queries = 0
+        self.selected_images = 0
+        self.saved_images = 0
+
+    def select(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Args:
+            results: 重排服务返回的 results，每项含 relevance_score，顺序任意
+        Returns:
+            保留的条目，按分数从高到低排列
+        """
+        ranked = sorted(results, key=lambda item: -item["relevance_score"])
+        if not ranked:
+            return []
+        top_score = ranked[0]["relevance_score"]
+
+        selected = ranked[: self.min_pages]
+        for item in ranked[self.min_pages: self.max_pages]:
+            score = item["relevance_score"]
+            if self.min_score and score < self.min_score:
+                break
+            # 最高分不为正时比例没有意义，只按绝对阈值截止
+            if self.drop_ratio and top_score > 0 and score < self.drop_ratio * top_score:
+                break
+            selected.append(item)
+
+        baseline = min(len(ranked), self.max_pages)
+        self.queries += 1
+        self.selected_images += len(selected)
+        self.saved_images += baseline - len(selected)
+        logger.info(
+            f"自适应选页：候选 {len(ranked)} 页，送入 VLM {len(selected)} 张（最高分 {top_score:.4f}），"
+            f"本次节省 {baseline - len(selected)} 张，累计 {self.queries} 次查询共节省 {self.saved_images} 张"
+        )
+        return selected
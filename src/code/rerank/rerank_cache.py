@@ -0,0 +1,76 @@
+"""
+重排结果缓存
+以 (模型名, 规范化后的查询, 按顺序的候选 id, top_n, 是否返回文档) 为 key 缓存重排服务的响应，
+条目数超过上限时按 LRU 淘汰，超过 TTL 的条目视为过期。热门问题对同一批候选页面重复提问时直接命中，
+跳过开销最大的多模态打分请求。
+"""
+import copy
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from loguru import logger
+
+logger = logger.bind(module="rerank_cache")
+
+RerankKey = Tuple[str, str, Tuple[str, ...], int, bool]
+
+
+def normalize_query(query: str) -> str:
+    """NFKC 归一化（全角转半角等）、忽略大小写、合并连续空白"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", query)).strip().casefold()
+
+
+class RerankCache:
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 600.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            max_entries: 最多缓存条目数，超出后按 LRU 淘汰
+            ttl_seconds: 条目有效期（秒），0 表示不过期
+            clock: 时间函数，测试时可替换
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+        self._entries: "OrderedDict[RerankKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_name: str, query: str, documents: Sequence[str], top_n: int, return_documents: bool) -> RerankKey:
+        return model_name, normalize_query(query), tuple(documents), top_n, return_documents
+
+    def get(self, key: RerankKey) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and self.clock() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # 返回副本，调用方修改结果不会污染缓存
+        return copy.deepcopy(entry[1])
+
+    def put(self, key: RerankKey, result: Dict[str, Any]):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (self.clock(), copy.deepcopy(result))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,11 +1,14 @@
 from src.settings import settings
+from src.code.transport.http_transport import HTTPTransport, http_transport
 from loguru import logger
-from httpx import AsyncClient, RequestError, Timeout
-from typing import List, Dict, Any
+from httpx import RequestError, Timeout
+from typing import List, Dict, Any, Optional
+from src.code.rerank.rerank_cache import RerankCache
 import src.code.embedding
 from PIL import Image
 from io import BytesIO
 import asyncio
+import itertools
 
 logger = logger.bind(module="JINA_Reranker")
 
@@ -20,14 +23,32 @@ class Reranker():
             model_name: str = RERANKER_MODEL_NAME,
             return_documents: bool = False,
             top_k: int =10,
+            transport: HTTPTransport = None,
+            cache: Optional[RerankCache] = None,
+            shard_size: int = None,
+            endpoints: List[str] = None,
             ):
         self.base_url = baseurl if baseurl else settings.JINA_RERANKER_MODEL_BASE_URL
+        # 候选数超过 shard_size 时拆成多个分片并发打分，再合并出全局 top_n；0 表示不拆分
+        self.shard_size = settings.RERANKER_SHARD_SIZE if shard_size is None else shard_size
+        # 多个重排服务地址时分片轮询分发到各个地址
+        self.endpoints = list(endpoints or settings.RERANKER_ENDPOINTS or [self.base_url])
+        self._endpoint_cycle = itertools.cycle(self.endpoints)
         self.api_key = api_key if api_key else None
         self.reranker_name = model_name
         self.return_documents = "True" if return_documents  else "False"
         self.top_k = top_k if top_k else 5
 
         self.timeout = Timeout(60.0, connect=10.0)
+        self.transport = transport or http_transport
+
+        # 同一查询对同一批候选的重排结果缓存（LRU + TTL），RERANKER_CACHE_MAX_ENTRIES 为 0 时关闭
+        self.cache = cache
+        if self.cache is None and settings.RERANKER_CACHE_MAX_ENTRIES > 0:
+            self.cache = RerankCache(
+                max_entries=settings.RERANKER_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.RERANKER_CACHE_TTL_SECONDS,
+            )
         self.headers = {
             "Content-type": "application/json",
             "User-Agent": "wenkai_test"
@@ -38,36 +59,79 @@ class Reranker():
         if not img_urls:
             logger.error(f"未提供图片内容，无法进行重排序！")
             raise ValueError("必须提供待重排序的image列表！")
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = RerankCache.make_key(self.reranker_name, query, img_urls, self.top_k, self.return_documents == "True")
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"重排缓存命中（命中 {self.cache.hits} / 未命中 {self.cache.misses}）")
+                return cached
         
+        if self.shard_size and len(img_urls) > self.shard_size:
+            result = await self._rerank_sharded(query, img_urls)
+        else:
+            result = await self._post_rerank(next(self._endpoint_cycle), query, img_urls, self.top_k)
+
+        if cache_key is not None:
+            self.cache.put(cache_key, result)
+        return result
+
+    async def _rerank_sharded(self, query: str, img_urls: List[str]) -> Dict[str, Any]:
+        """
+        按 shard_size 切分候选并发请求，每个分片取自身的 top_n（全局 top_n 必然在各分片的 top_n 之中），
+        合并时 index 换算回全局位置，按分数降序、同分按原始顺序排列后取前 top_n。
+        m0 为逐对打分，不同分片的 relevance_score 可以直接比较。
+        """
+        shards = [(start, img_urls[start: start + self.shard_size]) for start in range(0, len(img_urls), self.shard_size)]
+        logger.info(f"{len(img_urls)} 个候选拆分为 {len(shards)} 个分片，分发到 {len(self.endpoints)} 个重排服务")
+        responses = await asyncio.gather(*(
+            self._post_rerank(next(self._endpoint_cycle), query, shard, min(self.top_k, len(shard)))
+            for _, shard in shards
+        ))
+
+        results = [
+            {**item, "index": start + item["index"]}
+            for (start, _), response in zip(shards, responses)
+            for item in response.get("results", [])
+        ]
+        results.sort(key=lambda item: (-item["relevance_score"], item["index"]))
+
+        merged = {**responses[0], "results": results[: self.top_k]}
+        usages = [response.get("usage") for response in responses]
+        if all(usage and "total_tokens" in usage for usage in usages):
+            merged["usage"] = {"total_tokens": sum(usage["total_tokens"] for usage in usages)}
+        return merged
+
+    async def _post_rerank(self, endpoint: str, query: str, documents: List[str], top_n: int) -> Dict[str, Any]:
         payload = {
             "model": self.reranker_name,
             "query": query,
-            "documents": img_urls, # 传入URL地址
+            "documents": documents, # 传入URL地址
             # "documents": [
             #     "https://jina.ai/blog-banner/using-deepseek-r1-reasoning-model-in-deepsearch.webp"
             #     ],
-            "top_n": self.top_k,
+            "top_n": top_n,
             "return_documents": f"{self.return_documents}",
         }
         logger.info(f"payload构造完毕，前50字符: {str(payload)}...")
 
-        async with AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.post(
-                    url=self.base_url,
-                    headers= self.headers,
-                    json=payload
-                )
-                
-                if response.status_code != 200:
-                    raise ValueError(f"HTTP Error {response.status_code}: {response.text}")
-
-                result = response.json()
-                return result
-                
-            except RequestError as e:
-                logger.warning(f"请求JinaEmbedding服务器时出现异常：{e}")
-                raise 
+        try:
+            response = await self.transport.post(
+                endpoint,
+                headers= self.headers,
+                json=payload,
+                timeout=self.timeout,
+            )
+            
+            if response.status_code != 200:
+                raise ValueError(f"HTTP Error {response.status_code}: {response.text}")
+
+            return response.json()
+            
+        except RequestError as e:
+            logger.warning(f"请求JinaEmbedding服务器时出现异常：{e}")
+            raise 
 
 # 测试代码
 reranker = Reranker(return_documents=True)
@@ -0,0 +1,126 @@
+"""
+共享的异步 HTTP 传输层
+为 embedding / rerank 等模型客户端提供长连接复用（keep-alive 连接池），避免每次调用都重新建立 TCP 连接
+"""
+import asyncio
+import importlib.util
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+import httpx
+from httpx import AsyncClient, Limits, Timeout
+from loguru import logger
+
+from src.settings import settings
+
+logger = logger.bind(module="http_transport")
+
+DEFAULT_TIMEOUT = Timeout(60.0, connect=10.0)
+
+
+class HTTPTransport:
+    """
+    按目标主机（scheme://host:port）维护长生命周期的 AsyncClient，
+    每个主机拥有独立的连接池，从而实现按主机的连接数上限。
+
+    httpx 的连接池绑定在创建它的事件循环上，若检测到事件循环发生变化（例如多次调用 asyncio.run），
+    会在新循环上重建连接池，并在后台关闭旧连接池（旧循环已关闭时连接无法正常关闭，记录日志后丢弃）。
+    长期运行的服务应在同一个事件循环中调用 startup / shutdown。
+    """
+
+    def __init__(
+            self,
+            *,
+            timeout: Timeout = DEFAULT_TIMEOUT,
+            max_connections_per_host: int = None,
+            max_keepalive_per_host: int = None,
+            keepalive_expiry: float = None,
+            http2: bool = None,
+            ):
+        self.timeout = timeout
+        self.limits = Limits(
+            max_connections=max_connections_per_host or settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+            max_keepalive_connections=max_keepalive_per_host or settings.HTTP_MAX_KEEPALIVE_PER_HOST,
+            keepalive_expiry=keepalive_expiry if keepalive_expiry is not None else settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+
+        http2 = settings.HTTP2_ENABLED if http2 is None else http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("已开启 HTTP/2 但未安装 h2 依赖（pip install httpx[http2]），回退到 HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+
+        self._clients: Dict[str, AsyncClient] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 正在后台关闭的旧连接池任务，持有引用以免任务被回收
+        self._closing: Set[asyncio.Task] = set()
+
+    async def startup(self, base_urls: List[str] = None):
+        """预先为给定的服务地址创建连接池"""
+        for url in base_urls or []:
+            self._client_for(url)
+        logger.info(f"HTTP 传输层已启动，连接池: {list(self._clients)}，HTTP/2: {self.http2}")
+
+    async def shutdown(self):
+        """关闭所有连接池，释放 keep-alive 连接"""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+        loop = asyncio.get_running_loop()
+        pending = [task for task in self._closing if task.get_loop() is loop]
+        if pending:
+            await asyncio.gather(*pending)
+        self._loop = None
+        logger.info(f"HTTP 传输层已关闭 {len(clients)} 个连接池")
+
+    async def post(
+            self,
+            url: str,
+            *,
+            headers: Dict[str, str] = None,
+            json: Any = None,
+            timeout: Timeout = None,
+            ) -> httpx.Response:
+        client = self._client_for(url)
+        return await client.post(
+            url=url,
+            headers=headers,
+            json=json,
+            timeout=timeout or self.timeout,
+        )
+
+    def _client_for(self, url: str) -> AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._clients:
+                logger.warning(f"事件循环已变化，关闭旧的连接池 {list(self._clients)} 并在新循环上重建")
+                task = loop.create_task(self._close_stale(self._clients))
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+            self._clients = {}
+            self._loop = loop
+
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        client = self._clients.get(origin)
+        if client is None:
+            client = AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+            )
+            self._clients[origin] = client
+        return client
+
+    @staticmethod
+    async def _close_stale(clients: Dict[str, AsyncClient]):
+        for origin, client in clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                # 连接属于已关闭的旧事件循环时无法正常关闭，只能丢弃
+                logger.debug(f"关闭旧连接池 {origin} 失败，已丢弃：{e}")
+
+
+# 全局共享实例
+http_transport = HTTPTransport()
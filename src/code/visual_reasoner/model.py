@@ -4,12 +4,15 @@ from camel.messages import BaseMessage
 from camel.agents.chat_agent import ChatAgent
 from typing import List, Any, Dict, Optional
 from PIL import Image, ImageDraw, ImageFont
+from io import BytesIO
 import os
 
 from src.settings import settings
 from src.code.rerank.reranker import Reranker
 from loguru import logger
 from src.code.data_base.database import VectorDatabase, vector_db
+from src.code.rendering.image_store import page_image_store
+from src.code.rendering.image_encoding import EncodingProfile, encode_image, get_profile, to_data_url
 import asyncio
 
 logger = logger.bind(module="visual_reasoner_model")
@@ -21,6 +24,8 @@ class VisionLanguageModel:
             model_platform: ModelPlatformType = ModelPlatformType.OPENAI_COMPATIBLE_MODEL,
             model_name: str = settings.VLM_MODEL_NAME,
             url: str = settings.VLM_BASE_URL,
+            encoding_profile: EncodingProfile = None,
+            page_watermark: bool = settings.VLM_PAGE_WATERMARK,
             ):
 
         self.vison_model = ModelFactory.create(
@@ -32,12 +37,17 @@ class VisionLanguageModel:
             }
         )
         self.database = vector_db
+        # 发送前按编码配置缩放、压缩，默认 VLM_ENCODING_PROFILE
+        self.encoding_profile = encoding_profile or get_profile(settings.VLM_ENCODING_PROFILE)
+        # 关闭页码水印时页码改为写在提示词中，图片库中的 JPEG 满足编码配置时原样发送，不解码、不重新编码
+        self.page_watermark = page_watermark
         logger.info(f"VisionLanguageModel 已就绪")
 
-    def run(self,query:str, image_urls: List[str]):
+    def run(self,query:str, image_urls: List[str], image_pages: Optional[List[Optional[int]]] = None):
 
         images = self._load_images_from_urls(image_urls)
-        images_pages = [self.database.get_page_index_by_image_url(image_url=image_url) for image_url in image_urls]
+        # 调用方已查好页码时（如异步检索链路）不再访问数据库
+        images_pages = image_pages if image_pages is not None else self.database.get_page_indexes_by_image_urls(image_urls=image_urls)
 
         """
         原始代码：
@@ -83,19 +93,38 @@ class VisionLanguageModel:
         """
         添加视觉水印检查模型是否可以正确对应页面
         """
+        # 直接交给 CAMEL 的 PIL 图片会按 PNG 无损编码，这里按编码配置编码后以 data URL 传入
         processed_images = []
-        for img, p_idx in zip(images, images_pages):
-            # 给图片打上 "Page 36" 的水印
-            new_img = self._add_page_number_to_image(img, p_idx)
-            processed_images.append(new_img)
-        
+        for data, p_idx in zip(images, images_pages):
+            if self.page_watermark:
+                # 给图片打上 "Page 36" 的水印；水印会改动像素，只能解码后重新编码一次
+                data = encode_image(self._add_page_number_to_image(Image.open(BytesIO(data)), p_idx), self.encoding_profile)
+            else:
+                data = encode_image(data, self.encoding_profile)
+            processed_images.append(to_data_url(data, self.encoding_profile))
+
+        if self.page_watermark:
+            page_rules = (
+                "1. **视觉锚点**：每张图片的**左上角**都有一个红色的页码标记（例如 '|<Page 1>|'）。\n"  # <--- 关键修改：告诉它看哪里
+                "2. **来源引用**：在回答时，**必须**直接引用该视觉标记上的页码。例如：'根据 |<Page 1>| 的内容...'。\n"
+            )
+            page_hint = (
+                f"- 我已在每张图片的左上角标注了真实页码（如 |<Page 12>|, |<Page 36>|）。\n"
+                f"- 请**忽略**图片在列表中的顺序，**只认图片上印着的页码数字**。\n"
+            )
+        else:
+            page_rules = (
+                "1. **页码映射**：用户消息中给出了每张图片对应的文档页码。\n"
+                "2. **来源引用**：在回答时，**必须**引用图片对应的文档页码而不是图片序号。例如：'来源第 1 页'。\n"
+            )
+            page_hint = "".join(f"- 第 {i + 1} 张图片对应文档的【第 {p_idx} 页】\n" for i, p_idx in enumerate(images_pages))
+
         vision_sys_msg = BaseMessage.make_assistant_message(
             role_name="VisionEye",
             content=(
                 "你是一个精准的文档视觉分析助手。你的任务是根据用户问题从图片中提取答案。\n"
                 "### 核心规则：\n"
-                "1. **视觉锚点**：每张图片的**左上角**都有一个红色的页码标记（例如 '|<Page 1>|'）。\n"  # <--- 关键修改：告诉它看哪里
-                "2. **来源引用**：在回答时，**必须**直接引用该视觉标记上的页码。例如：'根据 |<Page 1>| 的内容...'。\n"
+                + page_rules +
                 "3. **客观陈述**：如果是表格，请还原结构；如果是流程图，请描述流转步骤。\n"
                 "4. **格式要求**：使用 Markdown 格式。"
             )
@@ -108,8 +137,7 @@ class VisionLanguageModel:
         final_prompt = (
             f"请阅读随附的 {len(images)} 张图片，回答问题：【{query}】。\n\n"
             f"⚠️ **重要提示**：\n"
-            f"- 我已在每张图片的左上角标注了真实页码（如 |<Page 12>|, |<Page 36>|）。\n"
-            f"- 请**忽略**图片在列表中的顺序，**只认图片上印着的页码数字**。\n"
+            f"{page_hint}"
             f"- 如果某张图没有包含问题的答案，请直接忽略该图。"
         )
 
@@ -122,22 +150,21 @@ class VisionLanguageModel:
         content = answer.msg.content
         return content
     
-    def _load_images_from_urls(self, image_urls: List[str]) -> List[Any]:
+    def _load_images_from_urls(self, image_urls: List[str]) -> List[bytes]:
+        """读取图片文件的原始编码字节，不在这里解码（只有打水印或需要缩放时才解码）"""
 
         loaded_images = []
 
-        for path in image_urls:
+        # image_url 指向图片库中重排用的低分辨率版本，VLM 读取同一页的高分辨率版本
+        for url in image_urls:
+            path = page_image_store.rendition_of(url, "vlm")
             if not os.path.exists(path):
                 print(f"⚠️ 警告: 文件不存在，跳过: {path}")
                 continue
                 
             try:
-                img = Image.open(path)
-                
-                # 因为 PIL 默认是懒加载，不 .load() 的话文件句柄会一直开着
-                img.load()
-                
-                loaded_images.append(img)
+                with open(path, "rb") as f:
+                    loaded_images.append(f.read())
                 
             except Exception as e:
                 print(f"❌ 错误: 无法加载图片 {path}: {e}")
@@ -4,6 +4,7 @@
 """
 from pathlib import Path
 from dotenv import load_dotenv
+import json
 import os
 
 
@@ -66,6 +67,14 @@ class Settings:
     def VLM_API_KEY(self) -> str:
         return os.getenv("VLM_API_KEY", "EMPTY")
     
+    @property
+    def VLM_ENCODING_PROFILE(self) -> str:
+        return os.getenv("VLM_ENCODING_PROFILE", "vlm")
+    
+    @property
+    def VLM_PAGE_WATERMARK(self) -> bool:
+        return os.getenv("VLM_PAGE_WATERMARK", "true").lower() in ("1", "true", "yes")
+    
     # Qwen3 Embedding 模型配置
     @property
     def QWEN3_EMBEDDING_MODEL_BASE_URL(self) -> str:
@@ -100,6 +109,95 @@ class Settings:
     def JINA_EMBEDDING_MODEL_DIMS(self) -> int:
         return int(os.getenv("JINA_EMBEDDING_MODEL_DIMS", "2048"))
     
+    @property
+    def JINA_EMBEDDING_MAX_BATCH_SIZE(self) -> int:
+        return int(os.getenv("JINA_EMBEDDING_MAX_BATCH_SIZE", "32"))
+    
+    @property
+    def JINA_EMBEDDING_MAX_PAYLOAD_BYTES(self) -> int:
+        return int(os.getenv("JINA_EMBEDDING_MAX_PAYLOAD_BYTES", "8388608"))
+    
+    @property
+    def JINA_EMBEDDING_CONCURRENCY(self) -> int:
+        return int(os.getenv("JINA_EMBEDDING_CONCURRENCY", "8"))
+    
+    @property
+    def JINA_EMBEDDING_MAX_RETRIES(self) -> int:
+        return int(os.getenv("JINA_EMBEDDING_MAX_RETRIES", "3"))
+    
+    @property
+    def JINA_EMBEDDING_RETRY_BACKOFF(self) -> float:
+        return float(os.getenv("JINA_EMBEDDING_RETRY_BACKOFF", "1.0"))
+    
+    @property
+    def JINA_EMBEDDING_CACHE_DIR(self) -> str:
+        return os.getenv("JINA_EMBEDDING_CACHE_DIR", ".cache/embeddings")
+    
+    @property
+    def JINA_EMBEDDING_CACHE_MAX_ENTRIES(self) -> int:
+        return int(os.getenv("JINA_EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+    
+    @property
+    def JINA_EMBEDDING_ENCODING_PROFILE(self) -> str:
+        return os.getenv("JINA_EMBEDDING_ENCODING_PROFILE", "embed")
+    
+    # PDF 页面渲染配置（PyMuPDF）
+    @property
+    def PAGE_RENDER_DPI(self) -> int:
+        return int(os.getenv("PAGE_RENDER_DPI", "200"))
+    
+    @property
+    def PAGE_RENDER_COLORSPACE(self) -> str:
+        return os.getenv("PAGE_RENDER_COLORSPACE", "rgb")
+    
+    @property
+    def PAGE_RENDER_JPEG_QUALITY(self) -> int:
+        return int(os.getenv("PAGE_RENDER_JPEG_QUALITY", "75"))
+    
+    @property
+    def RENDERED_PAGE_CACHE_MAX_MB(self) -> int:
+        return int(os.getenv("RENDERED_PAGE_CACHE_MAX_MB", "256"))
+    
+    @property
+    def RENDERED_PAGE_CACHE_DIR(self) -> str:
+        return os.getenv("RENDERED_PAGE_CACHE_DIR", "")
+    
+    # 入库时写入的页面图片库（按内容寻址，每页多个分辨率）
+    @property
+    def PAGE_IMAGE_STORE_DIR(self) -> str:
+        return os.getenv("PAGE_IMAGE_STORE_DIR", ".cache/page_images")
+    
+    @property
+    def PAGE_IMAGE_RENDITIONS(self) -> dict:
+        return json.loads(os.getenv("PAGE_IMAGE_RENDITIONS", '{"embed": 100, "rerank": 100, "vlm": 200}'))
+    
+    # 发送给模型服务的图片编码配置（见 image_encoding.py）
+    @property
+    def IMAGE_ENCODING_PROFILES(self) -> dict:
+        return json.loads(os.getenv(
+            "IMAGE_ENCODING_PROFILES",
+            '{"original": {}, '
+            '"embed": {"max_side": 1280, "format": "JPEG", "quality": 80, "grayscale": "auto"}, '
+            '"vlm": {"max_side": 2560, "format": "JPEG", "quality": 85, "grayscale": "never"}}',
+        ))
+    
+    # 共享 HTTP 连接池配置（embedding / rerank 等模型客户端共用）
+    @property
+    def HTTP_MAX_CONNECTIONS_PER_HOST(self) -> int:
+        return int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "32"))
+    
+    @property
+    def HTTP_MAX_KEEPALIVE_PER_HOST(self) -> int:
+        return int(os.getenv("HTTP_MAX_KEEPALIVE_PER_HOST", "16"))
+    
+    @property
+    def HTTP_KEEPALIVE_EXPIRY(self) -> float:
+        return float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+    
+    @property
+    def HTTP2_ENABLED(self) -> bool:
+        return os.getenv("HTTP2_ENABLED", "false").lower() in ("1", "true", "yes")
+    
     # Qwen3 Rerank 模型配置
     @property
     def QWEN3_RERANKER_MODEL_BASE_URL(self) -> str:
@@ -110,6 +208,39 @@ class Settings:
     def JINA_RERANKER_MODEL_BASE_URL(self) -> str:
         return os.getenv("JINA_RERANKER_MODEL_BASE_URL", "http://localhost:9907/v1/rerank")
     
+    @property
+    def RERANKER_CACHE_MAX_ENTRIES(self) -> int:
+        return int(os.getenv("RERANKER_CACHE_MAX_ENTRIES", "1024"))
+    
+    @property
+    def RERANKER_CACHE_TTL_SECONDS(self) -> float:
+        return float(os.getenv("RERANKER_CACHE_TTL_SECONDS", "600"))
+    
+    @property
+    def RERANKER_SHARD_SIZE(self) -> int:
+        return int(os.getenv("RERANKER_SHARD_SIZE", "16"))
+    
+    @property
+    def RERANKER_ENDPOINTS(self) -> list:
+        return [url.strip() for url in os.getenv("RERANKER_ENDPOINTS", "").split(",") if url.strip()]
+    
+    # 送入 VLM 前的自适应选页（见 page_selector.py）
+    @property
+    def PAGE_SELECTOR_MIN_PAGES(self) -> int:
+        return int(os.getenv("PAGE_SELECTOR_MIN_PAGES", "1"))
+    
+    @property
+    def PAGE_SELECTOR_MAX_PAGES(self) -> int:
+        return int(os.getenv("PAGE_SELECTOR_MAX_PAGES", "5"))
+    
+    @property
+    def PAGE_SELECTOR_MIN_SCORE(self) -> float:
+        return float(os.getenv("PAGE_SELECTOR_MIN_SCORE", "0"))
+    
+    @property
+    def PAGE_SELECTOR_DROP_RATIO(self) -> float:
+        return float(os.getenv("PAGE_SELECTOR_DROP_RATIO", "0.5"))
+    
     # 小红书 OCR 模型配置
     @property
     def DOTS_OCR_MODEL_BASE_URL(self) -> str:
@@ -120,6 +251,47 @@ class Settings:
     def MINERU_VLM_SERVER_URL(self) -> str:
         return os.getenv("MINERU_VLM_SERVER_URL", "http://localhost:9909")
     
+    # 向量数据库后端：milvus（默认）或 local（本地内存映射扁平索引）
+    @property
+    def VECTOR_DATABASE_BACKEND(self) -> str:
+        return os.getenv("VECTOR_DATABASE_BACKEND", "milvus")
+    
+    @property
+    def VECTOR_DATABASE_LOCAL_PATH(self) -> str:
+        return os.getenv("VECTOR_DATABASE_LOCAL_PATH", ".cache/vector_index")
+    
+    @property
+    def VECTOR_INDEX_TYPE(self) -> str:
+        return os.getenv("VECTOR_INDEX_TYPE", "AUTOINDEX")
+    
+    @property
+    def VECTOR_INDEX_PARAMS(self) -> dict:
+        return json.loads(os.getenv("VECTOR_INDEX_PARAMS", "{}"))
+    
+    @property
+    def VECTOR_SEARCH_PARAMS(self) -> dict:
+        return json.loads(os.getenv("VECTOR_SEARCH_PARAMS", "{}"))
+    
+    @property
+    def VECTOR_QUANTIZATION(self) -> str:
+        return os.getenv("VECTOR_QUANTIZATION", "none")
+    
+    @property
+    def VECTOR_QUANTIZATION_RESCORE_FACTOR(self) -> int:
+        return int(os.getenv("VECTOR_QUANTIZATION_RESCORE_FACTOR", "4"))
+    
+    @property
+    def VECTOR_MATRYOSHKA_DIMS(self) -> int:
+        return int(os.getenv("VECTOR_MATRYOSHKA_DIMS", "0"))
+    
+    @property
+    def VECTOR_MATRYOSHKA_RESCORE_FACTOR(self) -> int:
+        return int(os.getenv("VECTOR_MATRYOSHKA_RESCORE_FACTOR", "10"))
+    
+    @property
+    def SIMILARITY_CHUNK_SIZE(self) -> int:
+        return int(os.getenv("SIMILARITY_CHUNK_SIZE", "65536"))
+    
     # Milvus 向量数据库配置
     @property
     def VECTOR_DATABASE_URI(self) -> str:
@@ -133,10 +305,32 @@ class Settings:
     def VECTOR_COLLECTION_NAME(self) -> str:
         return os.getenv("VECTOR_COLLECTION_NAME", "aigc")
     
+    # 已废弃：保留以兼容旧的 .env，代码不再读取；入库写库分块大小见 INGEST_INSERT_CHUNK_SIZE
     @property
     def VECTOR_DATABASE_CHUNK_SIZE(self) -> int:
         return int(os.getenv("VECTOR_DATABASE_CHUNK_SIZE", "12800"))
     
+    @property
+    def VECTOR_DATABASE_EXECUTOR_WORKERS(self) -> int:
+        return int(os.getenv("VECTOR_DATABASE_EXECUTOR_WORKERS", "8"))
+    
+    @property
+    def VECTOR_DATABASE_PAGE_MAP_ENABLED(self) -> bool:
+        return os.getenv("VECTOR_DATABASE_PAGE_MAP_ENABLED", "true").lower() in ("1", "true", "yes")
+    
+    # 批量入库配置
+    @property
+    def INGEST_RENDER_WORKERS(self) -> int:
+        return int(os.getenv("INGEST_RENDER_WORKERS", "0")) or (os.cpu_count() or 1)
+    
+    @property
+    def INGEST_MAX_CONCURRENT_DOCUMENTS(self) -> int:
+        return int(os.getenv("INGEST_MAX_CONCURRENT_DOCUMENTS", "2"))
+    
+    @property
+    def INGEST_INSERT_CHUNK_SIZE(self) -> int:
+        return int(os.getenv("INGEST_INSERT_CHUNK_SIZE", "256"))
+    
     # Neo4j 图数据库配置
     @property
     def NEO4J_BASE_URL(self) -> str:
@@ -0,0 +1,23 @@
+"""
+测试公共 fixture
+database 模块导入时会按当前配置创建全局的 embedding 客户端与向量库实例（默认连接 Milvus），
+需要它的测试通过 database_module 获取：导入期间临时改用本地后端、关闭 embedding 缓存，导入完成后恢复环境变量。
+"""
+import importlib
+import sys
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def database_module(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("VECTOR_DATABASE_BACKEND", "local")
+        mp.setenv("VECTOR_DATABASE_LOCAL_PATH", str(tmp_path_factory.mktemp("vector_index")))
+        mp.setenv("JINA_EMBEDDING_CACHE_DIR", "")
+        if "src.code.data_base.database" in sys.modules:
+            module = importlib.reload(sys.modules["src.code.data_base.database"])
+        else:
+            module = importlib.import_module("src.code.data_base.database")
+    yield module
+    module.vector_db._executor.shutdown(wait=False)
@@ -0,0 +1,118 @@
+"""
+EmbeddingCache 单元测试
+测试 embedding_cache.py 中的持久化、LRU 淘汰、多实例共用目录与 key 计算
+"""
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.code.embedding.embedding_cache import EmbeddingCache, shared_cache
+
+
+class TestEmbeddingCache:
+    """EmbeddingCache 类的单元测试"""
+
+    @pytest.fixture
+    def cache_dir(self, tmp_path):
+        return tmp_path / "embeddings"
+
+    def test_put_and_get(self, cache_dir):
+        """测试写入后可以读回相同的向量"""
+        cache = EmbeddingCache(cache_dir, dim=4, max_entries=8)
+        cache.put("k1", [0.1, 0.2, 0.3, 0.4])
+
+        result = cache.get("k1")
+
+        assert np.allclose(result, [0.1, 0.2, 0.3, 0.4])
+        assert cache.get("missing") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_persists_across_instances(self, cache_dir):
+        """测试重新打开缓存目录后数据仍然存在"""
+        cache = EmbeddingCache(cache_dir, dim=4, max_entries=8)
+        cache.put("k1", [1.0, 2.0, 3.0, 4.0])
+        cache.close()
+
+        reopened = EmbeddingCache(cache_dir, dim=4, max_entries=8)
+
+        assert np.allclose(reopened.get("k1"), [1.0, 2.0, 3.0, 4.0])
+
+    def test_lru_eviction(self, cache_dir):
+        """测试超出容量时淘汰最久未使用的条目"""
+        cache = EmbeddingCache(cache_dir, dim=2, max_entries=2)
+        cache.put("a", [1.0, 1.0])
+        cache.put("b", [2.0, 2.0])
+        cache.get("a")
+        cache.put("c", [3.0, 3.0])
+
+        assert cache.get("b") is None
+        assert np.allclose(cache.get("a"), [1.0, 1.0])
+        assert np.allclose(cache.get("c"), [3.0, 3.0])
+        assert len(cache) == 2
+
+    def test_lru_order_survives_reopen(self, cache_dir):
+        """测试 LRU 顺序被持久化"""
+        cache = EmbeddingCache(cache_dir, dim=2, max_entries=2)
+        cache.put("a", [1.0, 1.0])
+        cache.put("b", [2.0, 2.0])
+        cache.get("a")
+        cache.close()
+
+        reopened = EmbeddingCache(cache_dir, dim=2, max_entries=2)
+        reopened.put("c", [3.0, 3.0])
+
+        assert reopened.get("b") is None
+        assert reopened.get("a") is not None
+
+    def test_wrong_dim_is_skipped(self, cache_dir):
+        """测试维度不一致的向量不会写入"""
+        cache = EmbeddingCache(cache_dir, dim=4, max_entries=8)
+
+        assert cache.put("k1", [1.0, 2.0]) is False
+        assert cache.get("k1") is None
+
+    def test_make_key(self):
+        """测试 key 区分模型、维度、文本与图片内容"""
+        base = EmbeddingCache.make_key("m", 4, text="hello")
+
+        assert base == EmbeddingCache.make_key("m", 4, text="hello")
+        assert base != EmbeddingCache.make_key("m2", 4, text="hello")
+        assert base != EmbeddingCache.make_key("m", 8, text="hello")
+        assert base != EmbeddingCache.make_key("m", 4, text="hello!")
+
+        white = Image.new("RGB", (4, 4), "white")
+        black = Image.new("RGB", (4, 4), "black")
+        assert EmbeddingCache.make_key("m", 4, image=white) == EmbeddingCache.make_key("m", 4, image=white.copy())
+        assert EmbeddingCache.make_key("m", 4, image=white) != EmbeddingCache.make_key("m", 4, image=black)
+        assert base != EmbeddingCache.make_key("m", 4, text="hello", variant="input")
+
+    def test_instances_sharing_directory_do_not_overwrite(self, cache_dir):
+        """测试同一目录上的多个实例（如多个进程）分配不同槽位，互不覆盖"""
+        a = EmbeddingCache(cache_dir, dim=4, max_entries=8)
+        b = EmbeddingCache(cache_dir, dim=4, max_entries=8)
+
+        a.put("ka", [1.0, 0.0, 0.0, 0.0])
+        b.put("kb", [0.0, 1.0, 0.0, 0.0])
+
+        assert np.allclose(a.get("ka"), [1.0, 0.0, 0.0, 0.0])
+        assert np.allclose(a.get("kb"), [0.0, 1.0, 0.0, 0.0])
+        assert np.allclose(EmbeddingCache(cache_dir, dim=4, max_entries=8).get("ka"), [1.0, 0.0, 0.0, 0.0])
+        assert len(a) == len(b) == 2
+
+    def test_eviction_across_instances(self, cache_dir):
+        """测试一个实例淘汰的条目在其他实例中同样失效，不会读到被复用槽位上的向量"""
+        a = EmbeddingCache(cache_dir, dim=2, max_entries=2)
+        b = EmbeddingCache(cache_dir, dim=2, max_entries=2)
+        a.put("x", [1.0, 1.0])
+        a.put("y", [2.0, 2.0])
+
+        b.put("z", [3.0, 3.0])
+
+        assert a.get("x") is None
+        assert np.allclose(a.get("z"), [3.0, 3.0])
+        assert np.allclose(b.get("y"), [2.0, 2.0])
+
+    def test_shared_cache_per_directory(self, cache_dir):
+        """测试 shared_cache 在同一进程内按目录与维度复用实例"""
+        assert shared_cache(cache_dir, dim=4) is shared_cache(cache_dir, dim=4)
+        assert shared_cache(cache_dir, dim=4) is not shared_cache(cache_dir, dim=8)
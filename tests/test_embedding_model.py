@@ -0,0 +1,212 @@
+"""
+JinaEmbeddingClient 批量嵌入单元测试
+使用假的传输层测试 get_embeddings 的顺序保持、坏条目二分定位、瞬时错误重试与图片并发，与 get_embedding 的载荷一致性，以及单条嵌入的瞬时错误重试
+"""
+import asyncio
+import io
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+from PIL import Image
+
+from src.code.embedding.embedding_cache import EmbeddingCache
+from src.code.embedding.embedding_model import EmbeddingHTTPError, JinaEmbeddingClient
+
+
+class FakeEmbeddingServer:
+    """文本含 "bad" 时整批返回 400；status 不为 200 时所有请求返回该状态码"""
+
+    def __init__(self, status: int = 200):
+        self.status = status
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def post(self, url, *, headers=None, json=None, timeout=None):
+        self.requests.append(json)
+        response = MagicMock(status_code=self.status, text="error")
+        if "messages" in json:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            response.json.return_value = {"data": [{"index": 0, "embedding": [1.0, 0.0]}]}
+            return response
+        if self.status == 200 and any("bad" in text for text in json["input"]):
+            response.status_code = 400
+        # 乱序返回，客户端需按 index 还原
+        response.json.return_value = {"data": [
+            {"index": i, "embedding": [float(len(text)), float(i)]} for i, text in reversed(list(enumerate(json["input"])))
+        ]}
+        return response
+
+
+@pytest.fixture
+def make_client(monkeypatch):
+    monkeypatch.setenv("JINA_EMBEDDING_CACHE_DIR", "")
+
+    def make(server, **kwargs):
+        return JinaEmbeddingClient(transport=server, retry_backoff=0, **kwargs)
+    return make
+
+
+class TestGetEmbeddings:
+    """JinaEmbeddingClient.get_embeddings 的单元测试"""
+
+    def test_results_keep_input_order(self, make_client):
+        """测试分批、乱序返回时结果仍与输入一一对应"""
+        server = FakeEmbeddingServer()
+        texts = ["a" * n for n in range(1, 8)]
+
+        results = asyncio.run(make_client(server).get_embeddings(texts, max_batch_size=3))
+
+        assert len(server.requests) == 3
+        assert [result.index for result in results] == list(range(7))
+        assert [result.embedding[0] for result in results] == [float(n) for n in range(1, 8)]
+
+    def test_bisection_isolates_only_bad_item(self, make_client):
+        """测试 4xx 时二分拆分，只有坏条目失败"""
+        server = FakeEmbeddingServer()
+        texts = ["ok1", "ok2", "bad", "ok3", "ok4"]
+
+        results = asyncio.run(make_client(server).get_embeddings(texts, max_batch_size=8))
+
+        assert [result.ok for result in results] == [True, True, False, True, True]
+        assert "400" in results[2].error
+
+    def test_empty_items_fail_without_request(self, make_client):
+        """测试空条目直接标记失败，不发请求、不影响其他条目"""
+        server = FakeEmbeddingServer()
+
+        results = asyncio.run(make_client(server).get_embeddings(["", "text", None]))
+
+        assert [result.ok for result in results] == [False, True, False]
+        assert len(server.requests) == 1
+
+    def test_transient_errors_retry_batch_without_bisection(self, make_client):
+        """测试 503 时整批重试 max_retries 次后整体失败，不拆分"""
+        server = FakeEmbeddingServer(status=503)
+        texts = [f"t{i}" for i in range(32)]
+
+        results = asyncio.run(make_client(server, max_retries=2).get_embeddings(texts, max_batch_size=32))
+
+        assert len(server.requests) == 3
+        assert not any(result.ok for result in results)
+
+    def test_connection_error_is_retried(self, make_client):
+        """测试连接异常后重试成功"""
+        server = FakeEmbeddingServer()
+        post = server.post
+        calls = []
+
+        async def flaky_post(url, **kwargs):
+            calls.append(url)
+            if len(calls) == 1:
+                raise httpx.ConnectError("refused")
+            return await post(url, **kwargs)
+
+        server.post = flaky_post
+        results = asyncio.run(make_client(server, max_retries=1).get_embeddings(["a", "b"]))
+
+        assert len(calls) == 2
+        assert all(result.ok for result in results)
+
+    def test_images_are_embedded_concurrently(self, make_client):
+        """测试图片条目在并发上限内同时请求"""
+        server = FakeEmbeddingServer()
+        images = [Image.new("RGB", (16, 16), "white") for _ in range(6)]
+
+        results = asyncio.run(make_client(server, concurrency=3).get_embeddings(images))
+
+        assert all(result.ok for result in results)
+        assert server.max_in_flight == 3
+
+    def test_bytes_and_path_items_are_images(self, make_client, tmp_path):
+        """测试字节与文件路径条目按图片嵌入，读取失败的路径只让该条目失败"""
+        server = FakeEmbeddingServer()
+        buffer = io.BytesIO()
+        Image.new("RGB", (16, 16), "white").save(buffer, format="JPEG")
+        path = tmp_path / "page.jpeg"
+        path.write_bytes(buffer.getvalue())
+
+        results = asyncio.run(make_client(server).get_embeddings(
+            ["text", buffer.getvalue(), path, tmp_path / "missing.jpeg"]
+        ))
+
+        assert [result.ok for result in results] == [True, True, True, False]
+        image_urls = [request["messages"][0]["content"][0]["image_url"]["url"] for request in server.requests if "messages" in request]
+        assert len(image_urls) == 2 and all(url.startswith("data:image/") for url in image_urls)
+
+
+class TestGetEmbedding:
+    """JinaEmbeddingClient.get_embedding 与批量接口一致性的单元测试"""
+
+    def test_text_uses_same_payload_as_batch(self, make_client):
+        """测试单条文本查询与批量文本走同一种 `input` 载荷，得到相同的向量"""
+        server = FakeEmbeddingServer()
+        client = make_client(server)
+
+        single = asyncio.run(client.get_embedding(text="query"))
+        batch = asyncio.run(client.get_embeddings(["query"]))[0].embedding
+
+        assert [list(request) for request in server.requests] == [["model", "input"], ["model", "input"]]
+        assert server.requests[0]["input"] == server.requests[1]["input"] == ["query"]
+        assert single == batch
+
+    def test_text_shares_cache_with_batch(self, make_client, tmp_path):
+        """测试批量嵌入过的文本，单条查询直接命中缓存"""
+        server = FakeEmbeddingServer()
+        client = make_client(server, cache=EmbeddingCache(tmp_path / "cache", dim=2, max_entries=8))
+        client.embedding_dim = 2
+
+        batch = asyncio.run(client.get_embeddings(["passage"]))[0].embedding
+        single = asyncio.run(client.get_embedding(text="passage"))
+
+        assert len(server.requests) == 1
+        assert single == pytest.approx(batch)
+
+    def test_str_is_never_an_image_path(self, make_client, tmp_path):
+        """测试 str 在两个接口中都只表示文本：图片路径需用 Path"""
+        server = FakeEmbeddingServer()
+        client = make_client(server)
+        path = tmp_path / "page.jpeg"
+        Image.new("RGB", (16, 16), "white").save(path, format="JPEG")
+
+        with pytest.raises(TypeError):
+            asyncio.run(client.get_embedding(image=str(path)))
+        assert asyncio.run(client.get_embedding(image=path)) == [1.0, 0.0]
+        assert asyncio.run(client.get_embeddings([str(path)]))[0].embedding == [float(len(str(path))), 0.0]
+
+    @pytest.mark.parametrize("failures, succeeds", [(2, True), (3, False)])
+    def test_retry_transient_errors(self, make_client, failures, succeeds):
+        """测试 get_embedding_with_retry 遇到瞬时错误时重试，超过 max_retries 次后放弃"""
+        server = FakeEmbeddingServer()
+        post = server.post
+        calls = []
+
+        async def flaky_post(url, **kwargs):
+            calls.append(url)
+            if len(calls) <= failures:
+                server.status = 503
+            else:
+                server.status = 200
+            return await post(url, **kwargs)
+
+        server.post = flaky_post
+        client = make_client(server, max_retries=2)
+        if succeeds:
+            assert asyncio.run(client.get_embedding_with_retry(image=Image.new("RGB", (16, 16), "white"))) == [1.0, 0.0]
+        else:
+            with pytest.raises(EmbeddingHTTPError):
+                asyncio.run(client.get_embedding_with_retry(image=Image.new("RGB", (16, 16), "white")))
+        assert len(calls) == min(failures + 1, 3)
+
+    def test_retry_skips_client_errors(self, make_client):
+        """测试 4xx 等非瞬时错误不重试"""
+        server = FakeEmbeddingServer(status=400)
+        client = make_client(server, max_retries=2)
+
+        with pytest.raises(EmbeddingHTTPError):
+            asyncio.run(client.get_embedding_with_retry(image=Image.new("RGB", (16, 16), "white")))
+        assert len(server.requests) == 1
@@ -0,0 +1,46 @@
+"""
+HTTP 传输层单元测试
+测试按主机复用连接池，以及事件循环变化时关闭旧连接池
+"""
+import asyncio
+
+from src.code.transport.http_transport import HTTPTransport
+
+
+class TestHTTPTransport:
+    """HTTPTransport 的单元测试"""
+
+    def test_clients_are_shared_per_host(self):
+        """测试同一主机的不同路径共用一个连接池"""
+        transport = HTTPTransport(http2=False)
+
+        async def run():
+            await transport.startup(["http://a:1/v1/embeddings", "http://a:1/v1/rerank", "http://b:2/x"])
+            clients = dict(transport._clients)
+            await transport.shutdown()
+            return clients
+
+        clients = asyncio.run(run())
+
+        assert list(clients) == ["http://a:1", "http://b:2"]
+        assert all(client.is_closed for client in clients.values())
+
+    def test_loop_change_closes_stale_clients(self):
+        """测试在新事件循环上使用时重建连接池，并关闭旧循环上的连接池"""
+        transport = HTTPTransport(http2=False)
+
+        async def client_for(url):
+            return transport._client_for(url)
+
+        stale = asyncio.run(client_for("http://a:1/v1/embeddings"))
+
+        async def reuse():
+            fresh = transport._client_for("http://a:1/v1/embeddings")
+            await transport.shutdown()
+            return fresh
+
+        fresh = asyncio.run(reuse())
+
+        assert fresh is not stale
+        assert stale.is_closed and fresh.is_closed
+        assert not transport._closing
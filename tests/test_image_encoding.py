@@ -0,0 +1,80 @@
+"""
+图片编码配置单元测试
+测试 image_encoding.py 的缩放、灰度判定、格式与已编码字节的直通
+"""
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from PIL import Image, ImageDraw
+
+from src.code.rendering.image_encoding import EncodingProfile, encode_image, get_profile, to_data_url
+
+
+def text_page(size=(800, 1100)) -> Image.Image:
+    image = Image.new("RGB", size, "white")
+    ImageDraw.Draw(image).text((50, 50), "only black text", fill="black")
+    return image
+
+
+def color_page(size=(800, 1100)) -> Image.Image:
+    image = text_page(size)
+    ImageDraw.Draw(image).rectangle([100, 200, 500, 600], fill=(200, 30, 30))
+    return image
+
+
+class TestImageEncoding:
+    """encode_image 与编码配置的单元测试"""
+
+    def test_max_side_keeps_aspect_ratio(self):
+        """测试长边超出上限时等比缩小"""
+        profile = EncodingProfile(name="small", max_side=550)
+
+        image = Image.open(BytesIO(encode_image(text_page(), profile)))
+
+        assert image.size == (400, 550)
+        assert image.format == "JPEG"
+
+    def test_auto_grayscale_only_for_text_pages(self):
+        """测试 auto 模式下纯文字页转灰度，彩色页保持 RGB"""
+        profile = EncodingProfile(name="auto", grayscale="auto")
+
+        assert Image.open(BytesIO(encode_image(text_page(), profile))).mode == "L"
+        assert Image.open(BytesIO(encode_image(color_page(), profile))).mode == "RGB"
+
+    def test_webp_profile(self):
+        """测试 WEBP 配置的输出格式与 data URL"""
+        profile = EncodingProfile(name="webp", format="WEBP", quality=60)
+
+        data = encode_image(color_page(), profile)
+
+        assert Image.open(BytesIO(data)).format == "WEBP"
+        assert to_data_url(data, profile).startswith("data:image/webp;base64,")
+
+    def test_bytes_that_fit_are_not_reencoded(self):
+        """测试已满足配置的 JPEG 字节原样返回，不解码像素"""
+        buffer = BytesIO()
+        color_page().save(buffer, format="JPEG")
+        data = buffer.getvalue()
+
+        with patch.object(Image.Image, "save") as mock_save:
+            assert encode_image(data, EncodingProfile(name="jpeg", max_side=2000)) is data
+        mock_save.assert_not_called()
+        assert max(Image.open(BytesIO(encode_image(data, EncodingProfile(name="small", max_side=550)))).size) == 550
+
+    def test_file_path_streams_without_reencode(self, tmp_path):
+        """测试传入文件路径时，满足配置的彩色 JPEG 在 auto 模式下也原样返回，不重新编码"""
+        path = tmp_path / "page.jpeg"
+        color_page().save(path, format="JPEG")
+
+        with patch.object(Image.Image, "save") as mock_save:
+            data = encode_image(str(path), EncodingProfile(name="auto", max_side=2000, grayscale="auto"))
+        mock_save.assert_not_called()
+        assert data == path.read_bytes()
+
+    def test_invalid_profile(self):
+        """测试无效的格式与配置名"""
+        with pytest.raises(ValueError):
+            EncodingProfile(name="bad", format="GIF")
+        with pytest.raises(ValueError):
+            get_profile("no_such_profile")
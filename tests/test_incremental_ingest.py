@@ -0,0 +1,298 @@
+"""
+增量入库单元测试
+使用本地后端与假的 embedding 函数测试 VectorDatabase.add_documents 的按页哈希比对，以及 ingest.py 的批量入库
+"""
+import asyncio
+from pathlib import Path
+
+import fitz
+import pytest
+
+from src.code.data_base.backends import LocalFlatBackend
+from src.code.data_base.ingest import IngestJob, ingest_documents, load_manifest
+from src.code.embedding.embedding_model import EmbeddingHTTPError
+from src.code.rendering.image_store import PageImageStore
+
+DEMO_PDF = Path(__file__).resolve().parent.parent / "demo_data" / "test.pdf"
+
+
+def make_pdf(path: Path, pages, edit_page: int = None) -> str:
+    """从 demo PDF 中选取页面另存，可选在某一页上加一行文字"""
+    doc = fitz.open(str(DEMO_PDF))
+    doc.select(pages)
+    if edit_page is not None:
+        doc[edit_page - 1].insert_text((72, 72), "revised")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+class TestIncrementalIngest:
+    """VectorDatabase.add_documents 增量入库的单元测试"""
+
+    @pytest.fixture
+    def db(self, tmp_path, database_module):
+        calls = []
+
+        async def fake_embedding(image=None, text=None):
+            calls.append(image)
+            return [1.0, float(len(calls)), 0.0, 0.5]
+
+        backend = LocalFlatBackend(tmp_path / "index", quantization="none", prefix_dims=0)
+        image_store = PageImageStore(tmp_path / "images", {"embed": 30, "rerank": 30, "vlm": 60})
+        db = database_module.VectorDatabase(
+            embedding_func=fake_embedding,
+            vector_dim=4,
+            collection_name="docs",
+            backend=backend,
+            image_store=image_store,
+        )
+        db.create_collection("docs")
+        db.embed_calls = calls
+        return db
+
+    def rows(self, db):
+        return db.backend.query("docs", output_fields=["page_index", "doc_id", "content_hash", "image_url"])
+
+    def test_first_ingest_inserts_all_pages(self, db, tmp_path):
+        """测试首次入库写入全部页面并记录 doc_id 与内容哈希"""
+        pdf = make_pdf(tmp_path / "doc.pdf", range(5))
+
+        result = asyncio.run(db.add_documents(pdf, doc_id="doc", collection_name="docs"))
+
+        rows = self.rows(db)
+        assert (result.inserted, result.deleted, result.unchanged) == (5, 0, 0)
+        assert sorted(row["page_index"] for row in rows) == [1, 2, 3, 4, 5]
+        assert all(row["doc_id"] == "doc" and len(row["content_hash"]) == 64 for row in rows)
+        assert all(Path(row["image_url"]) == db.image_store.path(row["content_hash"], "rerank") for row in rows)
+        assert all(Path(row["image_url"]).exists() for row in rows)
+        assert len({row["id"] for row in rows}) == 5
+
+    def test_reingest_unchanged_is_noop(self, db, tmp_path):
+        """测试重复入库同一文件不嵌入、不产生重复行"""
+        pdf = make_pdf(tmp_path / "doc.pdf", range(5))
+        asyncio.run(db.add_documents(pdf, doc_id="doc", collection_name="docs"))
+        db.embed_calls.clear()
+
+        result = asyncio.run(db.add_documents(pdf, doc_id="doc", collection_name="docs"))
+
+        assert (result.inserted, result.deleted, result.unchanged) == (0, 0, 5)
+        assert db.embed_calls == []
+        assert len(self.rows(db)) == 5
+
+    def test_revision_only_touches_diff(self, db, tmp_path):
+        """测试修订版只重新嵌入变化的页面并删除已移除的页面"""
+        asyncio.run(db.add_documents(make_pdf(tmp_path / "v1.pdf", range(5)), doc_id="doc", collection_name="docs"))
+        before = {row["page_index"]: row for row in self.rows(db)}
+        db.embed_calls.clear()
+
+        revised = make_pdf(tmp_path / "v2.pdf", range(4), edit_page=2)
+        result = asyncio.run(db.add_documents(revised, doc_id="doc", collection_name="docs"))
+
+        after = {row["page_index"]: row for row in self.rows(db)}
+        assert (result.inserted, result.deleted, result.unchanged) == (1, 2, 3)
+        assert len(db.embed_calls) == 1
+        assert sorted(after) == [1, 2, 3, 4]
+        assert after[2]["content_hash"] != before[2]["content_hash"]
+        assert after[1]["id"] == before[1]["id"]
+
+    def test_annotation_triggers_reembedding(self, db, tmp_path):
+        """测试只在页面上添加注释（内容流不变）时，该页也会被重新嵌入"""
+        pdf = make_pdf(tmp_path / "doc.pdf", range(3))
+        asyncio.run(db.add_documents(pdf, doc_id="doc", collection_name="docs"))
+        before = {row["page_index"]: row["image_url"] for row in self.rows(db)}
+        db.embed_calls.clear()
+
+        doc = fitz.open(pdf)
+        doc[1].add_freetext_annot(fitz.Rect(72, 72, 300, 120), "reviewed")
+        doc.save(str(tmp_path / "annotated.pdf"))
+        doc.close()
+        result = asyncio.run(db.add_documents(str(tmp_path / "annotated.pdf"), doc_id="doc", collection_name="docs"))
+
+        assert (result.inserted, result.deleted, result.unchanged) == (1, 1, 2)
+        assert len(db.embed_calls) == 1
+        after = {row["page_index"]: row["image_url"] for row in self.rows(db)}
+        assert after[1] == before[1] and after[3] == before[3]
+        assert after[2] != before[2] and Path(after[2]).exists()
+
+    def test_documents_are_isolated(self, db, tmp_path):
+        """测试不同 doc_id 的文档互不影响"""
+        pdf = make_pdf(tmp_path / "doc.pdf", range(3))
+        asyncio.run(db.add_documents(pdf, doc_id="a", collection_name="docs"))
+
+        result = asyncio.run(db.add_documents(pdf, doc_id="b", collection_name="docs"))
+
+        assert result.inserted == 3
+        assert len(self.rows(db)) == 6
+
+    @pytest.mark.parametrize("use_page_map", [True, False])
+    def test_shared_page_resolves_per_document(self, db, tmp_path, use_page_map):
+        """测试不同文档中内容相同的页面共用 image_url 时，按 doc_id 查到各自的页码，未给 doc_id 时不猜测"""
+        db.use_page_map = use_page_map
+        asyncio.run(db.add_documents(make_pdf(tmp_path / "a.pdf", [0, 1, 2]), doc_id="a", collection_name="docs"))
+        asyncio.run(db.add_documents(make_pdf(tmp_path / "b.pdf", [2, 0]), doc_id="b", collection_name="docs"))
+        shared = next(row["image_url"] for row in self.rows(db) if row["doc_id"] == "a" and row["page_index"] == 3)
+        only_a = next(row["image_url"] for row in self.rows(db) if row["doc_id"] == "a" and row["page_index"] == 2)
+
+        pages = db.get_page_indexes_by_image_urls("docs", [shared, shared, only_a, shared], ["a", "b", None, None])
+
+        assert pages == [3, 1, 2, None]
+        assert db.get_page_index_by_image_url("docs", shared, doc_id="b") == 1
+
+    def test_inserts_are_chunked(self, db, tmp_path):
+        """测试按 insert_chunk_size 分块写库，中途失败时已写入的分块保留，重新入库只补齐剩余页面"""
+        db.insert_chunk_size = 2
+        db.embedding_concurrency = 1
+        chunk_sizes = []
+        insert_vectors = db.insert_vectors
+
+        def record_insert(collection_name, vectors, metadatas=None):
+            chunk_sizes.append(len(vectors))
+            return insert_vectors(collection_name, vectors, metadatas)
+
+        db.insert_vectors = record_insert
+        pdf = make_pdf(tmp_path / "doc.pdf", range(5))
+        result = asyncio.run(db.add_documents(pdf, doc_id="doc", collection_name="docs"))
+
+        assert result.inserted == 5
+        assert chunk_sizes == [2, 2, 1]
+
+        other = make_pdf(tmp_path / "other.pdf", range(5, 10))
+        embed = db.embedding_func
+
+        async def failing_embedding(image=None, text=None):
+            if len(db.embed_calls) >= 4:
+                raise RuntimeError("boom")
+            return await embed(image=image, text=text)
+
+        db.embedding_func = failing_embedding
+        db.embed_calls.clear()
+        with pytest.raises(RuntimeError):
+            asyncio.run(db.add_documents(other, doc_id="other", collection_name="docs"))
+        assert len([row for row in self.rows(db) if row["doc_id"] == "other"]) == 4
+
+        db.embedding_func = embed
+        result = asyncio.run(db.add_documents(other, doc_id="other", collection_name="docs"))
+        assert (result.inserted, result.unchanged) == (1, 4)
+
+    def test_pages_are_consumed_lazily_while_embedding(self, db):
+        """测试流式入库按需取页：在途（渲染 + 嵌入）页数不超过 embedding_concurrency，页码迭代器不会被提前读完"""
+        db.embedding_concurrency = 2
+        db.insert_chunk_size = 3
+        hashes = [f"{page:064x}" for page in range(1, 9)]
+        pulled, done = [], []
+        in_flight = max_in_flight = 0
+
+        def pages():
+            for page in range(1, 9):
+                # 页码先取出再等待并发名额，因此最多提前取一页：此时未完成的页数不超过 embedding_concurrency
+                assert page - 1 - len(done) <= db.embedding_concurrency
+                pulled.append(page)
+                yield page
+
+        async def load_page(page):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            return f"img{page}"
+
+        async def slow_embedding(image=None, text=None):
+            nonlocal in_flight
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            done.append(image)
+            return [1.0, 0.0, 0.0, 0.0]
+
+        db.embedding_func = slow_embedding
+        inserted = asyncio.run(db._embed_pages_streaming(
+            pages(), load_page, collection_name="docs", doc_id="doc", hashes=hashes,
+        ))
+
+        assert inserted == 8 and pulled == list(range(1, 9))
+        assert max_in_flight == db.embedding_concurrency
+        assert sorted(row["page_index"] for row in self.rows(db)) == list(range(1, 9))
+
+    def test_embed_page_propagates_failure(self, db):
+        """测试单页嵌入失败时异常原样抛出（重试由 embedding_func 负责，这里不再重试）"""
+        calls = []
+
+        async def bad_embedding(image=None, text=None):
+            calls.append(image)
+            raise EmbeddingHTTPError(503, "unavailable")
+
+        db.embedding_func = bad_embedding
+        with pytest.raises(EmbeddingHTTPError):
+            asyncio.run(db._embed_page("img", page_index=1))
+        assert calls == ["img"]
+
+    def test_bulk_ingest_with_process_pool(self, db, tmp_path):
+        """测试批量入库：目录清单 + 进程池渲染，嵌入收到的是 JPEG 字节，单个坏文件不影响其他文档"""
+        docs_dir = tmp_path / "docs"
+        (docs_dir / "sub").mkdir(parents=True)
+        make_pdf(docs_dir / "a.pdf", range(3))
+        make_pdf(docs_dir / "sub" / "b.pdf", range(3, 5))
+        (docs_dir / "broken.pdf").write_bytes(b"not a pdf")
+
+        documents = load_manifest(str(docs_dir))
+        reports = asyncio.run(ingest_documents(documents, vector_db=db, collection_name="docs", workers=2))
+
+        by_id = {report.doc_id: report for report in reports}
+        assert sorted(by_id) == ["a.pdf", "broken.pdf", "sub/b.pdf"]
+        assert (by_id["a.pdf"].inserted, by_id["sub/b.pdf"].inserted) == (3, 2)
+        assert by_id["broken.pdf"].error is not None
+        assert all(image[:2] == b"\xff\xd8" for image in db.embed_calls)
+        assert len(self.rows(db)) == 5
+
+    def test_resume_job_from_checkpoint(self, db, tmp_path):
+        """测试入库任务中途失败后从检查点继续：已完成的文档跳过，未完成的文档只嵌入剩余页面"""
+        db.insert_chunk_size = 2
+        db.embedding_concurrency = 1
+        embed = db.embedding_func
+
+        async def flaky_embedding(image=None, text=None):
+            if len(db.embed_calls) >= 5:
+                raise TimeoutError("embedding timeout")
+            return await embed(image=image, text=text)
+
+        db.embedding_func = flaky_embedding
+        documents = [(make_pdf(tmp_path / "a.pdf", range(2)), "a"), (make_pdf(tmp_path / "b.pdf", range(2, 7)), "b")]
+        job = IngestJob.create(str(tmp_path / "job.json"), documents, "docs")
+        asyncio.run(ingest_documents([], vector_db=db, workers=1, max_concurrent_documents=1, job=job))
+
+        saved = {r.doc_id: r for r in IngestJob.load(str(tmp_path / "job.json")).reports}
+        assert (saved["a"].status, saved["b"].status) == ("done", "failed")
+        assert (saved["b"].committed_pages, saved["b"].last_committed_page) == (2, 2)
+
+        db.embedding_func = embed
+        db.embed_calls.clear()
+        job = IngestJob.load(str(tmp_path / "job.json"))
+        reports = asyncio.run(ingest_documents([], vector_db=db, workers=1, job=job))
+
+        by_id = {r.doc_id: r for r in reports}
+        assert by_id["b"].status == "done" and by_id["b"].last_committed_page == 5
+        assert (by_id["b"].inserted, by_id["b"].unchanged) == (3, 2)
+        assert len(db.embed_calls) == 3
+        assert len(self.rows(db)) == 7
+
+    def test_main_closes_transport_on_failure(self, tmp_path, monkeypatch):
+        """测试命令行入口在入库抛出异常时仍在同一个事件循环上关闭 HTTP 连接池"""
+        from src.code.data_base import ingest
+        from src.code.transport.http_transport import http_transport
+
+        make_pdf(tmp_path / "a.pdf", range(1))
+        closed = []
+
+        async def failing_ingest(*args, **kwargs):
+            raise RuntimeError("boom")
+
+        async def shutdown():
+            closed.append(asyncio.get_running_loop())
+
+        monkeypatch.setattr(ingest, "ingest_documents", failing_ingest)
+        monkeypatch.setattr(http_transport, "shutdown", shutdown)
+        monkeypatch.setattr("sys.argv", ["ingest", str(tmp_path)])
+
+        with pytest.raises(RuntimeError):
+            ingest.main()
+        assert len(closed) == 1
@@ -0,0 +1,261 @@
+"""
+LocalFlatBackend 单元测试
+测试 backends.py 中本地内存映射扁平索引的建表、写入、检索与持久化，以及 VectorDatabase 在其上按 image_url 反查页码
+"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.code.data_base.backends import LocalFlatBackend, create_backend
+
+
+class TestLocalFlatBackend:
+    """LocalFlatBackend 类的单元测试"""
+
+    @pytest.fixture
+    def backend(self, tmp_path):
+        backend = LocalFlatBackend(tmp_path / "index")
+        backend.create_collection("docs", vector_dim=4)
+        return backend
+
+    @pytest.fixture
+    def rows(self):
+        return [
+            {"vector": [1.0, 0.0, 0.0, 0.0], "page_index": 1, "image_url": "p1.jpeg"},
+            {"vector": [0.0, 1.0, 0.0, 0.0], "page_index": 2, "image_url": "p2.jpeg"},
+            {"vector": [0.7, 0.7, 0.0, 0.0], "page_index": 3, "image_url": "p3.jpeg", "doc": "extra"},
+        ]
+
+    def test_create_and_list(self, backend):
+        """测试建表后可以查到集合"""
+        assert backend.has_collection("docs")
+        assert backend.list_collections() == ["docs"]
+        assert not backend.has_collection("other")
+
+    def test_search_returns_cosine_top_k(self, backend, rows):
+        """测试检索按余弦相似度降序返回 top-k"""
+        backend.insert("docs", rows)
+
+        hits = backend.search("docs", [[2.0, 0.1, 0.0, 0.0]], limit=2, output_fields=["page_index", "image_url"])[0]
+
+        assert [hit["entity"]["page_index"] for hit in hits] == [1, 3]
+        assert hits[0]["distance"] >= hits[1]["distance"]
+        assert hits[0]["entity"] == {"page_index": 1, "image_url": "p1.jpeg"}
+
+    def test_search_vector_only_when_requested(self, backend, rows):
+        """测试只有在投影中包含 vector 时才返回向量"""
+        backend.insert("docs", rows)
+
+        hit = backend.search("docs", [[1.0, 0.0, 0.0, 0.0]], limit=1, output_fields=["vector"])[0][0]
+
+        assert np.allclose(hit["entity"]["vector"], [1.0, 0.0, 0.0, 0.0])
+
+    def test_query_by_field(self, backend, rows):
+        """测试按字段精确过滤与全量读取"""
+        backend.insert("docs", rows)
+
+        res = backend.query("docs", field="image_url", values=["p3.jpeg", "p2.jpeg"], output_fields=["page_index"])
+        assert sorted(row["page_index"] for row in res) == [2, 3]
+
+        assert len(backend.query("docs", output_fields=["page_index"])) == 3
+        assert len(backend.query("docs", output_fields=["page_index"], limit=1)) == 1
+
+    def test_dynamic_fields(self, backend, rows):
+        """测试行中的额外字段被保存，缺失的行补 None"""
+        backend.insert("docs", rows)
+
+        res = backend.query("docs", output_fields=["doc"])
+
+        assert [row["doc"] for row in res] == [None, None, "extra"]
+
+    def test_persist_and_grow(self, tmp_path):
+        """测试超出初始容量后扩容，并在重新打开后数据仍然可用"""
+        backend = LocalFlatBackend(tmp_path / "index")
+        backend.create_collection("big", vector_dim=8)
+        vectors = np.random.default_rng(0).normal(size=(3000, 8))
+        backend.insert("big", [{"vector": v.tolist(), "page_index": i} for i, v in enumerate(vectors)])
+
+        reopened = LocalFlatBackend(tmp_path / "index")
+        hit = reopened.search("big", [vectors[2024].tolist()], limit=1, output_fields=["page_index"])[0][0]
+
+        assert hit["entity"]["page_index"] == 2024
+        assert hit["distance"] == pytest.approx(1.0, abs=1e-5)
+
+    def test_delete_compacts_rows(self, backend, rows):
+        """测试按字段删除后剩余行的向量与元数据仍然对应"""
+        backend.insert("docs", rows)
+
+        deleted = backend.delete("docs", field="page_index", values=[1, 99])
+
+        hits = backend.search("docs", [[0.0, 1.0, 0.0, 0.0]], limit=5, output_fields=["page_index"])[0]
+        assert deleted == 1
+        assert [hit["entity"]["page_index"] for hit in hits] == [2, 3]
+        assert hits[0]["distance"] == pytest.approx(1.0, abs=1e-5)
+
+    def test_wrong_dim_raises(self, backend):
+        """测试写入维度不一致的向量时抛出 ValueError"""
+        with pytest.raises(ValueError):
+            backend.insert("docs", [{"vector": [1.0, 2.0], "page_index": 1}])
+
+    def test_drop_collection(self, backend, rows):
+        """测试删除集合"""
+        backend.insert("docs", rows)
+        backend.drop_collection("docs")
+
+        assert not backend.has_collection("docs")
+
+    def test_create_backend_local(self, tmp_path):
+        """测试按配置创建本地后端"""
+        backend = create_backend("local", local_path=str(tmp_path / "index"))
+
+        assert isinstance(backend, LocalFlatBackend)
+
+    @pytest.mark.parametrize("quantization", ["int8", "binary"])
+    def test_quantized_search_rescores_exactly(self, tmp_path, quantization):
+        """测试量化集合在扩容与重新打开后，重打分结果与全精度检索一致"""
+        vectors = np.random.default_rng(0).normal(size=(3000, 64))
+        rows = [{"vector": v.tolist(), "page_index": i} for i, v in enumerate(vectors)]
+        exact = LocalFlatBackend(tmp_path / "exact")
+        exact.create_collection("docs", vector_dim=64)
+        exact.insert("docs", rows)
+        quantized = LocalFlatBackend(tmp_path / "quantized", quantization=quantization, rescore_factor=50)
+        quantized.create_collection("docs", vector_dim=64)
+        quantized.insert("docs", rows)
+
+        reopened = LocalFlatBackend(tmp_path / "quantized")
+        query = [(vectors[7] + vectors[8]).tolist()]
+        expected = exact.search("docs", query, limit=2, output_fields=["page_index"])[0]
+        hits = reopened.search("docs", query, limit=2, output_fields=["page_index"])[0]
+
+        assert reopened._collection("docs").quantization == quantization
+        assert [hit["entity"]["page_index"] for hit in hits] == [hit["entity"]["page_index"] for hit in expected]
+        assert [hit["distance"] for hit in hits] == pytest.approx([hit["distance"] for hit in expected])
+
+    def test_invalid_quantization(self, tmp_path):
+        """测试非法量化方式"""
+        with pytest.raises(ValueError):
+            LocalFlatBackend(tmp_path / "index", quantization="fp4")
+
+    def test_matryoshka_two_stage(self, tmp_path):
+        """测试 Matryoshka 短向量第一轮检索后用全量向量重排，且设置记录在集合中"""
+        vectors = np.random.default_rng(0).normal(size=(2000, 64))
+        rows = [{"vector": v.tolist(), "page_index": i} for i, v in enumerate(vectors)]
+        backend = LocalFlatBackend(tmp_path / "index", prefix_dims=16, rescore_factor=100)
+        backend.create_collection("docs", vector_dim=64)
+        backend.insert("docs", rows)
+
+        reopened = LocalFlatBackend(tmp_path / "index", prefix_dims=0)
+        hits = reopened.search("docs", [vectors[42].tolist()], limit=3, output_fields=["page_index"])[0]
+
+        assert reopened._collection("docs").prefix_dims == 16
+        assert (tmp_path / "index" / "docs" / "prefix.npy").exists()
+        assert hits[0]["entity"]["page_index"] == 42
+        assert hits[0]["distance"] == pytest.approx(1.0, abs=1e-5)
+
+    def test_matryoshka_dims_must_be_smaller(self, tmp_path):
+        """测试截断维度不小于向量维度时拒绝建表"""
+        backend = LocalFlatBackend(tmp_path / "index", prefix_dims=8)
+
+        with pytest.raises(ValueError):
+            backend.create_collection("docs", vector_dim=8)
+
+
+class TestPageIndexLookup:
+    """VectorDatabase 在本地后端上按 image_url 反查页码的单元测试"""
+
+    @pytest.fixture(params=[True, False], ids=["page_map", "query"])
+    def db(self, request, tmp_path, database_module):
+        async def fake_embedding(text=None, image=None):
+            return [1.0, 0.0, 0.0, 0.0]
+
+        db = database_module.VectorDatabase(
+            embedding_func=fake_embedding,
+            vector_dim=4,
+            collection_name="docs",
+            backend=LocalFlatBackend(tmp_path / "index", quantization="none", prefix_dims=0),
+            use_page_map=request.param,
+        )
+        db.create_collection("docs")
+        db.insert_vectors("docs", [
+            {"vector": [1.0, 0.0, 0.0, float(i)], "page_index": i, "image_url": f"p{i}.jpeg", "doc_id": "doc"}
+            for i in range(1, 6)
+        ])
+        return db
+
+    def test_batch_keeps_input_order(self, db):
+        """测试批量查询结果与输入顺序一致，重复的 image_url 各自返回页码"""
+        urls = ["p4.jpeg", "p1.jpeg", "p5.jpeg", "p1.jpeg"]
+
+        assert db.get_page_indexes_by_image_urls("docs", urls) == [4, 1, 5, 1]
+        assert db.get_page_indexes_by_image_urls("docs", []) == []
+
+    def test_missing_url_returns_none(self, db):
+        """测试没找到的 image_url 对应位置为 None，不影响其他位置"""
+        assert db.get_page_indexes_by_image_urls("docs", ["p2.jpeg", "missing.jpeg", "p3.jpeg"]) == [2, None, 3]
+        assert db.get_page_index_by_image_url("docs", "missing.jpeg") is None
+
+    def test_async_lookup(self, db):
+        """测试非阻塞版本与同步版本结果一致"""
+        urls = ["p3.jpeg", "missing.jpeg", "p2.jpeg"]
+
+        assert asyncio.run(db.aget_page_indexes_by_image_urls("docs", urls)) == [3, None, 2]
+
+    def test_insert_invalidates_page_map(self, db):
+        """测试写入新页面后映射失效，重新加载后可以查到"""
+        assert db.get_page_index_by_image_url("docs", "p6.jpeg") is None
+
+        db.insert_vectors("docs", [{"vector": [0.0, 1.0, 0.0, 0.0], "page_index": 6, "image_url": "p6.jpeg", "doc_id": "doc"}])
+
+        assert db.get_page_index_by_image_url("docs", "p6.jpeg") == 6
+
+    def test_external_insert_found_on_miss(self, db):
+        """测试绕过本实例写入（模拟另一个入库进程）的页面在缓存未命中时回查到，已缓存的条目不受影响"""
+        assert db.get_page_indexes_by_image_urls("docs", ["p1.jpeg", "p7.jpeg"]) == [1, None]
+
+        db.backend.insert("docs", [
+            {"vector": [0.0, 1.0, 0.0, 0.0], "page_index": 7, "image_url": "p7.jpeg", "doc_id": "doc"},
+            {"vector": [0.0, 1.0, 0.0, 0.0], "page_index": 2, "image_url": "p1.jpeg", "doc_id": "other"},
+        ])
+
+        assert db.get_page_indexes_by_image_urls("docs", ["p1.jpeg", "p7.jpeg"], ["doc", "doc"]) == [1, 7]
+        assert db.get_page_index_by_image_url("docs", "p1.jpeg", doc_id="other") == 2
+
+
+class TestVectorDatabaseQuery:
+    """VectorDatabase.query 在本地后端上的单元测试"""
+
+    @pytest.fixture
+    def db(self, tmp_path, database_module):
+        async def fake_embedding(text=None, image=None):
+            return [1.0, 0.0, 0.0, 0.0]
+
+        collection = database_module.COLLECTION_NAME
+        db = database_module.VectorDatabase(
+            embedding_func=fake_embedding,
+            vector_dim=4,
+            collection_name=collection,
+            backend=LocalFlatBackend(tmp_path / "index", quantization="none", prefix_dims=0),
+        )
+        db.create_collection(collection)
+        db.insert_vectors(collection, [
+            {"vector": [1.0, 0.0, 0.0, 0.0], "page_index": 1, "image_url": "p1.jpeg", "doc_id": "doc"},
+            {"vector": [0.0, 1.0, 0.0, 0.0], "page_index": 2, "image_url": "p2.jpeg", "doc_id": "doc"},
+        ])
+        return db
+
+    def test_vector_only_with_vector(self, db):
+        """测试默认只返回业务字段，with_vector=True 时才带回向量"""
+        lean = asyncio.run(db.query("q", top_k=2))
+        full = asyncio.run(db.query("q", top_k=2, with_vector=True))
+
+        assert [(hit.page_index, hit.image_url) for hit in lean] == [(1, "p1.jpeg"), (2, "p2.jpeg")]
+        assert all(hit.vector is None and hit.extra is None for hit in lean)
+        assert np.allclose(full[0].vector, [1.0, 0.0, 0.0, 0.0])
+        assert lean[0].score == pytest.approx(full[0].score)
+
+    def test_extra_output_fields(self, db):
+        """测试额外请求的标量字段放在 extra 中"""
+        hit = asyncio.run(db.query("q", top_k=1, output_fields=["page_index", "doc_id"]))[0]
+
+        assert (hit.page_index, hit.image_url, hit.extra) == (1, None, {"doc_id": "doc"})
@@ -0,0 +1,145 @@
+"""
+MilvusBackend 单元测试
+用 MagicMock 替换 MilvusClient，测试从集合结构读取检索配置、索引配置的传递与两阶段检索的客户端重打分，
+以及 VectorDatabase 的异步路径在专用线程池而不是事件循环线程上调用 Milvus
+"""
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.code.data_base import backends
+from src.code.data_base.backends import MilvusBackend
+
+
+def describe(short_dim: int = None):
+    fields = [{"name": "id", "params": {}}, {"name": "vector", "params": {"dim": 8}}]
+    if short_dim:
+        fields.append({"name": "vector_short", "params": {"dim": short_dim}})
+    return {"fields": fields}
+
+
+class TestMilvusBackend:
+    """MilvusBackend 的单元测试"""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        client = MagicMock()
+        monkeypatch.setattr(backends, "MilvusClient", MagicMock(return_value=client))
+        return client
+
+    def test_load_collection_reads_layout(self, client):
+        """测试 load_collection 以集合的 vector_short 维度与量化索引为准，覆盖不一致的配置"""
+        client.describe_collection.return_value = describe(short_dim=4)
+        client.describe_index.return_value = {"index_type": "IVF_SQ8"}
+        backend = MilvusBackend("http://milvus", "default", quantization="none", prefix_dims=0, index_type="HNSW")
+
+        backend.load_collection("docs")
+
+        assert (backend.prefix_dims, backend.quantization, backend.two_stage) == (4, "int8", True)
+        client.describe_index.assert_called_once_with("docs", index_name="vector_short_index")
+        assert backend.search_params["nprobe"] == 32
+
+    def test_load_collection_disables_missing_prefix(self, client):
+        """测试配置了截断维度但集合没有 vector_short 字段时按单阶段检索"""
+        client.describe_collection.return_value = describe()
+        client.describe_index.return_value = {"index_type": "HNSW"}
+        backend = MilvusBackend("http://milvus", "default", quantization="none", prefix_dims=4, index_type="HNSW")
+
+        backend.load_collection("docs")
+
+        assert (backend.prefix_dims, backend.first_pass_field, backend.two_stage) == (0, "vector", False)
+
+    def test_two_stage_search_rescores_candidates(self, client):
+        """测试两阶段检索在截断向量上取候选，用全量向量重打分，未请求时不返回向量"""
+        vectors = [[1, 0, 0, 0], [0.6, 0.8, 0, 0], [0.8, 0, 0.6, 0]]
+        client.search.return_value = [[
+            {"id": i, "distance": 0.0, "entity": {"page_index": i, "vector": vector}} for i, vector in enumerate(vectors)
+        ]]
+        backend = MilvusBackend("http://milvus", "default", quantization="none", prefix_dims=2, rescore_factor=3)
+
+        results = backend.search("docs", [[0.8, 0, 0.6, 0]], limit=2, output_fields=["page_index"])
+
+        kwargs = client.search.call_args.kwargs
+        assert (kwargs["anns_field"], kwargs["limit"]) == ("vector_short", 6)
+        assert kwargs["data"] == [[1.0, 0.0]]
+        assert "vector" in kwargs["output_fields"]
+        assert [hit["id"] for hit in results[0]] == [2, 0]
+        assert results[0][0]["distance"] == pytest.approx(1.0)
+        assert all("vector" not in hit["entity"] for hit in results[0])
+
+    def test_candidate_limit_is_clamped(self, client):
+        """测试第一轮候选数不超过 Milvus 的 topK 上限"""
+        client.search.return_value = [[]]
+        backend = MilvusBackend("http://milvus", "default", quantization="int8", prefix_dims=0, rescore_factor=100)
+
+        assert backend.search("docs", [[1, 0, 0, 0]], limit=1000, output_fields=["page_index"]) == [[]]
+        assert client.search.call_args.kwargs["limit"] == backends.MILVUS_MAX_TOP_K
+
+    def test_index_settings_reach_create_index_and_search(self, client, monkeypatch):
+        """测试 .env 中的索引类型、构建参数与检索参数原样传给 create_index 与 search"""
+        monkeypatch.setenv("VECTOR_DATABASE_BACKEND", "milvus")
+        monkeypatch.setenv("VECTOR_INDEX_TYPE", "hnsw")
+        monkeypatch.setenv("VECTOR_INDEX_PARAMS", '{"M": 32, "efConstruction": 200}')
+        monkeypatch.setenv("VECTOR_SEARCH_PARAMS", '{"ef": 128}')
+        client.search.return_value = [[]]
+        backend = backends.create_backend(quantization="none", prefix_dims=0)
+
+        backend.create_collection("docs", vector_dim=8)
+        backend.search("docs", [[1, 0, 0, 0]], limit=5, output_fields=["page_index"])
+
+        index_params = client.prepare_index_params.return_value
+        index_params.add_index.assert_called_once_with(
+            field_name="vector",
+            metric_type="COSINE",
+            index_type="HNSW",
+            index_name="vector_index",
+            params={"M": 32, "efConstruction": 200},
+        )
+        assert client.create_index.call_args.kwargs["index_params"] is index_params
+        assert client.search.call_args.kwargs["search_params"] == {"params": {"ef": 128}}
+
+
+class TestVectorDatabaseExecutor:
+    """VectorDatabase 异步路径中 Milvus 同步调用所在线程的单元测试"""
+
+    def test_milvus_calls_run_on_executor(self, monkeypatch, database_module):
+        """测试 query / ainsert_vectors / aget_page_indexes_by_image_urls 中的 Milvus 调用都在 milvus 线程池中执行"""
+        threads = {}
+
+        def record(name, result):
+            def call(*args, **kwargs):
+                threads[name] = threading.current_thread()
+                return result
+            return call
+
+        client = MagicMock()
+        client.search.side_effect = record("search", [[]])
+        client.insert.side_effect = record("insert", {"insert_count": 1})
+        client.query_iterator.return_value.next.side_effect = record("query", [])
+        monkeypatch.setattr(backends, "MilvusClient", MagicMock(return_value=client))
+
+        async def fake_embedding(text=None, image=None):
+            return [1.0, 0.0, 0.0, 0.0]
+
+        db = database_module.VectorDatabase(
+            embedding_func=fake_embedding,
+            vector_dim=4,
+            backend=MilvusBackend("http://milvus", "default", quantization="none", prefix_dims=0),
+            use_page_map=False,
+        )
+
+        async def run():
+            await db.query("q", top_k=1)
+            await db.ainsert_vectors("docs", [{"vector": [1.0, 0.0, 0.0, 0.0], "page_index": 1, "image_url": "p1.jpeg"}])
+            await db.aget_page_indexes_by_image_urls("docs", ["p1.jpeg"])
+            return threading.current_thread()
+
+        try:
+            loop_thread = asyncio.run(run())
+        finally:
+            db._executor.shutdown(wait=True)
+
+        assert sorted(threads) == ["insert", "query", "search"]
+        assert all(thread is not loop_thread and thread.name.startswith("milvus") for thread in threads.values())
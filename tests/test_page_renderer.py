@@ -0,0 +1,238 @@
+"""
+PageRenderer 单元测试
+使用 demo_data/test.pdf 测试 page_renderer.py 的渲染、文档句柄缓存、page_cache.py 的已渲染页面缓存与 image_store.py 的页面图片库
+"""
+import os
+import shutil
+from pathlib import Path
+
+import fitz
+import pytest
+from unittest.mock import patch
+from PIL import Image
+
+from src.code.rendering.page_renderer import PageRenderer
+from src.code.rendering.page_cache import RenderedPageCache
+from src.code.rendering.image_store import PageImageStore
+
+DEMO_PDF = Path(__file__).resolve().parent.parent / "demo_data" / "test.pdf"
+
+
+class TestPageRenderer:
+    """PageRenderer 类的单元测试"""
+
+    @pytest.fixture
+    def renderer(self):
+        renderer = PageRenderer(dpi=50, colorspace="rgb", jpeg_quality=75)
+        yield renderer
+        renderer.close()
+
+    def test_page_count(self, renderer):
+        """测试获取页数"""
+        assert renderer.page_count(str(DEMO_PDF)) == 66
+
+    def test_render_jpeg_returns_jpeg_bytes(self, renderer):
+        """测试直接输出 JPEG 字节"""
+        data = renderer.render_jpeg(str(DEMO_PDF), 1)
+
+        assert data[:2] == b"\xff\xd8"
+
+    def test_dpi_controls_size(self, renderer):
+        """测试 DPI 控制输出尺寸"""
+        small = renderer.render_image(str(DEMO_PDF), 1, dpi=36)
+        large = renderer.render_image(str(DEMO_PDF), 1, dpi=72)
+
+        assert large.width == pytest.approx(small.width * 2, abs=2)
+        assert large.mode == "RGB"
+
+    def test_gray_colorspace(self, renderer):
+        """测试灰度渲染"""
+        img = renderer.render_image(str(DEMO_PDF), 1, colorspace="gray")
+
+        assert img.mode == "L"
+
+    def test_render_images_are_jpeg(self, renderer):
+        """测试 render_images 返回 JPEG 格式的 PIL 图片"""
+        images = renderer.render_images(str(DEMO_PDF), first_page=2, last_page=3)
+
+        assert len(images) == 2
+        assert all(isinstance(img, Image.Image) and img.format == "JPEG" for img in images)
+
+    def test_iter_jpeg(self, renderer):
+        """测试逐页产出页码与 JPEG 字节"""
+        pages = list(renderer.iter_jpeg(str(DEMO_PDF), first_page=64))
+
+        assert [page for page, _ in pages] == [64, 65, 66]
+
+    def test_page_out_of_range(self, renderer):
+        """测试页码越界时抛出 ValueError"""
+        with pytest.raises(ValueError):
+            renderer.render_jpeg(str(DEMO_PDF), 67)
+
+    def test_missing_file(self, renderer, tmp_path):
+        """测试文件不存在时抛出 FileNotFoundError"""
+        with pytest.raises(FileNotFoundError):
+            renderer.page_count(str(tmp_path / "missing.pdf"))
+
+    def test_document_handle_cached_and_refreshed(self, renderer, tmp_path):
+        """测试文档句柄被缓存，文件修改后重新打开"""
+        pdf_path = tmp_path / "copy.pdf"
+        shutil.copy(DEMO_PDF, pdf_path)
+
+        first = renderer._open(str(pdf_path))
+        assert renderer._open(str(pdf_path)) is first
+
+        mtime = pdf_path.stat().st_mtime + 10
+        os.utime(pdf_path, (mtime, mtime))
+        second = renderer._open(str(pdf_path))
+
+        assert second is not first
+        assert len(renderer._documents) == 1
+
+    def test_page_hash(self, renderer, tmp_path):
+        """测试页面内容哈希稳定、不同页不同，且与文件重新保存无关"""
+        hashes = renderer.page_hashes(str(DEMO_PDF))
+        resaved = tmp_path / "resaved.pdf"
+        fitz.open(str(DEMO_PDF)).save(str(resaved), garbage=4, deflate=True)
+
+        assert len(hashes) == 66
+        assert len(set(hashes)) == 66
+        assert renderer.page_hash(str(resaved), 5) == hashes[4]
+        assert [renderer.page_hash(str(DEMO_PDF), page) for page in (1, 2, 66)] == [hashes[0], hashes[1], hashes[65]]
+
+    def test_page_hash_covers_annotations(self, renderer, tmp_path):
+        """测试添加注释、表单域后页面哈希随渲染结果变化，未改动的页面哈希不变"""
+        original = tmp_path / "original.pdf"
+        doc = fitz.open(str(DEMO_PDF))
+        doc.select([0, 1, 2])
+        doc.save(str(original))
+        doc[0].add_freetext_annot(fitz.Rect(72, 72, 300, 120), "reviewed")
+        widget = fitz.Widget()
+        widget.field_name = "comment"
+        widget.field_type = fitz.PDF_WIDGET_TYPE_TEXT
+        widget.rect = fitz.Rect(72, 200, 300, 230)
+        widget.field_value = "ok"
+        doc[1].add_widget(widget)
+        annotated = tmp_path / "annotated.pdf"
+        doc.save(str(annotated))
+        doc.close()
+
+        before, after = renderer.page_hashes(str(original)), renderer.page_hashes(str(annotated))
+
+        assert after[0] != before[0]
+        assert renderer.render_jpeg(str(annotated), 1) != renderer.render_jpeg(str(original), 1)
+        assert after[1] != before[1]
+        assert after[2] == before[2]
+
+    def test_invalid_colorspace(self):
+        """测试非法 colorspace"""
+        with pytest.raises(ValueError):
+            PageRenderer(colorspace="cmyk")
+
+
+class TestRenderedPageCache:
+    """RenderedPageCache 及其与 PageRenderer 集成的单元测试"""
+
+    def test_repeat_render_hits_cache(self):
+        """测试重复读取同一页时跳过渲染"""
+        cache = RenderedPageCache(max_bytes=64 * 1024 * 1024)
+        renderer = PageRenderer(dpi=50, cache=cache)
+
+        first = renderer.render_jpeg(str(DEMO_PDF), 3)
+        with patch.object(renderer, "render_pixmap") as mock_render:
+            second = renderer.render_jpeg(str(DEMO_PDF), 3)
+
+        mock_render.assert_not_called()
+        assert first == second
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_dpi_is_part_of_key(self):
+        """测试不同 DPI 不会互相命中"""
+        cache = RenderedPageCache()
+        renderer = PageRenderer(dpi=50, cache=cache)
+
+        renderer.render_jpeg(str(DEMO_PDF), 3)
+        renderer.render_jpeg(str(DEMO_PDF), 3, dpi=36)
+
+        assert cache.misses == 2
+        assert len(cache) == 2
+
+    def test_memory_bound(self):
+        """测试内存占用超过上限时淘汰最久未使用的页面"""
+        cache = RenderedPageCache(max_bytes=10)
+        cache.put(("a", 0.0, 1, 50, "rgb", 75), b"12345")
+        cache.put(("a", 0.0, 2, 50, "rgb", 75), b"12345")
+        cache.put(("a", 0.0, 3, 50, "rgb", 75), b"12345")
+
+        assert cache.get(("a", 0.0, 1, 50, "rgb", 75)) is None
+        assert cache.size_bytes <= 10
+
+    def test_disk_backing(self, tmp_path):
+        """测试内存淘汰后可从磁盘读回"""
+        key = ("a", 0.0, 1, 50, "rgb", 75)
+        RenderedPageCache(disk_dir=tmp_path).put(key, b"jpeg-bytes")
+
+        fresh = RenderedPageCache(disk_dir=tmp_path)
+
+        assert fresh.get(key) == b"jpeg-bytes"
+
+
+class TestPageImageStore:
+    """PageImageStore 页面图片库的单元测试"""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        return PageImageStore(tmp_path / "images", {"embed": 30, "rerank": 30, "vlm": 60})
+
+    def test_put_page_writes_renditions(self, store):
+        """测试写入各分辨率，DPI 相同的阶段共用一个文件，返回 embed 分辨率的 JPEG 字节"""
+        renderer = PageRenderer()
+        content_hash = renderer.page_hash(str(DEMO_PDF), 1)
+
+        data = store.put_page(str(DEMO_PDF), 1, content_hash, renderer=renderer)
+
+        assert data == store.path(content_hash, "embed").read_bytes()
+        assert store.path(content_hash, "embed") == store.path(content_hash, "rerank")
+        low = Image.open(store.path(content_hash, "rerank"))
+        high = Image.open(store.path(content_hash, "vlm"))
+        assert high.width == pytest.approx(low.width * 2, abs=2)
+        renderer.close()
+
+    def test_annotated_page_gets_own_rendition(self, store, tmp_path):
+        """测试只加了注释的页面存为新的图片，不复用注释前的渲染结果"""
+        renderer = PageRenderer()
+        doc = fitz.open(str(DEMO_PDF))
+        doc.select([0])
+        doc[0].add_freetext_annot(fitz.Rect(72, 72, 300, 120), "reviewed")
+        annotated = tmp_path / "annotated.pdf"
+        doc.save(str(annotated))
+        doc.close()
+        original_hash = renderer.page_hash(str(DEMO_PDF), 1)
+        annotated_hash = renderer.page_hash(str(annotated), 1)
+
+        original = store.put_page(str(DEMO_PDF), 1, original_hash, renderer=renderer)
+        updated = store.put_page(str(annotated), 1, annotated_hash, renderer=renderer)
+
+        assert store.url(annotated_hash) != store.url(original_hash)
+        assert updated != original
+        assert store.path(original_hash, "vlm").read_bytes() != store.path(annotated_hash, "vlm").read_bytes()
+        renderer.close()
+
+    def test_existing_page_skips_rendering(self, store):
+        """测试内容相同的页面再次写入时不重新渲染"""
+        renderer = PageRenderer()
+        content_hash = renderer.page_hash(str(DEMO_PDF), 1)
+        first = store.put_page(str(DEMO_PDF), 1, content_hash, renderer=renderer)
+
+        with patch.object(renderer, "render_jpeg") as mock_render:
+            assert store.put_page(str(DEMO_PDF), 1, content_hash, renderer=renderer) == first
+        mock_render.assert_not_called()
+        renderer.close()
+
+    def test_rendition_of(self, store):
+        """测试 image_url 换成 VLM 分辨率，图片库之外的旧路径原样返回"""
+        content_hash = PageRenderer().page_hash(str(DEMO_PDF), 2)
+        store.put_page(str(DEMO_PDF), 2, content_hash)
+
+        assert store.rendition_of(store.url(content_hash), "vlm") == str(store.path(content_hash, "vlm"))
+        assert store.rendition_of("/data/images/test_2.jpeg", "vlm") == "/data/images/test_2.jpeg"
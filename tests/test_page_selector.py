@@ -0,0 +1,44 @@
+"""
+自适应选页单元测试
+测试 page_selector.py 的最少 / 最多页数、绝对阈值、相对落差截止与节省统计
+"""
+import pytest
+
+from src.code.rerank.page_selector import PageSelector
+
+
+def results(*scores):
+    return [{"index": i, "relevance_score": score} for i, score in enumerate(scores)]
+
+
+class TestPageSelector:
+    """PageSelector 的单元测试"""
+
+    def test_dominant_page_is_sent_alone(self):
+        """测试某一页明显胜出时只送这一页，并统计节省的图片数"""
+        selector = PageSelector(min_pages=1, max_pages=5, min_score=0, drop_ratio=0.5)
+
+        selected = selector.select(results(0.2, 0.9, 0.3, 0.1, 0.25))
+
+        assert [item["index"] for item in selected] == [1]
+        assert (selector.selected_images, selector.saved_images) == (1, 4)
+
+    def test_close_scores_keep_up_to_max_pages(self):
+        """测试分数接近时最多保留 max_pages 张，按分数从高到低排列"""
+        selector = PageSelector(min_pages=1, max_pages=3, min_score=0, drop_ratio=0.5)
+
+        selected = selector.select(results(0.8, 0.85, 0.7, 0.75))
+
+        assert [item["index"] for item in selected] == [1, 0, 3]
+
+    def test_absolute_threshold_and_min_pages(self):
+        """测试低于绝对阈值的页面被截止，但前 min_pages 张总是保留"""
+        selector = PageSelector(min_pages=2, max_pages=5, min_score=0.5, drop_ratio=0)
+
+        assert [item["index"] for item in selector.select(results(0.3, 0.2, 0.1))] == [0, 1]
+        assert [item["index"] for item in selector.select(results(0.9, 0.6, 0.55, 0.4))] == [0, 1, 2]
+
+    def test_invalid_bounds(self):
+        """测试 min_pages 大于 max_pages 时报错"""
+        with pytest.raises(ValueError):
+            PageSelector(min_pages=3, max_pages=2)
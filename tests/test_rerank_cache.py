@@ -0,0 +1,72 @@
+"""
+重排结果缓存单元测试
+测试 rerank_cache.py 的 key 规范化、LRU 淘汰、TTL 过期，以及 Reranker 命中缓存时不再请求服务
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from src.code.rerank.rerank_cache import RerankCache
+from src.code.rerank.reranker import Reranker
+
+URLS = ["/images/a.jpeg", "/images/b.jpeg", "/images/c.jpeg"]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestRerankCache:
+    """RerankCache 与 Reranker 缓存的单元测试"""
+
+    def test_key_normalizes_query_but_keeps_candidate_order(self):
+        """测试查询的大小写、全角与空白差异视为同一 key，候选顺序或 top_n 不同则为不同 key"""
+        key = RerankCache.make_key("m0", "  采购需求 ABC？ ", URLS, 5, True)
+
+        assert key == RerankCache.make_key("m0", "采购需求   abc?", URLS, 5, True)
+        assert key != RerankCache.make_key("m0", "采购需求 abc?", URLS[::-1], 5, True)
+        assert key != RerankCache.make_key("m0", "采购需求 abc?", URLS, 3, True)
+
+    def test_lru_eviction_and_counters(self):
+        """测试超出条目上限时淘汰最久未使用的条目，并统计命中 / 未命中"""
+        cache = RerankCache(max_entries=2, ttl_seconds=0)
+        keys = [RerankCache.make_key("m0", q, URLS, 5, True) for q in ("a", "b", "c")]
+        cache.put(keys[0], {"results": [0]})
+        cache.put(keys[1], {"results": [1]})
+        cache.get(keys[0])
+        cache.put(keys[2], {"results": [2]})
+
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) == {"results": [0]}
+        assert (cache.hits, cache.misses) == (2, 1)
+
+    def test_ttl_expiry(self):
+        """测试条目超过有效期后失效"""
+        clock = FakeClock()
+        cache = RerankCache(max_entries=10, ttl_seconds=60, clock=clock)
+        key = RerankCache.make_key("m0", "q", URLS, 5, True)
+        cache.put(key, {"results": []})
+
+        clock.now = 59
+        assert cache.get(key) is not None
+        clock.now = 61
+        assert cache.get(key) is None
+        assert len(cache) == 0
+
+    def test_reranker_skips_request_on_hit(self):
+        """测试重复的问题直接返回缓存结果，返回值被修改也不影响缓存"""
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"results": [{"index": 2, "relevance_score": 0.9}]}
+        transport = MagicMock(post=AsyncMock(return_value=response))
+        reranker = Reranker(top_k=2, transport=transport, cache=RerankCache())
+
+        first = asyncio.run(reranker.rerank("采购需求", img_urls=URLS))
+        first["results"].clear()
+        second = asyncio.run(reranker.rerank(" 采购需求 ", img_urls=URLS))
+
+        assert transport.post.await_count == 1
+        assert second == {"results": [{"index": 2, "relevance_score": 0.9}]}
+        assert (reranker.cache.hits, reranker.cache.misses) == (1, 1)
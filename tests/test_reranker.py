@@ -0,0 +1,64 @@
+"""
+Reranker 分片重排单元测试
+使用假的传输层按文档名打分，测试分片、多地址分发与全局 top_n 合并
+"""
+import asyncio
+from unittest.mock import MagicMock
+
+from src.code.rerank.reranker import Reranker
+
+SCORES = {f"/images/{i}.jpeg": score for i, score in enumerate([0.1, 0.9, 0.5, 0.9, 0.2, 0.7, 0.9])}
+
+
+class FakeTransport:
+    """逐对打分的假重排服务，记录每次请求的地址与文档数"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def post(self, url, *, headers=None, json=None, timeout=None):
+        self.calls.append((url, len(json["documents"])))
+        ranked = sorted(enumerate(json["documents"]), key=lambda item: -SCORES[item[1]])[: json["top_n"]]
+        response = MagicMock(status_code=200)
+        response.json.return_value = {
+            "model": json["model"],
+            "usage": {"total_tokens": 10 * len(json["documents"])},
+            "results": [
+                {"index": i, "relevance_score": SCORES[doc], "document": {"text": doc}}
+                for i, doc in ranked
+            ],
+        }
+        return response
+
+
+class TestShardedRerank:
+    """Reranker 分片并发重排的单元测试"""
+
+    def test_sharded_merge_matches_global_ranking(self):
+        """测试分片合并后得到全局 top_n，同分按原始顺序排列，多个地址轮询分发"""
+        transport = FakeTransport()
+        reranker = Reranker(
+            top_k=4,
+            transport=transport,
+            shard_size=3,
+            endpoints=["http://a/rerank", "http://b/rerank"],
+        )
+        reranker.cache = None
+
+        result = asyncio.run(reranker.rerank("q", img_urls=list(SCORES)))
+
+        assert [item["index"] for item in result["results"]] == [1, 3, 6, 5]
+        assert all(item["document"]["text"] == f"/images/{item['index']}.jpeg" for item in result["results"])
+        assert sorted(transport.calls) == [("http://a/rerank", 1), ("http://a/rerank", 3), ("http://b/rerank", 3)]
+        assert result["usage"] == {"total_tokens": 70}
+
+    def test_small_candidate_set_is_not_sharded(self):
+        """测试候选数不超过分片大小时只发一次请求"""
+        transport = FakeTransport()
+        reranker = Reranker(top_k=2, transport=transport, shard_size=16, endpoints=["http://a/rerank"])
+        reranker.cache = None
+
+        result = asyncio.run(reranker.rerank("q", img_urls=list(SCORES)))
+
+        assert transport.calls == [("http://a/rerank", 7)]
+        assert [item["index"] for item in result["results"]] == [1, 3]
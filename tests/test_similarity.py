@@ -0,0 +1,76 @@
+"""
+similarity 模块单元测试
+以暴力全排序的结果为基准，验证 top_k / top_k_chunked 的正确性
+"""
+import numpy as np
+import pytest
+
+from src.code.embedding import similarity
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(0)
+    return similarity.normalize(rng.standard_normal((1000, 32)))
+
+
+@pytest.fixture
+def queries():
+    rng = np.random.default_rng(1)
+    return similarity.normalize(rng.standard_normal((5, 32)))
+
+
+class TestSimilarity:
+    """similarity 模块的单元测试"""
+
+    def test_normalize(self):
+        """测试按行归一化且零向量保持为零"""
+        matrix = similarity.normalize([[3.0, 4.0], [0.0, 0.0]])
+
+        assert matrix.dtype == np.float32
+        assert np.allclose(matrix, [[0.6, 0.8], [0.0, 0.0]])
+
+    def test_cosine_similarity(self):
+        """测试单对向量的余弦相似度"""
+        assert similarity.cosine_similarity([1, 0], [2, 0]) == pytest.approx(1.0)
+        assert similarity.cosine_similarity([1, 0], [0, 0]) == 0.0
+
+    def test_top_k_matches_full_sort(self, corpus, queries):
+        """测试 argpartition top-k 与全排序结果一致"""
+        scores = similarity.score(queries, corpus)
+        indices, values = similarity.top_k(scores, 10)
+
+        expected = np.argsort(-scores, axis=1)[:, :10]
+        assert np.array_equal(indices, expected)
+        assert np.allclose(values, np.take_along_axis(scores, expected, axis=1))
+
+    def test_top_k_single_query_and_small_corpus(self):
+        """测试一维分数与 k 大于语料规模"""
+        indices, values = similarity.top_k(np.array([0.1, 0.9, 0.5], dtype=np.float32), 5)
+
+        assert indices.tolist() == [1, 2, 0]
+        assert values.tolist() == pytest.approx([0.9, 0.5, 0.1])
+
+    def test_top_k_ties_keep_index_order(self):
+        """测试同分时按下标顺序返回"""
+        indices, _ = similarity.top_k(np.array([0.5, 0.7, 0.5, 0.5], dtype=np.float32), 3)
+
+        assert indices.tolist() == [1, 0, 2]
+
+    def test_chunked_matches_in_memory(self, corpus, queries, tmp_path):
+        """测试分块计算（含 memmap 语料）与整体计算一致"""
+        path = tmp_path / "corpus.npy"
+        np.save(path, corpus)
+        mapped = np.load(path, mmap_mode="r")
+
+        expected = similarity.top_k(similarity.score(queries, corpus), 7)
+        chunked = similarity.top_k_chunked(queries, mapped, 7, chunk_size=64)
+
+        assert np.array_equal(chunked[0], expected[0])
+        assert np.allclose(chunked[1], expected[1])
+
+    def test_deduplicate(self):
+        """测试近重复向量只保留第一个"""
+        vectors = similarity.normalize([[1, 0], [0.999, 0.01], [0, 1]])
+
+        assert similarity.deduplicate(vectors, threshold=0.99).tolist() == [0, 2]
@@ -53,7 +53,7 @@ class TestVisualReaderTool:
         with pytest.raises(FileNotFoundError):
             VisualReaderTool(pdf_path="")
 
-    @patch('src.code.Tools.visual_reader_tool.convert_from_path')
+    @patch('src.code.Tools.visual_reader_tool.page_renderer.render_images')
     def test_get_page_image_success(self, mock_convert, tool_instance, mock_images):
         """测试 _get_page_image 成功获取图像"""
         mock_convert.return_value = mock_images
@@ -65,7 +65,7 @@ class TestVisualReaderTool:
             tool_instance.pdf_path, first_page=1, last_page=2
         )
 
-    @patch('src.code.Tools.visual_reader_tool.convert_from_path')
+    @patch('src.code.Tools.visual_reader_tool.page_renderer.render_images')
     def test_get_page_image_no_images(self, mock_convert, tool_instance):
         """测试 _get_page_image 未获取到图像时返回 None"""
         mock_convert.return_value = []
@@ -74,7 +74,7 @@ class TestVisualReaderTool:
         
         assert result is None
 
-    @patch('src.code.Tools.visual_reader_tool.convert_from_path')
+    @patch('src.code.Tools.visual_reader_tool.page_renderer.render_images')
     def test_get_page_image_exception(self, mock_convert, tool_instance):
         """测试 _get_page_image 异常处理"""
         import pdf2image
@@ -84,7 +84,7 @@ class TestVisualReaderTool:
             tool_instance._get_page_image(1, 2)
         assert "PDF processing error" in str(exc_info.value)
 
-    @patch('src.code.Tools.visual_reader_tool.convert_from_path')
+    @patch('src.code.Tools.visual_reader_tool.page_renderer.render_images')
     def test_read_page_no_images_returns_error_message(
         self, mock_convert, tool_instance, mock_images
     ):
@@ -99,7 +99,7 @@ class TestVisualReaderTool:
         expected = "无法获取页面图像，无法回答问题。"
         assert result == expected
 
-    @patch('src.code.Tools.visual_reader_tool.convert_from_path')
+    @patch('src.code.Tools.visual_reader_tool.page_renderer.render_images')
     @patch('src.code.Tools.visual_reader_tool.ChatAgent')
     @patch('src.code.Tools.visual_reader_tool.BaseMessage')
     def test_read_page_success(
@@ -136,7 +136,7 @@ class TestVisualReaderTool:
         call_args = mock_base_message.make_user_message.call_args
         assert "请阅读以下页面内容，并回答我的问题：这一页讲了什么？" in call_args[1]['content']
 
-    @patch('src.code.Tools.visual_reader_tool.convert_from_path')
+    @patch('src.code.Tools.visual_reader_tool.page_renderer.render_images')
     @patch('src.code.Tools.visual_reader_tool.ChatAgent')
     @patch('src.code.Tools.visual_reader_tool.BaseMessage')
     def test_read_page_system_message_content(
@@ -167,7 +167,7 @@ class TestVisualReaderTool:
         assert "Markdown" in sys_msg_content
         assert "表格" in sys_msg_content or "流程图" in sys_msg_content
 
-    @patch('src.code.Tools.visual_reader_tool.convert_from_path')
+    @patch('src.code.Tools.visual_reader_tool.page_renderer.render_images')
     @patch('src.code.Tools.visual_reader_tool.ChatAgent')
     @patch('src.code.Tools.visual_reader_tool.BaseMessage')
     def test_read_page_agent_initialization(
@@ -191,7 +191,7 @@ class TestVisualReaderTool:
         assert call_kwargs['message_window_size'] == 5
         assert call_kwargs['model'] == tool_instance.vision_model
 
-    @patch('src.code.Tools.visual_reader_tool.convert_from_path')
+    @patch('src.code.Tools.visual_reader_tool.page_renderer.render_images')
     @patch('src.code.Tools.visual_reader_tool.ChatAgent')
     @patch('src.code.Tools.visual_reader_tool.BaseMessage')
     def test_read_page_various_page_ranges(
@@ -216,7 +216,7 @@ class TestVisualReaderTool:
         result_multi = tool_instance.read_page((10, 15), "多页问题")
         assert "根据第 10 到 15 页的内容" in result_multi
 
-    @patch('src.code.Tools.visual_reader_tool.convert_from_path')
+    @patch('src.code.Tools.visual_reader_tool.page_renderer.render_images')
     @patch('src.code.Tools.visual_reader_tool.ChatAgent')
     @patch('src.code.Tools.visual_reader_tool.BaseMessage')
     def test_read_page_user_msg_includes_images(
@@ -258,7 +258,7 @@ class TestVisualReaderToolEdgeCases:
             mock_factory.create.return_value = mock_vision_model
             return VisualReaderTool(pdf_path=pdf_path)
 
-    @patch('src.code.Tools.visual_reader_tool.convert_from_path')
+    @patch('src.code.Tools.visual_reader_tool.page_renderer.render_images')
     @patch('src.code.Tools.visual_reader_tool.ChatAgent')
     @patch('src.code.Tools.visual_reader_tool.BaseMessage')
     def test_read_page_empty_query(self, mock_base_message, mock_chat_agent, 
@@ -277,7 +277,7 @@ class TestVisualReaderToolEdgeCases:
         # 验证消息仍然被创建
         mock_base_message.make_user_message.assert_called_once()
 
-    @patch('src.code.Tools.visual_reader_tool.convert_from_path')
+    @patch('src.code.Tools.visual_reader_tool.page_renderer.render_images')
     @patch('src.code.Tools.visual_reader_tool.ChatAgent')
     @patch('src.code.Tools.visual_reader_tool.BaseMessage')
     def test_read_page_long_query(self, mock_base_message, mock_chat_agent, 